@@ -0,0 +1,24 @@
+# config/settings_test.py
+"""
+Configuración para las pruebas:
+
+    python manage.py test --settings=config.settings_test
+
+Agrega una segunda base local, 'replica', para las pruebas del router de
+réplicas (core/replicas.py). No se agrega a DATABASE_REPLICAS: solo esas
+pruebas la activan (override_settings). Al no haber replicación, escribir
+solo en una de las dos bases simula el retraso de la réplica.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"},
+}
+if DATABASES['replica']['ENGINE'] == 'django.db.backends.sqlite3':
+    # En SQLite, una base en memoria propia.
+    DATABASES['replica']['TEST'] = {}
+
+# Las pruebas corren en un solo proceso: las caches en memoria bastan.
+SILENCED_SYSTEM_CHECKS = ['core.E001']
@@ -0,0 +1,298 @@
+# core/carga_masiva.py
+"""
+Exportación y carga masiva de los datos de referencia (división DANE,
+organización y catálogo de productos), usada por los comandos exportall y
+loadall.
+
+Cada modelo va en su propio archivo '<app>.<modelo>.jsonl.gz': una línea JSON
+por fila con los valores de sus columnas, escrita en streaming (iterator) y
+comprimida con gzip, así exportar no carga la tabla completa en memoria.
+
+La carga sigue el orden de MODELOS (primero lo referenciado) y usa una
+transacción por modelo:
+- Si la tabla está vacía, COPY ... FROM STDIN en PostgreSQL o LOAD DATA LOCAL
+  INFILE en MySQL (si el servidor lo permite).
+- Si no, o si el camino rápido no está disponible, bulk_create por lotes con
+  upsert por pk: volver a cargar los mismos archivos no duplica filas.
+
+Nada de esto pasa por save() ni dispara señales: al terminar se invalidan a
+mano el registro DANE, la configuración de sucursales, el árbol de
+categorías y la cache de productos.
+"""
+import datetime
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, models, transaction
+
+# Orden de dependencias: cada modelo solo referencia a los anteriores (o a sí mismo).
+MODELOS = (
+    'ubicaciones.Departamento',
+    'ubicaciones.Municipio',
+    'organizacion.Empresa',
+    'organizacion.Sucursal',
+    'productos.Categoria',
+    'productos.Producto',
+    'productos.ProductoCategoria',
+)
+DIRECTORIO = settings.BASE_DIR / 'fixtures'
+EXTENSION = '.jsonl.gz'
+TAMANO_LOTE = 5000
+
+
+class CodificadorJSON(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder recorta fechas y horas a milisegundos: exportar y
+    volver a cargar cambiaría los valores. Aquí van con isoformat() completo.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def modelos(app_labels=None):
+    """
+    Modelos a exportar o cargar, en orden de dependencias. `app_labels`
+    limita a las apps indicadas.
+    """
+    seleccion = [apps.get_model(etiqueta) for etiqueta in MODELOS]
+    if app_labels:
+        seleccion = [modelo for modelo in seleccion if modelo._meta.app_label in app_labels]
+    return seleccion
+
+
+def ruta_archivo(directorio, modelo):
+    return os.path.join(directorio, modelo._meta.label_lower + EXTENSION)
+
+
+def _externo(campo):
+    """
+    Llaves foráneas a modelos fuera de MODELOS (por ejemplo, el administrador
+    de una sucursal): no viajan con los datos de referencia.
+    """
+    return campo.is_relation and campo.related_model._meta.label not in MODELOS
+
+
+# --- Exportación ---
+def exportar(modelo, directorio, using=DEFAULT_DB_ALIAS, tamano_lote=TAMANO_LOTE):
+    """
+    Escribe todas las filas del modelo (incluidas las eliminadas con soft
+    delete) en su archivo .jsonl.gz. Devuelve cuántas filas escribió.
+    """
+    campos = modelo._meta.concrete_fields
+    columnas = [campo.attname for campo in campos]
+    externos = {campo.attname for campo in campos if _externo(campo)}
+    filas = modelo._base_manager.using(using).order_by('pk').values_list(*columnas)
+
+    ruta = ruta_archivo(directorio, modelo)
+    temporal = ruta + '.tmp'
+    total = 0
+    # Se escribe en un temporal y se renombra: un error a mitad no deja un archivo truncado.
+    with gzip.open(temporal, 'wt', encoding='utf-8', compresslevel=6) as archivo:
+        for valores in filas.iterator(chunk_size=tamano_lote):
+            fila = {
+                columna: None if columna in externos else valor for columna, valor in zip(columnas, valores)
+            }
+            archivo.write(json.dumps(fila, cls=CodificadorJSON, ensure_ascii=False))
+            archivo.write('\n')
+            total += 1
+    os.replace(temporal, ruta)
+    return total
+
+
+# --- Carga ---
+def leer(ruta, campos, tamano_lote=TAMANO_LOTE):
+    """
+    Lee el archivo en lotes de listas de valores ya convertidos al tipo de
+    Python de cada campo, en el orden de `campos`.
+    """
+    lote = []
+    with gzip.open(ruta, 'rt', encoding='utf-8') as archivo:
+        for linea in archivo:
+            if not linea.strip():
+                continue
+            fila = json.loads(linea)
+            lote.append([campo.to_python(fila.get(campo.attname)) for campo in campos])
+            if len(lote) >= tamano_lote:
+                yield lote
+                lote = []
+    if lote:
+        yield lote
+
+
+def cargar(modelo, ruta, using=DEFAULT_DB_ALIAS, tamano_lote=TAMANO_LOTE, rapida=True):
+    """
+    Carga un archivo en una sola transacción. Devuelve (filas, método, pks).
+    Los pks solo se devuelven para los modelos cuyas caches se invalidan
+    por instancia (Producto).
+    """
+    connection = connections[using]
+    campos = modelo._meta.concrete_fields
+    guardar_pks = modelo._meta.label == 'productos.Producto'
+    total, metodo, pks = 0, 'bulk_create', []
+
+    with transaction.atomic(using=using):
+        # Las llaves foráneas se verifican al final (como loaddata): las
+        # categorías pueden llegar antes que su categoría padre.
+        with connection.constraint_checks_disabled():
+            lotes = leer(ruta, campos, tamano_lote)
+            if guardar_pks:
+                lotes = _anotar_pks(lotes, campos, pks)
+            vacia = not modelo._base_manager.using(using).exists()
+            if rapida and vacia and connection.vendor == 'postgresql':
+                total, metodo = _copiar_postgresql(connection, modelo, campos, lotes), 'COPY'
+            elif rapida and vacia and connection.vendor == 'mysql':
+                # LOAD DATA necesita el archivo completo: si el servidor lo
+                # rechaza se vuelve a leer y se usa bulk_create.
+                total = _cargar_mysql(connection, modelo, campos, lotes)
+                if total is None:
+                    pks.clear()
+                    lotes = leer(ruta, campos, tamano_lote)
+                    if guardar_pks:
+                        lotes = _anotar_pks(lotes, campos, pks)
+                    total = _insertar(connection, modelo, campos, lotes)
+                else:
+                    metodo = 'LOAD DATA'
+            else:
+                total = _insertar(connection, modelo, campos, lotes)
+        connection.check_constraints(table_names=[modelo._meta.db_table])
+
+        # Las filas llegan con pk explícito: la secuencia debe seguir al máximo.
+        sentencias = connection.ops.sequence_reset_sql(no_style(), [modelo])
+        if sentencias:
+            with connection.cursor() as cursor:
+                for sentencia in sentencias:
+                    cursor.execute(sentencia)
+    return total, metodo, pks
+
+
+def _anotar_pks(lotes, campos, pks):
+    posicion = next(i for i, campo in enumerate(campos) if campo.primary_key)
+    for lote in lotes:
+        pks.extend(valores[posicion] for valores in lote)
+        yield lote
+
+
+def _insertar(connection, modelo, campos, lotes):
+    """
+    bulk_create por lotes; si el pk ya existe, actualiza la fila (upsert).
+    Las llaves a modelos fuera de MODELOS no se actualizan: el archivo las
+    trae vacías y la fila existente conserva su valor.
+    """
+    pk = modelo._meta.pk
+    opciones = {
+        'update_conflicts': True,
+        'update_fields': [campo.name for campo in campos if not campo.primary_key and not _externo(campo)],
+    }
+    if connection.features.supports_update_conflicts_with_target:
+        opciones['unique_fields'] = [pk.name]
+    manager = modelo._base_manager.using(connection.alias)
+    total = 0
+    for lote in lotes:
+        # Constructor posicional: los valores vienen en el orden de concrete_fields.
+        manager.bulk_create([modelo(*valores) for valores in lote], batch_size=len(lote), **opciones)
+        total += len(lote)
+    return total
+
+
+def _texto(connection, campo, valor, verdadero, falso):
+    """
+    Valor en el formato de texto común a COPY (PostgreSQL) y LOAD DATA
+    (MySQL): tabuladores entre columnas, \\N para NULL y barra invertida
+    para escapar.
+    """
+    if valor is None:
+        return '\\N'
+    if isinstance(campo, models.JSONField):
+        texto = json.dumps(valor, cls=campo.encoder)
+    else:
+        valor = campo.get_db_prep_save(valor, connection)
+        if valor is None:
+            return '\\N'
+        if isinstance(valor, bool):
+            return verdadero if valor else falso
+        texto = valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+    return texto.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _escribir(connection, campos, lote, salida, verdadero, falso):
+    for valores in lote:
+        salida.write('\t'.join(
+            _texto(connection, campo, valor, verdadero, falso) for campo, valor in zip(campos, valores)
+        ))
+        salida.write('\n')
+
+
+def _copiar_postgresql(connection, modelo, campos, lotes):
+    quote = connection.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN".format(
+        quote(modelo._meta.db_table), ', '.join(quote(campo.column) for campo in campos)
+    )
+    total = 0
+    with connection.cursor() as cursor:
+        for lote in lotes:
+            buffer = io.StringIO()
+            _escribir(connection, campos, lote, buffer, 't', 'f')
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            total += len(lote)
+    return total
+
+
+def _cargar_mysql(connection, modelo, campos, lotes):
+    """
+    LOAD DATA LOCAL INFILE desde un archivo temporal. Requiere local_infile
+    en el servidor y en OPTIONS de la conexión; si no está habilitado
+    devuelve None sin haber cambiado la tabla.
+    """
+    quote = connection.ops.quote_name
+    total = 0
+    with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', newline='\n', delete=False) as archivo:
+        for lote in lotes:
+            _escribir(connection, campos, lote, archivo, '1', '0')
+            total += len(lote)
+    try:
+        sql = "LOAD DATA LOCAL INFILE %s INTO TABLE {} CHARACTER SET utf8mb4 ({})".format(
+            quote(modelo._meta.db_table), ', '.join(quote(campo.column) for campo in campos)
+        )
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(sql, [archivo.name])
+    except DatabaseError:
+        return None
+    finally:
+        os.unlink(archivo.name)
+    return total
+
+
+def invalidar_caches(cargados):
+    """
+    Lo que harían las señales post_save de los modelos cargados.
+    `cargados` es {label del modelo: pks cargados}.
+    """
+    from organizacion.configuracion import invalidar_configuracion
+    from productos.arbol import invalidar_arbol
+    from productos.cache import invalidar_productos
+    from ubicaciones.registro import invalidar_registro
+
+    if 'ubicaciones.Departamento' in cargados or 'ubicaciones.Municipio' in cargados:
+        invalidar_registro()
+    if 'organizacion.Empresa' in cargados or 'organizacion.Sucursal' in cargados:
+        invalidar_configuracion()
+    if 'productos.Categoria' in cargados:
+        invalidar_arbol()
+    productos = cargados.get('productos.Producto', [])
+    for inicio in range(0, len(productos), TAMANO_LOTE):
+        invalidar_productos(productos[inicio:inicio + TAMANO_LOTE])
+    if 'productos.Categoria' in cargados or 'productos.ProductoCategoria' in cargados:
+        # Cambia el sello del catálogo aunque no se haya cargado ningún producto.
+        invalidar_productos([])
+
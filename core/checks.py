@@ -0,0 +1,37 @@
+# core/checks.py
+"""
+Chequeos del sistema (manage.py check) propios del proyecto.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Caches que guardan sellos de versión (core/versiones.py) y deben ser
+# compartidas por todos los procesos del servidor.
+CACHES_COMPARTIDAS = ('default', 'fragmentos')
+BACKENDS_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def caches_compartidas(app_configs, **kwargs):
+    """
+    Con DEBUG=False se asume más de un proceso: una cache en memoria del
+    proceso (o ninguna) deja las invalidaciones en el proceso que escribió y
+    los demás sirven datos viejos hasta que expiren.
+    """
+    if settings.DEBUG:
+        return []
+    errores = []
+    for alias in CACHES_COMPARTIDAS:
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in BACKENDS_LOCALES:
+            errores.append(Error(
+                f"La cache '{alias}' usa {backend.rsplit('.', 1)[-1]}, que no se comparte entre procesos.",
+                hint="Configure una cache compartida (rediscache://, filecache:// en un solo servidor) "
+                     "con CACHE_URL / FRAGMENTOS_CACHE_URL.",
+                obj=alias,
+                id='core.E001',
+            ))
+    return errores
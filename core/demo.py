@@ -0,0 +1,43 @@
+# core/demo.py
+"""
+Datos mínimos (sucursal, perfil) para las pruebas y para los comandos de
+benchmark y estrés. No depende de django.test: se puede importar en
+producción.
+"""
+
+
+def crear_sucursal(nombre='Principal', nit=900000001):
+    """
+    Crea una sucursal con su empresa, departamento y municipio mínimos.
+    """
+    from organizacion.models import Empresa, Sucursal
+    from ubicaciones.models import Departamento, Municipio
+
+    departamento, _ = Departamento.objects.get_or_create(codigo_dane=11, defaults={'nombre': 'Bogotá D.C.'})
+    municipio, _ = Municipio.objects.get_or_create(
+        codigo_dane=11001, defaults={'departamento': departamento, 'nombre': 'Bogotá'}
+    )
+    empresa, _ = Empresa.objects.get_or_create(nit=nit, defaults={'nombre': f'Empresa {nit}'})
+    sucursal, _ = Sucursal.objects.get_or_create(
+        empresa=empresa, nombre=nombre,
+        defaults={'direccion': 'Calle 1 # 2-3', 'municipio': municipio, 'telefono': '6010000000'},
+    )
+    return sucursal
+
+
+def crear_perfil(documento='1000000001', rol='Empleado'):
+    """
+    Crea un usuario de Django con su PerfilUsuario.
+    """
+    from django.contrib.auth.models import User
+    from usuarios.models import PerfilUsuario
+
+    usuario, _ = User.objects.get_or_create(username=f'usuario-{documento}')
+    perfil, _ = PerfilUsuario.objects.get_or_create(
+        documento=documento,
+        defaults={
+            'usuario': usuario, 'tipo_documento': 'CC', 'nombres': 'Usuario',
+            'apellidos': documento, 'rol_negocio': rol,
+        },
+    )
+    return perfil
@@ -191,6 +191,35 @@ class EstadoDevolucion(str, enum.Enum):
     def choices(cls):
         return [(key.value, key.name.capitalize()) for key in cls]
 
+class TipoConsecutivo(str, enum.Enum):
+    VENTA = 'Venta'
+    COMPRA = 'Compra'
+    DEVOLUCION = 'Devolucion'
+
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.name.capitalize()) for key in cls]
+
+class TipoMovimiento(str, enum.Enum):
+    VENTA = 'Venta'
+    COMPRA = 'Compra'
+    DEVOLUCION_VENTA = 'Devolucion_Venta'
+    DEVOLUCION_COMPRA = 'Devolucion_Compra'
+    ANULACION = 'Anulacion'
+
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.name.replace('_', ' ').capitalize()) for key in cls]
+
+class ClaseABC(str, enum.Enum):
+    A = 'A'
+    B = 'B'
+    C = 'C'
+
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.name) for key in cls]
+
 class TipoArchivo(str, enum.Enum):
     IMAGEN = 'imagen'
     DOCUMENTO = 'documento'
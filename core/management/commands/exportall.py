@@ -0,0 +1,33 @@
+# core/management/commands/exportall.py
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.carga_masiva import DIRECTORIO, TAMANO_LOTE, exportar, modelos, ruta_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta los datos de referencia (ubicaciones, organización y productos) "
+        "a un archivo .jsonl.gz por modelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', default=str(DIRECTORIO), help="Carpeta de los archivos.")
+        parser.add_argument('--app', action='append', dest='apps', help="Solo esta app (se puede repetir).")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas leídas por consulta.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directorio'], exist_ok=True)
+        inicio_total = time.perf_counter()
+        for modelo in modelos(options['apps']):
+            inicio = time.perf_counter()
+            total = exportar(modelo, options['directorio'], using=options['database'], tamano_lote=options['lote'])
+            self.stdout.write(
+                f"{modelo._meta.label}: {total} filas -> {ruta_archivo(options['directorio'], modelo)} "
+                f"({time.perf_counter() - inicio:.2f} s)"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Exportación terminada en {time.perf_counter() - inicio_total:.2f} s."))
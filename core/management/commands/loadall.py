@@ -0,0 +1,44 @@
+# core/management/commands/loadall.py
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.carga_masiva import DIRECTORIO, TAMANO_LOTE, cargar, invalidar_caches, modelos, ruta_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga los datos de referencia exportados con exportall, en orden de "
+        "dependencias y con una transacción por modelo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', default=str(DIRECTORIO), help="Carpeta de los archivos.")
+        parser.add_argument('--app', action='append', dest='apps', help="Solo esta app (se puede repetir).")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Filas por inserción.")
+        parser.add_argument(
+            '--sin-copy', action='store_true',
+            help="Usa siempre bulk_create, sin COPY (PostgreSQL) ni LOAD DATA (MySQL).",
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        inicio_total = time.perf_counter()
+        cargados = {}
+        for modelo in modelos(options['apps']):
+            ruta = ruta_archivo(options['directorio'], modelo)
+            if not os.path.exists(ruta):
+                self.stdout.write(self.style.WARNING(f"{modelo._meta.label}: no existe {ruta}, se omite."))
+                continue
+            inicio = time.perf_counter()
+            total, metodo, pks = cargar(
+                modelo, ruta, using=options['database'], tamano_lote=options['lote'], rapida=not options['sin_copy'],
+            )
+            cargados[modelo._meta.label] = pks
+            self.stdout.write(
+                f"{modelo._meta.label}: {total} filas con {metodo} ({time.perf_counter() - inicio:.2f} s)"
+            )
+        invalidar_caches(cargados)
+        self.stdout.write(self.style.SUCCESS(f"Carga terminada en {time.perf_counter() - inicio_total:.2f} s."))
@@ -0,0 +1,144 @@
+# core/pagination.py
+import base64
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorKeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre los campos de `ordering` (con '-'
+    para orden descendente). El último campo debe ser único (normalmente
+    'id') para que el cursor apunte a una posición exacta: las inserciones
+    posteriores no desplazan ni duplican filas entre páginas, y el costo de
+    cada página no depende de qué tan lejos esté del inicio (no hay OFFSET).
+
+    El cursor lleva los valores de esos campos de la última fila (o de la
+    primera, hacia atrás), convertidos con to_python() de cada campo.
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        posicion = self.decode_cursor(request, queryset.model)
+
+        if posicion is None:
+            self.hacia_atras = False
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            valores, self.hacia_atras = posicion
+            orden = [self.invertir(campo) for campo in self.ordering] if self.hacia_atras else self.ordering
+            queryset = queryset.filter(self.filtro_desde(valores, self.hacia_atras)).order_by(*orden)
+
+        # Pedimos una fila de más para saber si hay otra página en esa dirección.
+        resultados = list(queryset[:self.page_size + 1])
+        hay_mas = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        if self.hacia_atras:
+            resultados.reverse()
+
+        self.tiene_siguiente = hay_mas if not self.hacia_atras else posicion is not None
+        self.tiene_anterior = hay_mas if self.hacia_atras else posicion is not None
+        self.page = resultados
+        return resultados
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if tamano <= 0:
+            return self.page_size
+        return min(tamano, self.max_page_size)
+
+    # --- Condición del keyset ---
+    @staticmethod
+    def invertir(campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    def filtro_desde(self, valores, hacia_atras):
+        """
+        Filas estrictamente después de `valores` en el orden de la página (o
+        antes, hacia atrás): (a > x) | (a = x & b > y) | ...
+        """
+        condiciones = []
+        for posicion, campo in enumerate(self.ordering):
+            nombre = campo.lstrip('-')
+            mayor = campo.startswith('-') == hacia_atras
+            iguales = {
+                anterior.lstrip('-'): valor for anterior, valor in zip(self.ordering[:posicion], valores)
+            }
+            condiciones.append(Q(**iguales, **{f"{nombre}__{'gt' if mayor else 'lt'}": valores[posicion]}))
+        return reduce(lambda a, b: a | b, condiciones)
+
+    # --- Codificación del cursor ---
+    def decode_cursor(self, request, modelo):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            *valores, hacia_atras = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if len(valores) != len(self.ordering):
+                raise ValueError
+            valores = [
+                modelo._meta.get_field(campo.lstrip('-')).to_python(valor)
+                for campo, valor in zip(self.ordering, valores)
+            ]
+            if None in valores:
+                raise ValueError
+            return valores, bool(hacia_atras)
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, fila, hacia_atras):
+        valores = [getattr(fila, campo.lstrip('-')) for campo in self.ordering]
+        # isoformat() conserva los microsegundos (DjangoJSONEncoder los recorta).
+        valores = [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores]
+        datos = json.dumps([*valores, int(hacia_atras)])
+        cursor = base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.tiene_siguiente:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], hacia_atras=False)
+
+    def get_previous_link(self):
+        if not self.tiene_anterior:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], hacia_atras=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,173 @@
+# core/replicas.py
+"""
+Réplicas de lectura.
+
+ReplicaRouter manda a una réplica (settings.DATABASE_REPLICAS) las lecturas
+del catálogo (productos), de la división DANE (ubicaciones) y de los
+agregados de reportes; todo lo demás, y todas las escrituras, van a la
+primaria ('default').
+
+Una réplica va unos instantes detrás de la primaria. Para que quien acaba de
+escribir vea su propio cambio, tras cualquier escritura las lecturas de ese
+mismo contexto (petición, comando) se quedan en la primaria durante
+settings.REPLICA_STICKY_SECONDS segundos. LecturaPrimariaMiddleware extiende
+esa ventana a las peticiones siguientes del mismo cliente con una cookie.
+
+Dentro de una transacción en la primaria también se lee de la primaria: el
+código que lee y luego escribe en un bloque atómico necesita ver datos
+consistentes con lo que va a escribir.
+
+Cada contexto elige una réplica la primera vez que lee y se queda con ella:
+dos consultas de la misma petición no ven réplicas con distinto retraso.
+
+Lo que se guarda en una cache bajo el sello de versión vigente (árbol de
+categorías, registro DANE, fragmentos, facetas, respuestas con ETag) se lee
+dentro de lectura_primaria(): una réplica atrasada guardaría filas viejas
+con el sello nuevo hasta el siguiente cambio.
+"""
+import contextlib
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Apps o modelos ('app.Modelo') cuyas lecturas pueden ir a una réplica.
+LECTURAS_REPLICA = (
+    'productos',
+    'ubicaciones',
+    # Reportes: el agregado y su marca de agua viajan juntos para que el
+    # reporte complete desde la misma marca que ve en la réplica.
+    'transacciones.VentaDiaria',
+    'transacciones.MarcaAgregacion',
+    'transacciones.AnalisisInventario',
+)
+VENTANA_PRIMARIA = 5
+COOKIE_PRIMARIA = 'weber_primaria'
+
+
+class _Estado:
+    __slots__ = ('primaria_hasta', 'escribio', 'forzar_primaria', 'replica')
+
+    def __init__(self, primaria_hasta=0.0):
+        # time.monotonic() hasta el que se lee de la primaria.
+        self.primaria_hasta = primaria_hasta
+        self.escribio = False
+        # Bloques lectura_primaria() abiertos.
+        self.forzar_primaria = 0
+        # Réplica elegida para este contexto.
+        self.replica = None
+
+
+# Un objeto mutable por contexto: el router lo modifica en su lugar, así los
+# cambios hechos dentro de la vista se ven en el middleware.
+_estado = contextvars.ContextVar('replicas_estado')
+
+
+def _estado_actual():
+    try:
+        return _estado.get()
+    except LookupError:
+        estado = _Estado()
+        _estado.set(estado)
+        return estado
+
+
+def ventana_primaria():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', VENTANA_PRIMARIA)
+
+
+def fijar_primaria(segundos=None):
+    """
+    Lee de la primaria durante los próximos `segundos` (por defecto, la
+    ventana configurada) en el contexto actual.
+    """
+    estado = _estado_actual()
+    segundos = ventana_primaria() if segundos is None else segundos
+    estado.primaria_hasta = max(estado.primaria_hasta, time.monotonic() + segundos)
+
+
+def leyendo_de_primaria():
+    estado = _estado_actual()
+    return estado.forzar_primaria > 0 or time.monotonic() < estado.primaria_hasta
+
+
+@contextlib.contextmanager
+def lectura_primaria():
+    """
+    Todas las lecturas dentro del bloque van a la primaria. Sirve también
+    como decorador.
+    """
+    estado = _estado_actual()
+    estado.forzar_primaria += 1
+    try:
+        yield
+    finally:
+        estado.forzar_primaria -= 1
+
+
+class ReplicaRouter:
+
+    def _replicable(self, model):
+        opts = model._meta
+        lecturas = getattr(settings, 'REPLICA_READ_MODELS', LECTURAS_REPLICA)
+        return opts.app_label in lecturas or opts.label in lecturas
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        if not replicas or not self._replicable(model):
+            return None
+        if leyendo_de_primaria() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        estado = _estado_actual()
+        if estado.replica not in replicas:
+            estado.replica = random.choice(replicas)
+        return estado.replica
+
+    def db_for_write(self, model, **hints):
+        estado = _estado_actual()
+        estado.escribio = True
+        fijar_primaria()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos.
+        bases = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', ())}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+
+
+class LecturaPrimariaMiddleware:
+    """
+    Mantiene en la primaria las lecturas del cliente que escribió hace menos
+    de REPLICA_STICKY_SECONDS segundos, aunque sea en otra petición (o en
+    otro proceso). El plazo viaja en una cookie con la hora de vencimiento.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        restante = 0.0
+        try:
+            restante = float(request.COOKIES.get(COOKIE_PRIMARIA, 0)) - time.time()
+        except ValueError:
+            pass
+        # Acotado a la ventana: la cookie la controla el cliente.
+        restante = min(restante, ventana_primaria())
+        estado = _Estado(time.monotonic() + restante if restante > 0 else 0.0)
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+
+        if estado.escribio:
+            ventana = ventana_primaria()
+            response.set_cookie(
+                COOKIE_PRIMARIA, f'{time.time() + ventana:.3f}',
+                max_age=int(ventana), httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,28 @@
+# core/testing.py
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Los constructores de datos viven en core/demo.py (también los usan comandos).
+from .demo import crear_perfil, crear_sucursal  # noqa: F401
+
+
+class PresupuestoConsultasMixin:
+    """
+    Mixin para TestCase que permite fijar un "presupuesto" de consultas SQL.
+    A diferencia de assertNumQueries, falla solo si se supera el máximo,
+    y muestra las consultas ejecutadas para facilitar la depuración.
+    """
+
+    def assertPresupuestoConsultas(self, presupuesto, funcion, *args, **kwargs):
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = funcion(*args, **kwargs)
+
+        ejecutadas = len(contexto.captured_queries)
+        if ejecutadas > presupuesto:
+            consultas = '\n'.join(
+                f"{i}. {q['sql']}" for i, q in enumerate(contexto.captured_queries, start=1)
+            )
+            self.fail(
+                f"Se ejecutaron {ejecutadas} consultas, el presupuesto es {presupuesto}.\n{consultas}"
+            )
+        return resultado
@@ -1,3 +1,199 @@
-from django.test import TestCase
+# core/tests.py
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+
+from organizacion.models import Empresa, Sucursal
+from productos.models import Categoria, Producto, ProductoCategoria
+from ubicaciones.models import Departamento, Municipio
+from ubicaciones.registro import invalidar_registro, obtener_registro
+from .checks import caches_compartidas
+from .replicas import (
+    COOKIE_PRIMARIA, LecturaPrimariaMiddleware, ReplicaRouter, _Estado, _estado, lectura_primaria,
+)
+from .testing import crear_perfil, crear_sucursal
+
+
+class CargaMasivaTests(TestCase):
+    """
+    exportall / loadall: ida y vuelta de los datos de referencia.
+    """
+
+    def setUp(self):
+        self.sucursal = crear_sucursal()
+        self.sucursal.administrador = crear_perfil()
+        self.sucursal.save()
+        self.padre = Categoria.objects.create(nombre='Bebidas')
+        self.hija = Categoria.objects.create(nombre='Gaseosas', categoria_padre=self.padre)
+        self.producto = Producto.objects.create(codigo='SKU-1', nombre='Gaseosa', atributos={'sabor': 'limón'})
+        ProductoCategoria.objects.create(producto=self.producto, categoria=self.hija, es_principal=True)
+        self.directorio = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directorio)
+
+    def comando(self, nombre, *args):
+        call_command(nombre, '--directorio', self.directorio, *args, stdout=StringIO())
+
+    def test_exporta_jsonl_comprimido(self):
+        self.comando('exportall')
+        with gzip.open(os.path.join(self.directorio, 'organizacion.sucursal.jsonl.gz'), 'rt') as archivo:
+            filas = [json.loads(linea) for linea in archivo]
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['municipio_id'], self.sucursal.municipio_id)
+        # El administrador es un usuario: no es dato de referencia.
+        self.assertIsNone(filas[0]['administrador_id'])
+
+    def test_carga_en_tablas_vacias(self):
+        self.comando('exportall')
+        for modelo in (ProductoCategoria, Producto, Categoria, Sucursal, Empresa, Municipio, Departamento):
+            modelo._base_manager.all().delete()
+        obtener_registro()
+
+        self.comando('loadall')
+        self.assertEqual(Municipio.objects.get().nombre, 'Bogotá')
+        self.assertEqual(Sucursal.objects.get().municipio_id, self.sucursal.municipio_id)
+        hija = Categoria.objects.get(pk=self.hija.pk)
+        self.assertEqual((hija.categoria_padre_id, hija.ruta), (self.padre.pk, self.hija.ruta))
+        producto = Producto.objects.get()
+        self.assertEqual(producto.atributos, {'sabor': 'limón'})
+        self.assertEqual(list(producto.categorias.all()), [hija])
+        # Los bulk no disparan señales: el registro DANE se invalida a mano.
+        self.assertIsNotNone(obtener_registro().municipio(self.sucursal.municipio_id))
+
+    def test_recargar_actualiza_sin_duplicar(self):
+        self.comando('exportall', '--app', 'ubicaciones')
+        Municipio.objects.update(nombre='Otro nombre')
+
+        self.comando('loadall', '--app', 'ubicaciones')
+        self.comando('loadall', '--app', 'ubicaciones')
+        self.assertEqual(list(Municipio.objects.values_list('nombre', flat=True)), ['Bogotá'])
+        self.assertFalse(os.path.exists(os.path.join(self.directorio, 'productos.producto.jsonl.gz')))
+
+    def test_ida_y_vuelta_conserva_microsegundos(self):
+        eliminado = datetime.datetime(2026, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc)
+        Departamento.all_objects.update(deleted=eliminado)
+        self.comando('exportall', '--app', 'ubicaciones')
+        Departamento.all_objects.update(deleted=None)
+
+        self.comando('loadall', '--app', 'ubicaciones')
+        self.assertEqual(Departamento.all_objects.get().deleted, eliminado)
+
+    def test_recargar_conserva_llaves_externas(self):
+        self.comando('exportall', '--app', 'organizacion')
+        Sucursal.objects.update(nombre='Otro nombre')
+
+        self.comando('loadall', '--app', 'organizacion')
+        sucursal = Sucursal.objects.get()
+        self.assertEqual(sucursal.nombre, self.sucursal.nombre)
+        # El archivo no trae el administrador: la fila existente lo conserva.
+        self.assertEqual(sucursal.administrador_id, self.sucursal.administrador_id)
+
+
+class CachesCompartidasCheckTests(TestCase):
+    """
+    core.E001: sin DEBUG, los sellos de versión necesitan una cache compartida.
+    """
+
+    def caches(self, backend):
+        return {alias: {'BACKEND': backend} for alias in ('default', 'fragmentos')}
+
+    def test_rechaza_caches_locales_sin_debug(self):
+        with override_settings(DEBUG=False, CACHES=self.caches('django.core.cache.backends.locmem.LocMemCache')):
+            errores = caches_compartidas(None)
+        self.assertEqual(
+            [(error.id, error.obj) for error in errores], [('core.E001', 'default'), ('core.E001', 'fragmentos')],
+        )
+
+    def test_acepta_caches_compartidas_o_debug(self):
+        with override_settings(DEBUG=False, CACHES=self.caches('django.core.cache.backends.redis.RedisCache')):
+            self.assertEqual(caches_compartidas(None), [])
+        with override_settings(DEBUG=True, CACHES=self.caches('django.core.cache.backends.dummy.DummyCache')):
+            self.assertEqual(caches_compartidas(None), [])
+
+
+# La base 'replica' solo existe con config/settings_test.py.
+HAY_REPLICA = 'replica' in settings.DATABASES
+
+
+@skipUnless(HAY_REPLICA, "Requiere --settings=config.settings_test.")
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=30)
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Router de réplicas con dos bases locales: 'default' hace de primaria y
+    'replica' de réplica (ver config/settings_test.py). No hay replicación,
+    así que escribir solo en una de ellas simula el retraso de la réplica.
+    """
+    databases = {'default', 'replica'} if HAY_REPLICA else {'default'}
+
+    def setUp(self):
+        token = _estado.set(_Estado())
+        self.addCleanup(_estado.reset, token)
+        Departamento.objects.using('default').create(nombre='En la primaria', codigo_dane=5)
+        Departamento.objects.using('replica').create(nombre='En la réplica', codigo_dane=5)
+
+    def nombre(self):
+        return Departamento.objects.get(codigo_dane=5).nombre
+
+    def test_lecturas_a_la_replica_y_escrituras_a_la_primaria(self):
+        self.assertEqual(self.nombre(), 'En la réplica')
+        # organizacion no se lee de réplicas.
+        Empresa.objects.using('default').create(nombre='Empresa', nit=900000001)
+        self.assertEqual(Empresa.objects.count(), 1)
+        with transaction.atomic():
+            self.assertEqual(self.nombre(), 'En la primaria')
+
+        Municipio.objects.create(
+            departamento=Departamento.objects.using('default').get(), nombre='Medellín', codigo_dane=5001,
+        )
+        self.assertFalse(Municipio.objects.using('replica').exists())
+        # Quien escribió lee de la primaria durante la ventana...
+        self.assertEqual(self.nombre(), 'En la primaria')
+        self.assertTrue(Municipio.objects.exists())
+
+        # ...y al vencerse vuelve a la réplica.
+        _estado.get().primaria_hasta = 0.0
+        self.assertEqual(self.nombre(), 'En la réplica')
+
+    def test_las_caches_versionadas_se_llenan_desde_la_primaria(self):
+        self.assertEqual(self.nombre(), 'En la réplica')
+        self.assertEqual(_estado.get().replica, 'replica')
+        with lectura_primaria():
+            self.assertEqual(self.nombre(), 'En la primaria')
+
+        invalidar_registro()
+        self.assertEqual(obtener_registro().departamento_por_codigo(5).nombre, 'En la primaria')
+        self.assertEqual(self.nombre(), 'En la réplica')
+
+    def test_la_ventana_sigue_al_cliente_con_la_cookie(self):
+        lecturas = []
+
+        def vista(request):
+            if request.method == 'POST':
+                Departamento.objects.create(nombre='Nuevo', codigo_dane=8)
+            lecturas.append(ReplicaRouter().db_for_read(Departamento))
+            return HttpResponse()
+
+        middleware = LecturaPrimariaMiddleware(vista)
+        factory = RequestFactory()
+        respuesta = middleware(factory.post('/'))
+        self.assertIn(COOKIE_PRIMARIA, respuesta.cookies)
+        # La escritura de la petición no se filtra al contexto que la atendió.
+        self.assertEqual(self.nombre(), 'En la réplica')
+
+        siguiente = factory.get('/')
+        siguiente.COOKIES[COOKIE_PRIMARIA] = respuesta.cookies[COOKIE_PRIMARIA].value
+        self.assertNotIn(COOKIE_PRIMARIA, middleware(siguiente).cookies)
+        middleware(factory.get('/'))
+        self.assertEqual(lecturas, ['default', 'default', 'replica'])
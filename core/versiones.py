@@ -0,0 +1,43 @@
+# core/versiones.py
+"""
+Sellos de versión en cache para invalidar datos derivados (árbol de
+categorías, registro DANE, fragmentos de productos, configuración de
+sucursales, autenticación).
+
+Quien guarda algo derivado lo asocia al sello vigente; para invalidar basta
+con cambiar el sello, sin buscar ni borrar lo guardado. Los sellos no
+expiran. Para que el cambio llegue a todos los procesos, la cache debe ser
+compartida (ver core/checks.py).
+"""
+import uuid
+
+from django.core.cache import cache as cache_default
+
+
+def nuevo_sello():
+    return uuid.uuid4().hex[:12]
+
+
+def version_actual(clave, cache=None):
+    """
+    Sello vigente de `clave`; lo crea si aún no existe.
+    """
+    if cache is None:
+        cache = cache_default
+    version = cache.get(clave)
+    if version is None:
+        # add() no pisa el sello si otro proceso lo creó primero.
+        cache.add(clave, nuevo_sello(), timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def nueva_version(clave, cache=None):
+    """
+    Reemplaza el sello de `clave`: todo lo asociado al anterior queda vencido.
+    """
+    if cache is None:
+        cache = cache_default
+    sello = nuevo_sello()
+    cache.set(clave, sello, timeout=None)
+    return sello
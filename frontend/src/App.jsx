@@ -32,7 +32,8 @@ function App() {
           throw new Error(`Error HTTP: ${response.status}`);
         }
         const data = await response.json();
-        setProductos(data);
+        // La API devuelve una página: { next, previous, results }
+        setProductos(data.results);
       } catch (err) {
         setError(err.message);
       } finally {
@@ -18,14 +18,21 @@ class SucursalAdmin(admin.ModelAdmin):
     """
     Panel de administración para Sucursales.
     """
-    list_display = ('nombre', 'empresa', 'municipio', 'estado', 'tipo')
+    list_display = ('nombre', 'empresa', 'get_municipio', 'estado', 'tipo')
+    list_select_related = ('empresa', 'municipio__departamento')
     search_fields = ('nombre', 'email', 'empresa__nombre')
     list_filter = ('estado', 'tipo', 'empresa')
 
     # --- Campos de Autocompletado ---
     # Esto es crucial para un buen rendimiento y experiencia de usuario
-    # cuando tenemos muchos municipios o usuarios.
+    # cuando tenemos muchos municipios o usuarios. El de municipio busca en
+    # el registro geográfico en memoria (ver MunicipioAdmin.get_search_results).
     autocomplete_fields = ['municipio', 'administrador']
 
     list_per_page = 20
-    ordering = ('empresa__nombre', 'nombre')
\ No newline at end of file
+    ordering = ('empresa__nombre', 'nombre')
+
+    @admin.display(description='Municipio', ordering='municipio__nombre')
+    def get_municipio(self, obj):
+        # Municipio y departamento vienen de list_select_related: sin consultas por fila.
+        return obj.municipio
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OrganizacionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'organizacion'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receptores de invalidación)
@@ -0,0 +1,260 @@
+# organizacion/configuracion.py
+"""
+Configuración efectiva de cada sucursal: valores por defecto del sistema,
+sobrescritos por Empresa.metadatos y luego por Sucursal.configuracion.
+
+Ambos campos JSON usan las mismas secciones:
+
+    {
+        "moneda": "COP",
+        "impuestos": {"iva": "19", "precios_incluyen_iva": true},
+        "precios": {"redondeo": "50", "descuento_maximo": "10"},
+        "impresion": {"impresora": "caja-1", "ancho_papel_mm": 80, "copias": 1}
+    }
+
+Cada sección se mezcla clave por clave, así una sucursal puede cambiar solo
+la impresora y heredar el resto de su empresa. El resultado es un objeto
+inmutable con los tipos ya convertidos (Decimal, bool, int).
+
+Se lee en casi cada llamada del POS, así que se guarda en memoria del
+proceso por sucursal y se reutiliza mientras no cambie el sello de versión
+de la cache 'default' (lo cambian las señales de Empresa y Sucursal, ver
+organizacion/signals.py), como el registro DANE (ubicaciones/registro.py):
+cada uso paga una lectura de cache, sin consultas ni decodificar JSON.
+"""
+import dataclasses
+import logging
+import threading
+from decimal import Decimal, InvalidOperation
+from types import MappingProxyType
+from typing import Optional
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+from core.replicas import lectura_primaria
+from core.versiones import nueva_version, version_actual
+
+CLAVE_VERSION = 'organizacion:configuracion:version'
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfiguracionImpuestos:
+    iva: Decimal = Decimal('19')
+    precios_incluyen_iva: bool = True
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfiguracionPrecios:
+    # Múltiplo al que se redondea el total (0: sin redondeo).
+    redondeo: Decimal = Decimal('0')
+    # Porcentaje máximo de descuento que puede aplicar un cajero.
+    descuento_maximo: Decimal = Decimal('0')
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfiguracionImpresion:
+    impresora: str = ''
+    ancho_papel_mm: int = 80
+    copias: int = 1
+    encabezado: str = ''
+    pie: str = ''
+
+
+@dataclasses.dataclass(frozen=True)
+class ConfiguracionSucursal:
+    sucursal_id: int
+    empresa_id: int
+    moneda: str = 'COP'
+    zona_horaria: str = settings.TIME_ZONE
+    impuestos: ConfiguracionImpuestos = ConfiguracionImpuestos()
+    precios: ConfiguracionPrecios = ConfiguracionPrecios()
+    impresion: ConfiguracionImpresion = ConfiguracionImpresion()
+    # Claves que no forman parte del esquema, sin convertir y de solo lectura.
+    extra: MappingProxyType = dataclasses.field(default_factory=lambda: MappingProxyType({}))
+
+
+SECCIONES = {
+    'impuestos': ConfiguracionImpuestos,
+    'precios': ConfiguracionPrecios,
+    'impresion': ConfiguracionImpresion,
+}
+SIMPLES = ('moneda', 'zona_horaria')
+
+
+# --- Conversión de valores JSON ---
+def _decimal(valor):
+    if isinstance(valor, bool):
+        raise ValueError
+    try:
+        return Decimal(str(valor))
+    except InvalidOperation:
+        raise ValueError
+
+
+def _bool(valor):
+    if not isinstance(valor, bool):
+        raise ValueError
+    return valor
+
+
+def _int(valor):
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise ValueError
+    return valor
+
+
+def _str(valor):
+    if not isinstance(valor, str):
+        raise ValueError
+    return valor
+
+
+CONVERSORES = {Decimal: _decimal, bool: _bool, int: _int, str: _str}
+
+
+def _convertir_seccion(clase, valores, ruta, errores=None):
+    """
+    Valores de la sección convertidos a sus tipos. Un valor inválido lanza
+    ValidationError o, si se pasa la lista `errores`, se anota en ella y se
+    omite.
+    """
+    def error(mensaje):
+        if errores is None:
+            raise ValidationError(mensaje)
+        errores.append(mensaje)
+
+    if not isinstance(valores, dict):
+        error(f"'{ruta}' debe ser un objeto JSON.")
+        return {}
+    convertidos = {}
+    for campo in dataclasses.fields(clase):
+        if campo.name not in valores:
+            continue
+        try:
+            convertidos[campo.name] = CONVERSORES[campo.type](valores[campo.name])
+        except ValueError:
+            error(f"'{ruta}.{campo.name}' debe ser de tipo {campo.type.__name__}.")
+    return convertidos
+
+
+def validar_configuracion(datos, campo):
+    """
+    Verifica que un JSON de configuración (Empresa.metadatos o
+    Sucursal.configuracion) tenga los tipos esperados en las claves del
+    esquema. Las claves desconocidas se aceptan y van a `extra`.
+    """
+    if datos is None:
+        return
+    if not isinstance(datos, dict):
+        raise ValidationError({campo: "Debe ser un objeto JSON."})
+    try:
+        for nombre, clase in SECCIONES.items():
+            if nombre in datos:
+                _convertir_seccion(clase, datos[nombre], nombre)
+        for nombre in SIMPLES:
+            if nombre in datos:
+                try:
+                    _str(datos[nombre])
+                except ValueError:
+                    raise ValidationError(f"'{nombre}' debe ser de tipo str.")
+    except ValidationError as error:
+        raise ValidationError({campo: error.messages})
+
+
+def debe_validar(kwargs, campo):
+    """
+    Si save(**kwargs) debe validar el JSON de `campo`: no en el soft delete
+    (keep_deleted) ni cuando update_fields no lo incluye.
+    """
+    update_fields = kwargs.get('update_fields')
+    return not kwargs.get('keep_deleted') and (update_fields is None or campo in update_fields)
+
+
+def resolver(sucursal_id, empresa_id, metadatos, configuracion):
+    """
+    Mezcla los valores por defecto, los de la empresa y los de la sucursal
+    (en ese orden) en un ConfiguracionSucursal. Los valores inválidos (datos
+    guardados sin pasar por save(), como queryset.update() o loadall) se
+    omiten con una advertencia en el log: se usa el valor heredado.
+    """
+    capas = [datos for datos in (metadatos, configuracion) if isinstance(datos, dict)]
+    errores = []
+    secciones = {}
+    for nombre, clase in SECCIONES.items():
+        valores = {}
+        for datos in capas:
+            if nombre in datos:
+                valores.update(_convertir_seccion(clase, datos[nombre], nombre, errores))
+        secciones[nombre] = clase(**valores)
+
+    simples, extra = {}, {}
+    for datos in capas:
+        for clave, valor in datos.items():
+            if clave in SIMPLES:
+                try:
+                    simples[clave] = _str(valor)
+                except ValueError:
+                    errores.append(f"'{clave}' debe ser de tipo str.")
+            elif clave not in SECCIONES:
+                extra[clave] = valor
+    if errores:
+        logger.warning(
+            "Configuración inválida de la sucursal %s (se usan los valores heredados): %s",
+            sucursal_id, ' '.join(errores),
+        )
+    return ConfiguracionSucursal(
+        sucursal_id=sucursal_id, empresa_id=empresa_id, extra=MappingProxyType(extra), **simples, **secciones,
+    )
+
+
+# --- Cache en memoria del proceso ---
+_bloqueo = threading.Lock()
+_configuraciones = {}
+_version = None
+
+
+def obtener_configuracion(sucursal_id) -> Optional[ConfiguracionSucursal]:
+    """
+    Configuración efectiva de la sucursal, o None si no existe (o está
+    eliminada). Solo consulta la base de datos la primera vez que se pide
+    cada sucursal tras un cambio de versión.
+    """
+    global _configuraciones, _version
+    version = version_actual(CLAVE_VERSION)
+    if version != _version:
+        with _bloqueo:
+            if version != _version:
+                _configuraciones, _version = {}, version
+    configuracion = _configuraciones.get(sucursal_id)
+    if configuracion is None:
+        configuracion = _cargar(sucursal_id)
+        # Las sucursales inexistentes no se guardan: pueden estar por
+        # confirmarse. Si el sello cambió mientras se leía, la fila puede ser
+        # anterior al cambio: no se guarda en el diccionario de la versión nueva.
+        if configuracion is not None:
+            with _bloqueo:
+                if _version == version:
+                    _configuraciones[sucursal_id] = configuracion
+    return configuracion
+
+
+def _cargar(sucursal_id):
+    from .models import Sucursal
+
+    with lectura_primaria():
+        fila = (
+            Sucursal.objects.filter(pk=sucursal_id, empresa__deleted__isnull=True)
+            .values_list('empresa_id', 'empresa__metadatos', 'configuracion')
+            .first()
+        )
+    if fila is None:
+        return None
+    empresa_id, metadatos, configuracion = fila
+    return resolver(sucursal_id, empresa_id, metadatos, configuracion)
+
+
+def invalidar_configuracion():
+    nueva_version(CLAVE_VERSION)
@@ -3,6 +3,7 @@
 from django.db import models
 from safedelete.models import SafeDeleteModel
 from core.enums import EstadoGeneral, TipoEmpresa, TipoSucursal
+from .configuracion import debe_validar, validar_configuracion
 
 class Empresa(SafeDeleteModel):
     """
@@ -33,6 +34,17 @@ class Empresa(SafeDeleteModel):
     def __str__(self):
         return self.nombre
 
+    def clean(self):
+        super().clean()
+        # Los valores por defecto de las sucursales (ver organizacion/configuracion.py).
+        validar_configuracion(self.metadatos, 'metadatos')
+
+    def save(self, *args, **kwargs):
+        # También al guardar fuera de un formulario (API, shell, scripts).
+        if debe_validar(kwargs, 'metadatos'):
+            validar_configuracion(self.metadatos, 'metadatos')
+        super().save(*args, **kwargs)
+
 class Sucursal(SafeDeleteModel):
     """
     Modelo para las sucursales o sedes de una empresa.
@@ -80,4 +92,14 @@ class Sucursal(SafeDeleteModel):
         unique_together = [['empresa', 'nombre']]
 
     def __str__(self):
-        return f"{self.nombre} ({self.empresa.nombre})"
\ No newline at end of file
+        return f"{self.nombre} ({self.empresa.nombre})"
+
+    def clean(self):
+        super().clean()
+        validar_configuracion(self.configuracion, 'configuracion')
+
+    def save(self, *args, **kwargs):
+        if debe_validar(kwargs, 'configuracion'):
+            validar_configuracion(self.configuracion, 'configuracion')
+        super().save(*args, **kwargs)
+
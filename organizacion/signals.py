@@ -0,0 +1,20 @@
+# organizacion/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .configuracion import invalidar_configuracion
+from .models import Empresa, Sucursal
+
+# --- Invalidación de la configuración de sucursales en memoria ---
+# El soft delete de safedelete guarda el objeto, así que también dispara post_save.
+# queryset.update() no dispara señales: quien lo use sobre metadatos o
+# configuracion debe llamar a invalidar_configuracion() directamente.
+# Se invalida al confirmar la transacción: si se hiciera antes, otro proceso
+# podría releer la fila vieja y guardarla con el sello nuevo.
+
+
+@receiver([post_save, post_delete], sender=Empresa)
+@receiver([post_save, post_delete], sender=Sucursal)
+def invalidar_configuracion_sucursales(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_configuracion)
@@ -1,3 +1,118 @@
+# organizacion/tests.py
+import dataclasses
+from decimal import Decimal
+from unittest import mock
+
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
-# Create your tests here.
+from core.testing import crear_sucursal
+from . import configuracion as modulo
+from .configuracion import invalidar_configuracion, obtener_configuracion
+from .models import Sucursal
+
+
+class ConfiguracionSucursalTests(TestCase):
+    """
+    Configuración efectiva por sucursal: mezcla, tipos, cache e invalidación.
+    """
+
+    def setUp(self):
+        self.sucursal = crear_sucursal()
+        self.empresa = self.sucursal.empresa
+        self.empresa.metadatos = {
+            'moneda': 'COP',
+            'impuestos': {'iva': '19', 'precios_incluyen_iva': False},
+            'impresion': {'impresora': 'general', 'copias': 2},
+            'representante': 'Ana',
+        }
+        self.empresa.save()
+        self.sucursal.configuracion = {'impresion': {'impresora': 'caja-1'}, 'precios': {'redondeo': 50}}
+        self.sucursal.save()
+        # Las señales invalidan al confirmar, y TestCase nunca confirma.
+        invalidar_configuracion()
+
+    def test_mezcla_empresa_y_sucursal(self):
+        configuracion = obtener_configuracion(self.sucursal.pk)
+        self.assertEqual(configuracion.empresa_id, self.empresa.pk)
+        self.assertEqual(configuracion.impuestos.iva, Decimal('19'))
+        self.assertIs(configuracion.impuestos.precios_incluyen_iva, False)
+        # La sucursal cambia la impresora y hereda las copias de la empresa.
+        self.assertEqual((configuracion.impresion.impresora, configuracion.impresion.copias), ('caja-1', 2))
+        self.assertEqual(configuracion.impresion.ancho_papel_mm, 80)
+        self.assertEqual(configuracion.precios.redondeo, Decimal('50'))
+        self.assertEqual(configuracion.extra['representante'], 'Ana')
+
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            configuracion.moneda = 'USD'
+        with self.assertRaises(TypeError):
+            configuracion.extra['representante'] = 'Luis'
+
+    def test_cache_e_invalidacion(self):
+        obtener_configuracion(self.sucursal.pk)
+        with self.assertNumQueries(0):
+            obtener_configuracion(self.sucursal.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empresa.metadatos['impuestos']['iva'] = '5'
+            self.empresa.save()
+        self.assertEqual(obtener_configuracion(self.sucursal.pk).impuestos.iva, Decimal('5'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sucursal.configuracion = {}
+            self.sucursal.save()
+        self.assertEqual(obtener_configuracion(self.sucursal.pk).impresion.impresora, 'general')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sucursal.delete()
+        self.assertIsNone(obtener_configuracion(self.sucursal.pk))
+
+    def test_valida_tipos_al_limpiar(self):
+        self.sucursal.configuracion = {'impuestos': {'iva': 'diecinueve'}}
+        with self.assertRaises(ValidationError) as contexto:
+            self.sucursal.clean()
+        self.assertIn('configuracion', contexto.exception.message_dict)
+
+        self.empresa.metadatos = {'impresion': {'copias': '2'}}
+        with self.assertRaises(ValidationError):
+            self.empresa.clean()
+
+        # Las claves fuera del esquema se aceptan tal cual.
+        self.sucursal.configuracion = {'horario': {'abre': '08:00'}}
+        self.sucursal.clean()
+
+    def test_valida_al_guardar(self):
+        self.sucursal.configuracion = {'impuestos': {'iva': 'diecinueve'}}
+        with self.assertRaises(ValidationError):
+            self.sucursal.save()
+        # El soft delete no revisa el JSON.
+        self.sucursal.delete()
+
+    def test_datos_invalidos_usan_los_valores_heredados(self):
+        # queryset.update() no pasa por save().
+        Sucursal.objects.filter(pk=self.sucursal.pk).update(
+            configuracion={'impuestos': {'iva': 'diecinueve'}, 'impresion': {'copias': 3}, 'moneda': ['USD']},
+        )
+        invalidar_configuracion()
+        with self.assertLogs('organizacion.configuracion', 'WARNING') as logs:
+            configuracion = obtener_configuracion(self.sucursal.pk)
+        self.assertEqual((configuracion.impuestos.iva, configuracion.moneda), (Decimal('19'), 'COP'))
+        self.assertEqual(configuracion.impresion.copias, 3)
+        self.assertIn("'impuestos.iva'", logs.output[0])
+
+    def test_no_guarda_lo_leido_antes_de_un_cambio(self):
+        cargar = modulo._cargar
+
+        def cargar_y_cambiar(sucursal_id):
+            leida = cargar(sucursal_id)
+            if sucursal_id == self.sucursal.pk:
+                # Otro proceso confirma un cambio mientras se lee la fila y
+                # otro hilo pasa a la versión nueva.
+                invalidar_configuracion()
+                obtener_configuracion(0)
+            return leida
+
+        with mock.patch.object(modulo, '_cargar', side_effect=cargar_y_cambiar):
+            obtener_configuracion(self.sucursal.pk)
+        with self.assertNumQueries(1):
+            obtener_configuracion(self.sucursal.pk)
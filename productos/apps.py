@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'productos'
+
+    def ready(self):
+        from .atributos import instalar_indice_atributos
+        from .busqueda import instalar_busqueda
+        from . import signals  # noqa: F401 (registra los receptores de invalidación)
+
+        # Las estructuras de búsqueda dependen del motor de base de datos,
+        # por eso se instalan después de cada migrate y no en el modelo.
+        post_migrate.connect(instalar_busqueda, sender=self)
+        post_migrate.connect(instalar_indice_atributos, sender=self)
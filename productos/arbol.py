@@ -0,0 +1,127 @@
+# productos/arbol.py
+"""
+Árbol de categorías en memoria, compartido por todo el proceso.
+
+Se construye con una sola consulta a partir de categoria_padre_id y se reutiliza
+mientras no cambie el sello de versión guardado en la cache 'default'
+(lo cambian las señales de Categoria, ver productos/signals.py). Así, cada
+petición solo paga una lectura de cache para saber si el árbol sigue vigente.
+"""
+import threading
+
+from core.replicas import lectura_primaria
+from core.versiones import nueva_version, version_actual
+
+from .models import Categoria
+
+CLAVE_VERSION = 'productos:arbol_categorias:version'
+
+
+class NodoCategoria:
+    __slots__ = ('id', 'nombre', 'padre_id', 'ruta', 'hijos')
+
+    def __init__(self, id, nombre, padre_id, ruta):
+        self.id = id
+        self.nombre = nombre
+        self.padre_id = padre_id
+        self.ruta = ruta
+        self.hijos = []
+
+
+class ArbolCategorias:
+    """
+    Árbol inmutable de categorías activas (sin eliminar).
+    Una categoría eliminada oculta todo su subárbol; al restaurarla
+    (undelete) el subárbol reaparece intacto porque los padres no cambian.
+
+    La estructura sale solo de categoria_padre_id: ruta y nivel pueden estar
+    desactualizados (un padre movido antes de recalcular las rutas) y el
+    nivel solo se usa para ordenar.
+    """
+
+    def __init__(self, filas):
+        por_padre = {}
+        for id, nombre, padre_id, ruta, nivel in sorted(filas, key=lambda fila: fila[4]):
+            por_padre.setdefault(padre_id, []).append(NodoCategoria(id, nombre, padre_id, ruta))
+
+        # Solo lo alcanzable desde las raíces: los hijos de una categoría
+        # eliminada quedan fuera.
+        vivos = {}
+        pendientes = list(por_padre.get(None, ()))
+        while pendientes:
+            nodo = pendientes.pop()
+            vivos[nodo.id] = nodo
+            hijos = por_padre.get(nodo.id, ())
+            nodo.hijos = [hijo.id for hijo in hijos]
+            pendientes.extend(hijos)
+
+        self.nodos = vivos
+        self.raices = [nodo.id for nodo in por_padre.get(None, ())]
+        self._descendientes = {}
+
+    @classmethod
+    @lectura_primaria()
+    def desde_base_de_datos(cls):
+        filas = Categoria.objects.values_list('id', 'nombre', 'categoria_padre_id', 'ruta', 'nivel')
+        return cls(list(filas))
+
+    def __contains__(self, categoria_id):
+        return categoria_id in self.nodos
+
+    def descendientes(self, categoria_id, incluir_propia=True):
+        """
+        Ids del subárbol de la categoría. Se calcula una vez y queda memorizado.
+        """
+        if categoria_id not in self.nodos:
+            return frozenset()
+        if categoria_id not in self._descendientes:
+            ids = []
+            pendientes = [categoria_id]
+            while pendientes:
+                actual = pendientes.pop()
+                ids.append(actual)
+                pendientes.extend(self.nodos[actual].hijos)
+            self._descendientes[categoria_id] = frozenset(ids)
+        ids = self._descendientes[categoria_id]
+        return ids if incluir_propia else ids - {categoria_id}
+
+    def ancestros(self, categoria_id):
+        """
+        Ids desde la raíz hasta el padre de la categoría, subiendo por los padres.
+        """
+        if categoria_id not in self.nodos:
+            return []
+        ids = []
+        padre_id = self.nodos[categoria_id].padre_id
+        while padre_id is not None:
+            ids.append(padre_id)
+            padre_id = self.nodos[padre_id].padre_id
+        return ids[::-1]
+
+    def migas(self, categoria_id):
+        """
+        Ruta de navegación (breadcrumb): [(id, nombre), ...] desde la raíz hasta la categoría.
+        """
+        if categoria_id not in self.nodos:
+            return []
+        ids = self.ancestros(categoria_id) + [categoria_id]
+        return [(pk, self.nodos[pk].nombre) for pk in ids]
+
+
+_bloqueo = threading.Lock()
+_arbol = None
+_version = None
+
+
+def obtener_arbol():
+    global _arbol, _version
+    version = version_actual(CLAVE_VERSION)
+    if _arbol is None or version != _version:
+        with _bloqueo:
+            if _arbol is None or version != _version:
+                _arbol, _version = ArbolCategorias.desde_base_de_datos(), version
+    return _arbol
+
+
+def invalidar_arbol():
+    nueva_version(CLAVE_VERSION)
@@ -0,0 +1,139 @@
+# productos/atributos.py
+"""
+Filtros y facetas sobre Producto.atributos (color, talla, marca, ...).
+
+- Filtro: ?attr.color=rojo&attr.talla=M. En PostgreSQL se traduce a
+  atributos @> '{"color": "rojo", "talla": "M"}', que usa el índice GIN
+  (jsonb_path_ops) instalado en post_migrate.
+- Facetas: conteo de productos por clave y valor en una sola consulta
+  agregada (jsonb_each / json_each), cacheada por versión del catálogo.
+"""
+import hashlib
+import json
+import re
+from collections import Counter
+
+from django.db import connections
+
+from core.replicas import lectura_primaria
+
+from .cache import obtener_cache, version_catalogo
+
+PREFIJO_PARAMETRO = 'attr.'
+# Sin '__' para que la clave no se interprete como una transformación del ORM.
+PATRON_CLAVE = re.compile(r'^(?!.*__)[A-Za-z0-9_-]{1,50}$')
+TIMEOUT_FACETAS = 60 * 60
+
+
+def extraer_filtros(parametros):
+    """
+    Devuelve {clave: valor} a partir de los parámetros ?attr.<clave>=<valor>.
+    Lanza ValueError si alguna clave no es válida.
+    """
+    filtros = {}
+    for nombre, valor in parametros.items():
+        if not nombre.startswith(PREFIJO_PARAMETRO):
+            continue
+        clave = nombre[len(PREFIJO_PARAMETRO):]
+        if not PATRON_CLAVE.match(clave):
+            raise ValueError(f"Atributo inválido: {clave!r}.")
+        filtros[clave] = valor
+    return filtros
+
+
+def instalar_indice_atributos(sender, using='default', **kwargs):
+    """
+    Receptor de post_migrate: índice GIN jsonb_path_ops (solo PostgreSQL).
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    tabla = connection.ops.quote_name('productos_producto')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS productos_producto_atributos_gin "
+            f"ON {tabla} USING gin (atributos jsonb_path_ops)"
+        )
+
+
+# Una fila por (clave, valor) escalar de cada producto del queryset.
+SQL_FACETAS = {
+    'postgresql': """
+        SELECT kv.key, kv.value #>> '{{}}', COUNT(*)
+        FROM {tabla} p CROSS JOIN LATERAL jsonb_each(p.atributos) kv
+        WHERE p.id IN ({ids}) AND jsonb_typeof(p.atributos) = 'object'
+          AND jsonb_typeof(kv.value) IN ('string', 'number', 'boolean')
+        GROUP BY 1, 2
+    """,
+    'sqlite': """
+        SELECT kv.key, CASE WHEN kv.type IN ('true', 'false') THEN kv.type ELSE kv.value END, COUNT(*)
+        FROM {tabla} p, json_each(p.atributos) kv
+        WHERE p.id IN ({ids}) AND json_type(p.atributos) = 'object'
+          AND kv.type IN ('text', 'integer', 'real', 'true', 'false')
+        GROUP BY 1, 2
+    """,
+}
+
+
+def contar_facetas(queryset):
+    """
+    {clave: {valor: cantidad}} para los productos del queryset, ordenado por
+    clave y, dentro de cada clave, por cantidad descendente.
+    """
+    connection = connections[queryset.db]
+    sql = SQL_FACETAS.get(connection.vendor)
+    if sql is None:
+        filas = _contar_en_python(queryset)
+    else:
+        ids = queryset.order_by().values('pk')
+        ids_sql, params = ids.query.get_compiler(queryset.db).as_sql()
+        tabla = connection.ops.quote_name(queryset.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(tabla=tabla, ids=ids_sql), params)
+            filas = cursor.fetchall()
+
+    facetas = {}
+    for clave, valor, cantidad in sorted(filas, key=lambda fila: (fila[0], -fila[2], str(fila[1]))):
+        facetas.setdefault(clave, {})[_texto(valor)] = cantidad
+    return facetas
+
+
+def _texto(valor):
+    # Los booleanos se muestran como en JSON ('true'/'false').
+    if isinstance(valor, bool):
+        return json.dumps(valor)
+    return str(valor)
+
+
+def _contar_en_python(queryset):
+    # Motores sin función para expandir JSON (MySQL): se recorre por bloques.
+    conteo = Counter()
+    for atributos in queryset.order_by().values_list('atributos', flat=True).iterator(chunk_size=2000):
+        if isinstance(atributos, dict):
+            conteo.update(
+                (clave, _texto(valor)) for clave, valor in atributos.items()
+                if isinstance(valor, (str, int, float, bool))
+            )
+    return [(clave, valor, cantidad) for (clave, valor), cantidad in conteo.items()]
+
+
+def facetas_cacheadas(queryset, parametros):
+    """
+    contar_facetas() cacheado por versión del catálogo y por los parámetros
+    de filtro de la petición: cualquier cambio en productos invalida todo.
+    """
+    # Solo los parámetros que cambian el resultado (no cursor, page_size, etc.).
+    filtros = sorted(
+        (nombre, valor) for nombre, valor in parametros.items()
+        if nombre == 'categoria' or nombre.startswith(PREFIJO_PARAMETRO)
+    )
+    firma = hashlib.sha1(json.dumps(filtros, ensure_ascii=False).encode('utf-8')).hexdigest()
+    clave = f'productos:facetas:{version_catalogo()}:{firma}'
+    cache = obtener_cache()
+    facetas = cache.get(clave)
+    if facetas is None:
+        # Se guarda con la versión vigente: no puede venir de una réplica atrasada.
+        with lectura_primaria():
+            facetas = contar_facetas(queryset)
+        cache.set(clave, facetas, TIMEOUT_FACETAS)
+    return facetas
@@ -0,0 +1,184 @@
+# productos/busqueda.py
+"""
+Motor de búsqueda de texto completo para productos.
+
+Cada motor de base de datos tiene su propio backend:
+- PostgreSQL: columna tsvector generada (STORED) con configuración española
+  sin tildes, índice GIN sobre ella e índice de trigramas sobre 'codigo'.
+- SQLite: tabla virtual FTS5 sincronizada con triggers.
+- Otros (MySQL): filtro icontains sobre nombre, código y descripción.
+
+Las estructuras no se declaran en el modelo porque son específicas de cada
+motor; se instalan de forma idempotente con la señal post_migrate.
+Como las mantiene la propia base de datos (columna generada o triggers),
+quedan sincronizadas en save(), bulk_create() y queryset.update().
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Solo letras y números: el resto se descarta para no inyectar operadores.
+PATRON_TERMINO = re.compile(r'[^\W_]+')
+MAX_TERMINOS = 10
+
+
+def extraer_terminos(texto):
+    return PATRON_TERMINO.findall(texto.lower())[:MAX_TERMINOS]
+
+
+class BackendBusqueda:
+    """
+    Backend por defecto: filtro icontains sin ranking.
+    """
+
+    def instalar(self, connection):
+        pass
+
+    def reindexar(self, connection):
+        pass
+
+    def buscar(self, queryset, texto):
+        return queryset.filter(
+            Q(nombre__icontains=texto) | Q(codigo__icontains=texto) | Q(descripcion__icontains=texto)
+        ).annotate(rango=Value(0.0, output_field=FloatField()))
+
+
+class PostgresBackendBusqueda(BackendBusqueda):
+    """
+    Búsqueda con tsvector + GIN y trigramas (pg_trgm) para el SKU.
+    """
+    configuracion = 'es_unaccent'
+
+    def instalar(self, connection):
+        tabla = connection.ops.quote_name('productos_producto')
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            # Configuración española que además elimina tildes antes de aplicar el stemmer.
+            cursor.execute(f"""
+                DO $$ BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{self.configuracion}') THEN
+                        CREATE TEXT SEARCH CONFIGURATION {self.configuracion} (COPY = pg_catalog.spanish);
+                        ALTER TEXT SEARCH CONFIGURATION {self.configuracion}
+                            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+                    END IF;
+                END $$;
+            """)
+            cursor.execute(f"""
+                ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS busqueda tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('{self.configuracion}'::regconfig, coalesce(nombre, '')), 'A') ||
+                    setweight(to_tsvector('{self.configuracion}'::regconfig, coalesce(codigo, '')), 'A') ||
+                    setweight(to_tsvector('{self.configuracion}'::regconfig, coalesce(descripcion, '')), 'C')
+                ) STORED
+            """)
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS productos_producto_busqueda_gin ON {tabla} USING gin (busqueda)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS productos_producto_codigo_trgm ON {tabla} "
+                f"USING gin (codigo gin_trgm_ops)"
+            )
+
+    def buscar(self, queryset, texto):
+        terminos = extraer_terminos(texto)
+        if not terminos:
+            return super().buscar(queryset, texto)
+
+        tabla = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+        # Búsqueda por prefijo para que funcione mientras el usuario escribe.
+        consulta = ' & '.join(f"{termino}:*" for termino in terminos)
+        tsquery = f"to_tsquery('{self.configuracion}'::regconfig, %s)"
+        patron = '%' + re.sub(r'([\\%_])', r'\\\1', texto) + '%'
+
+        coincide = RawSQL(
+            f"({tabla}.busqueda @@ {tsquery} OR {tabla}.codigo ILIKE %s)",
+            [consulta, patron],
+            output_field=BooleanField(),
+        )
+        rango = RawSQL(f"ts_rank({tabla}.busqueda, {tsquery})", [consulta], output_field=FloatField())
+        return queryset.filter(coincide).annotate(rango=rango).order_by('-rango', 'nombre', 'id')
+
+
+class SqliteBackendBusqueda(BackendBusqueda):
+    """
+    Búsqueda con una tabla FTS5 de contenido externo (usada en pruebas y desarrollo).
+    """
+    tabla_fts = 'productos_producto_fts'
+
+    def instalar(self, connection):
+        fts = self.tabla_fts
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    nombre, codigo, descripcion,
+                    content='productos_producto', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON productos_producto BEGIN
+                    INSERT INTO {fts}(rowid, nombre, codigo, descripcion)
+                    VALUES (new.id, new.nombre, new.codigo, new.descripcion);
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON productos_producto BEGIN
+                    INSERT INTO {fts}({fts}, rowid, nombre, codigo, descripcion)
+                    VALUES ('delete', old.id, old.nombre, old.codigo, old.descripcion);
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON productos_producto BEGIN
+                    INSERT INTO {fts}({fts}, rowid, nombre, codigo, descripcion)
+                    VALUES ('delete', old.id, old.nombre, old.codigo, old.descripcion);
+                    INSERT INTO {fts}(rowid, nombre, codigo, descripcion)
+                    VALUES (new.id, new.nombre, new.codigo, new.descripcion);
+                END
+            """)
+        # Las migraciones de SQLite reconstruyen la tabla (y sus triggers),
+        # así que reconstruimos el índice cada vez que se instala.
+        self.reindexar(connection)
+
+    def reindexar(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.tabla_fts}({self.tabla_fts}) VALUES ('rebuild')")
+
+    def buscar(self, queryset, texto):
+        terminos = extraer_terminos(texto)
+        if not terminos:
+            return super().buscar(queryset, texto)
+
+        fts = self.tabla_fts
+        tabla = connections[queryset.db].ops.quote_name(queryset.model._meta.db_table)
+        # Cada término entre comillas y con '*' para buscar por prefijo (AND implícito).
+        consulta = ' '.join(f'"{termino}"*' for termino in terminos)
+
+        # Unimos la tabla FTS5 con un JOIN en lugar de una subconsulta correlacionada:
+        # así bm25() se calcula una sola vez por coincidencia. bm25 devuelve valores
+        # menores para mejores coincidencias; lo negamos para ordenar igual que ts_rank.
+        return queryset.extra(
+            tables=[fts],
+            where=[f"{fts}.rowid = {tabla}.id", f"{fts} MATCH %s"],
+            params=[consulta],
+            select={'rango': f"-bm25({fts}, 10.0, 10.0, 1.0)"},
+        ).order_by('-rango', 'nombre', 'id')
+
+
+BACKENDS = {
+    'postgresql': PostgresBackendBusqueda(),
+    'sqlite': SqliteBackendBusqueda(),
+}
+
+
+def obtener_backend(using='default'):
+    return BACKENDS.get(connections[using].vendor, BackendBusqueda())
+
+
+def instalar_busqueda(sender, using='default', **kwargs):
+    """
+    Receptor de post_migrate: crea (o recrea) las estructuras de búsqueda.
+    """
+    obtener_backend(using).instalar(connections[using])
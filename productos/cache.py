@@ -0,0 +1,178 @@
+# productos/cache.py
+"""
+Cache de fragmentos de plantillas de productos.
+
+Cada producto tiene un "sello de versión" en la cache. Las claves de los
+fragmentos incluyen ese sello, así que para invalidar basta con cambiarlo
+(ver productos/signals.py): los fragmentos viejos nunca se vuelven a leer
+y expiran solos. El backend es el alias 'fragmentos' de settings.CACHES.
+"""
+import threading
+from collections import Counter
+
+from django.core.cache import caches
+
+from core.versiones import nuevo_sello, version_actual
+
+ALIAS = 'fragmentos'
+# Los fragmentos expiran solos; los sellos de versión no.
+TIMEOUT_FRAGMENTO = 60 * 60 * 24
+CLAVE_CATALOGO = 'productos:version:catalogo'
+CLAVE_STOCK = 'productos:version:stock'
+CLAVE_ACIERTOS = 'fragmentos:aciertos'
+CLAVE_FALLOS = 'fragmentos:fallos'
+CLAVE_NO_MODIFICADAS = 'condicional:no_modificadas'
+CLAVE_COMPLETAS = 'condicional:completas'
+
+
+def obtener_cache():
+    return caches[ALIAS]
+
+
+def clave_version(pk):
+    return f'productos:version:{pk}'
+
+
+def clave_fragmento(nombre, pk, version):
+    return f'productos:fragmento:{nombre}:{pk}:{version}'
+
+
+def version_producto(pk):
+    return version_actual(clave_version(pk), obtener_cache())
+
+
+def versiones_productos(pks):
+    """
+    Sellos de versión de varios productos con una sola lectura (get_many).
+    """
+    cache = obtener_cache()
+    claves = {clave_version(pk): pk for pk in pks}
+    encontradas = cache.get_many(claves)
+    versiones = {claves[clave]: version for clave, version in encontradas.items()}
+    faltantes = {clave: nuevo_sello() for clave, pk in claves.items() if pk not in versiones}
+    if faltantes:
+        cache.set_many(faltantes, timeout=None)
+        versiones.update({claves[clave]: version for clave, version in faltantes.items()})
+    return versiones
+
+
+def fragmentos_productos(nombre, versiones):
+    """
+    Fragmentos `nombre` ya cacheados de varios productos con una sola lectura
+    (get_many). Devuelve {clave: contenido o None} con todas las claves
+    pedidas: una clave con None es un fallo conocido, sin volver a leerla.
+    """
+    claves = [clave_fragmento(nombre, pk, version) for pk, version in versiones.items()]
+    encontrados = obtener_cache().get_many(claves)
+    return {clave: encontrados.get(clave) for clave in claves}
+
+
+def version_catalogo():
+    """
+    Sello que cambia con cualquier cambio en productos o categorías, salvo el
+    stock. Sirve para cachear resultados que dependen de todo el catálogo
+    (por ejemplo, facetas).
+    """
+    return version_actual(CLAVE_CATALOGO, obtener_cache())
+
+
+def version_stock():
+    """
+    Sello que cambia con el stock de cualquier producto (ver invalidar_stock).
+    """
+    return version_actual(CLAVE_STOCK, obtener_cache())
+
+
+def invalidar_productos(pks):
+    """
+    Cambia el sello de versión de los productos indicados y el del catálogo.
+    """
+    _invalidar(pks, CLAVE_CATALOGO)
+
+
+def invalidar_stock(pks):
+    """
+    Como invalidar_productos(), para cambios de stock y stock mínimo: cambia
+    el sello del stock en lugar del catálogo. Así una venta no invalida las
+    facetas.
+    """
+    _invalidar(pks, CLAVE_STOCK)
+
+
+def _invalidar(pks, clave_global):
+    sello = nuevo_sello()
+    claves = {clave_version(pk): sello for pk in pks}
+    claves[clave_global] = sello
+    obtener_cache().set_many(claves, timeout=None)
+
+
+# --- Estadísticas de aciertos y fallos ---
+# Se guardan en la misma cache para que sumen los de todos los procesos.
+# Los de fragmentos se acumulan en el hilo y se envían al terminar la
+# petición (request_finished, ver productos/signals.py): un incr por
+# contador y petición, no uno por fila.
+_pendientes = threading.local()
+
+
+def incrementar(clave, cantidad=1):
+    cache = obtener_cache()
+    try:
+        cache.incr(clave, cantidad)
+    except ValueError:
+        # La clave aún no existe (o expiró).
+        if not cache.add(clave, cantidad, timeout=None):
+            cache.incr(clave, cantidad)
+
+
+def registrar(acierto):
+    contadores = getattr(_pendientes, 'contadores', None)
+    if contadores is None:
+        contadores = _pendientes.contadores = Counter()
+    contadores[CLAVE_ACIERTOS if acierto else CLAVE_FALLOS] += 1
+
+
+def enviar_estadisticas():
+    contadores = getattr(_pendientes, 'contadores', None)
+    _pendientes.contadores = None
+    for clave, cantidad in (contadores or {}).items():
+        incrementar(clave, cantidad)
+
+
+def estadisticas():
+    # Incluye lo pendiente de este hilo (por ejemplo, fuera de una petición).
+    enviar_estadisticas()
+    valores = obtener_cache().get_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+    aciertos = valores.get(CLAVE_ACIERTOS, 0)
+    fallos = valores.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': aciertos / total if total else 0.0,
+    }
+
+
+def reiniciar_estadisticas():
+    _pendientes.contadores = None
+    obtener_cache().delete_many([CLAVE_ACIERTOS, CLAVE_FALLOS])
+
+
+# --- Estadísticas de GET condicionales (ver productos/condicional.py) ---
+def registrar_condicional(no_modificada):
+    incrementar(CLAVE_NO_MODIFICADAS if no_modificada else CLAVE_COMPLETAS)
+
+
+def estadisticas_condicional():
+    valores = obtener_cache().get_many([CLAVE_NO_MODIFICADAS, CLAVE_COMPLETAS])
+    no_modificadas = valores.get(CLAVE_NO_MODIFICADAS, 0)
+    completas = valores.get(CLAVE_COMPLETAS, 0)
+    total = no_modificadas + completas
+    return {
+        'no_modificadas': no_modificadas,
+        'completas': completas,
+        'tasa_304': no_modificadas / total if total else 0.0,
+    }
+
+
+def reiniciar_estadisticas_condicional():
+    obtener_cache().delete_many([CLAVE_NO_MODIFICADAS, CLAVE_COMPLETAS])
@@ -0,0 +1,80 @@
+# productos/carga_masiva.py
+"""
+Carga masiva de productos (upsert por SKU) para sincronizar catálogos externos.
+"""
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from .cache import invalidar_productos
+from .models import Producto
+from .serializers import ProductoCargaMasivaSerializer
+
+MAX_FILAS = 50_000
+TAMANO_LOTE = 1000
+
+
+def sincronizar_productos(filas):
+    """
+    Valida cada fila con las reglas de ProductoSerializer y aplica las válidas
+    con bulk_create(update_conflicts=True) en una sola transacción.
+    Las filas inválidas se reportan y no detienen al resto.
+
+    Un producto eliminado (soft delete) cuyo SKU llega en la carga se restaura.
+    La carga no toca el stock: lo lleva el libro de movimientos
+    (transacciones/inventario.py).
+    """
+    validador = ProductoCargaMasivaSerializer()
+    errores = []
+    # Agrupamos por el conjunto de campos enviados, para no sobrescribir con
+    # valores por defecto los campos que una fila no trae.
+    grupos = {}
+    vistos = set()
+
+    for indice, fila in enumerate(filas):
+        try:
+            datos = validador.run_validation(fila)
+        except serializers.ValidationError as error:
+            codigo = fila.get('codigo') if isinstance(fila, dict) else None
+            errores.append({'fila': indice, 'codigo': codigo, 'errores': error.detail})
+            continue
+        if datos['codigo'] in vistos:
+            errores.append({
+                'fila': indice,
+                'codigo': datos['codigo'],
+                'errores': {'codigo': ["SKU repetido en la misma carga."]},
+            })
+            continue
+        vistos.add(datos['codigo'])
+        grupos.setdefault(frozenset(datos), []).append(datos)
+
+    # MySQL no acepta unique_fields: su ON DUPLICATE KEY UPDATE usa
+    # cualquier llave única, y la única del producto es el código.
+    conflicto = {'unique_fields': ['codigo']} if connection.features.supports_update_conflicts_with_target else {}
+    existentes = set()
+    pks = []
+    with transaction.atomic():
+        for campos, validas in grupos.items():
+            campos_actualizar = sorted(campos - {'codigo'}) + ['deleted']
+            for inicio in range(0, len(validas), TAMANO_LOTE):
+                lote = validas[inicio:inicio + TAMANO_LOTE]
+                codigos = [datos['codigo'] for datos in lote]
+                existentes.update(
+                    Producto.all_objects.filter(codigo__in=codigos).order_by().values_list('codigo', flat=True)
+                )
+                Producto.objects.bulk_create(
+                    [Producto(**datos) for datos in lote],
+                    update_conflicts=True,
+                    update_fields=campos_actualizar,
+                    **conflicto,
+                )
+                # No todos los motores devuelven el pk en un upsert; lo consultamos.
+                pks += Producto.objects.filter(codigo__in=codigos).order_by().values_list('pk', flat=True)
+
+        # bulk_create no dispara señales: invalidamos la cache a mano.
+        transaction.on_commit(lambda: invalidar_productos(pks))
+
+    return {
+        'creados': len(vistos - existentes),
+        'actualizados': len(vistos & existentes),
+        'errores': errores,
+    }
@@ -0,0 +1,77 @@
+# productos/condicional.py
+"""
+GET condicional (ETag / If-None-Match) para las vistas de productos.
+
+El ETag se calcula con los sellos de versión de productos/cache.py, que ya
+cambian con cada modificación (ver productos/signals.py). Así, si el cliente
+envía el ETag vigente, respondemos 304 sin ejecutar la consulta principal
+ni renderizar nada.
+
+Una respuesta completa lleva el ETag de la versión vigente, así que el resto
+de la petición lee de la primaria: con una réplica atrasada el cliente
+guardaría contenido viejo con el ETag nuevo.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from core.replicas import fijar_primaria
+from .cache import registrar_condicional, version_catalogo, version_producto, version_stock
+
+
+def calcular_etag(version, request):
+    """
+    Combina el sello de versión con todo lo que cambia el contenido de la
+    respuesta para una misma versión del catálogo: la URL (filtros, página,
+    formato), la plantilla (HTMX o página completa), el renderer (Accept) y la
+    cookie de sesión (el HTML depende del usuario). El token CSRF del HTML no
+    entra: cualquier máscara del mismo secreto es válida y el secreto solo
+    rota al iniciar sesión, cuando también cambia la cookie de sesión.
+    Solo se leen cabeceras y cookies: calcularlo no consulta la base de datos.
+    """
+    partes = [
+        version,
+        request.get_full_path(),
+        request.headers.get('HX-Request', ''),
+        request.headers.get('Accept', ''),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+    ]
+    return hashlib.sha1('\n'.join(partes).encode()).hexdigest()
+
+
+def etag_catalogo(request, *args, **kwargs):
+    # Las listas muestran el stock: dependen de los dos sellos.
+    return calcular_etag(f'{version_catalogo()}:{version_stock()}', request)
+
+
+def etag_producto(request, *args, **kwargs):
+    return calcular_etag(version_producto(kwargs['pk']), request)
+
+
+def get_condicional(etag_func):
+    """
+    Decorador de vistas (usar con method_decorator en CBVs y viewsets).
+    Aplica condition() de Django, obliga al cliente a revalidar siempre
+    (Cache-Control: no-cache) y cuenta las respuestas 304 y completas.
+    """
+    def decorador(vista):
+        vista_condicional = condition(etag_func=etag_func)(vista)
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            # Hasta el final de la petición (la plantilla se renderiza después
+            # de la vista); LecturaPrimariaMiddleware acota el estado a ella.
+            fijar_primaria()
+            response = vista_condicional(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                registrar_condicional(response.status_code == 304)
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Accept', 'HX-Request', 'Cookie'))
+            return response
+
+        return envoltura
+
+    return decorador
@@ -0,0 +1,84 @@
+# productos/exportacion.py
+"""
+Exportación del catálogo de productos en CSV, NDJSON y XLSX.
+
+Los productos se leen por bloques con .iterator(chunk_size=...), con las
+categorías precargadas por bloque, así que la memoria no crece con el
+tamaño del catálogo. CSV y NDJSON se generan fila a fila para enviarlos
+con StreamingHttpResponse; el encabezado sale antes de consultar la base
+de datos, así que el primer byte llega antes de que termine la consulta.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from openpyxl import Workbook
+
+TAMANO_BLOQUE = 2000
+
+COLUMNAS = [
+    ('codigo', 'Código (SKU)'),
+    ('nombre', 'Nombre'),
+    ('descripcion', 'Descripción'),
+    ('stock', 'Stock'),
+    ('stock_minimo', 'Stock mínimo'),
+    ('estado', 'Estado'),
+    ('categoria_principal', 'Categoría principal'),
+    ('categorias', 'Categorías'),
+]
+
+
+def filas_productos(queryset):
+    """
+    Genera un diccionario plano por producto, con sus categorías unidas por ' | '.
+    """
+    queryset = queryset.con_categorias().order_by('nombre', 'id')
+    for producto in queryset.iterator(chunk_size=TAMANO_BLOQUE):
+        enlaces = producto.productocategoria_set.all()
+        principal = next((e.categoria.nombre for e in enlaces if e.es_principal), '')
+        yield {
+            'codigo': producto.codigo or '',
+            'nombre': producto.nombre,
+            'descripcion': producto.descripcion or '',
+            'stock': producto.stock,
+            'stock_minimo': producto.stock_minimo,
+            'estado': producto.estado,
+            'categoria_principal': principal,
+            'categorias': ' | '.join(e.categoria.nombre for e in enlaces),
+        }
+
+
+class _Eco:
+    """
+    Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(queryset):
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca el archivo como UTF-8 (tildes y eñes).
+    yield '\ufeff' + escritor.writerow([titulo for _, titulo in COLUMNAS])
+    for fila in filas_productos(queryset):
+        yield escritor.writerow([fila[campo] for campo, _ in COLUMNAS])
+
+
+def exportar_ndjson(queryset):
+    for fila in filas_productos(queryset):
+        yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def exportar_xlsx(queryset, archivo):
+    """
+    Escribe el libro en `archivo` con el modo write-only de openpyxl, que
+    vuelca las filas a disco en lugar de mantenerlas en memoria. Un XLSX es
+    un ZIP, así que solo puede enviarse cuando está completo.
+    """
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Productos')
+    hoja.append([titulo for _, titulo in COLUMNAS])
+    for fila in filas_productos(queryset):
+        hoja.append([fila[campo] for campo, _ in COLUMNAS])
+    libro.save(archivo)
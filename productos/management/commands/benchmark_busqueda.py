@@ -0,0 +1,77 @@
+# productos/management/commands/benchmark_busqueda.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import reverse
+from safedelete import HARD_DELETE
+
+from productos.models import Producto
+from productos.views import ProductoListView
+
+PREFIJO = 'BENCH-'
+PALABRAS = [
+    'camisa', 'pantalón', 'zapato', 'algodón', 'cuero', 'azul', 'rojo', 'negro',
+    'talla', 'niño', 'mujer', 'hombre', 'deportivo', 'clásico', 'edición', 'lámpara',
+    'mesa', 'silla', 'acero', 'madera', 'vidrio', 'jardín', 'cocina', 'baño',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de la búsqueda HTMX de ProductoListView. "
+        f"Crea productos sintéticos (código '{PREFIJO}...') si hacen falta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=1_000_000)
+        parser.add_argument('--repeticiones', type=int, default=50)
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument(
+            '--limpiar', action='store_true', help="Elimina los productos sintéticos al terminar."
+        )
+
+    def handle(self, *args, **options):
+        self.generar(options['filas'], options['lote'])
+
+        consultas = ['camisa azul', 'zapato cuer', 'lampara', f'{PREFIJO}0001234', 'edicion mujer']
+        fabrica = RequestFactory()
+        vista = ProductoListView.as_view()
+        url = reverse('productos:lista')
+
+        for texto in consultas:
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                request = fabrica.get(url, {'q': texto}, HTTP_HX_REQUEST='true')
+                inicio = time.perf_counter()
+                vista(request).render()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            tiempos.sort()
+            p95 = tiempos[int(len(tiempos) * 0.95) - 1]
+            self.stdout.write(
+                f"{texto!r:>22}: p50={statistics.median(tiempos):.1f} ms  p95={p95:.1f} ms"
+            )
+
+        if options['limpiar']:
+            Producto.all_objects.filter(codigo__startswith=PREFIJO).delete(force_policy=HARD_DELETE)
+            self.stdout.write("Productos sintéticos eliminados.")
+
+    def generar(self, filas, lote):
+        existentes = Producto.all_objects.filter(codigo__startswith=PREFIJO).count()
+        if existentes >= filas:
+            return
+        self.stdout.write(f"Generando {filas - existentes} productos sintéticos...")
+        azar = random.Random(42)
+        for inicio in range(existentes, filas, lote):
+            with transaction.atomic():
+                Producto.objects.bulk_create(
+                    Producto(
+                        codigo=f"{PREFIJO}{i:07d}",
+                        nombre=' '.join(azar.sample(PALABRAS, 3)).capitalize(),
+                        descripcion=' '.join(azar.choices(PALABRAS, k=12)),
+                    )
+                    for i in range(inicio, min(inicio + lote, filas))
+                )
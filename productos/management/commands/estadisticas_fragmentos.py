@@ -0,0 +1,23 @@
+# productos/management/commands/estadisticas_fragmentos.py
+from django.core.management.base import BaseCommand
+
+from productos import cache
+
+
+class Command(BaseCommand):
+    help = "Muestra los aciertos y fallos de la cache de fragmentos de productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar', action='store_true', help="Pone los contadores en cero después de mostrarlos."
+        )
+
+    def handle(self, *args, **options):
+        datos = cache.estadisticas()
+        self.stdout.write(
+            f"Aciertos: {datos['aciertos']}  Fallos: {datos['fallos']}  "
+            f"Tasa de aciertos: {datos['tasa_aciertos']:.1%}"
+        )
+        if options['reiniciar']:
+            cache.reiniciar_estadisticas()
+            self.stdout.write("Contadores reiniciados.")
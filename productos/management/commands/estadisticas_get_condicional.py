@@ -0,0 +1,23 @@
+# productos/management/commands/estadisticas_get_condicional.py
+from django.core.management.base import BaseCommand
+
+from productos import cache
+
+
+class Command(BaseCommand):
+    help = "Muestra cuántos GET de productos se respondieron con 304 (no modificado)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar', action='store_true', help="Pone los contadores en cero después de mostrarlos."
+        )
+
+    def handle(self, *args, **options):
+        datos = cache.estadisticas_condicional()
+        self.stdout.write(
+            f"304: {datos['no_modificadas']}  Completas: {datos['completas']}  "
+            f"Porcentaje de 304: {datos['tasa_304']:.1%}"
+        )
+        if options['reiniciar']:
+            cache.reiniciar_estadisticas_condicional()
+            self.stdout.write("Contadores reiniciados.")
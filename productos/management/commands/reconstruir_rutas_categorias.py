@@ -0,0 +1,38 @@
+# productos/management/commands/reconstruir_rutas_categorias.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from productos.arbol import invalidar_arbol
+from productos.models import Categoria
+
+
+class Command(BaseCommand):
+    help = "Recalcula Categoria.ruta y Categoria.nivel de todas las categorías (incluidas las eliminadas)."
+
+    def handle(self, *args, **options):
+        categorias = {c.pk: c for c in Categoria.all_objects.only('id', 'categoria_padre_id', 'ruta', 'nivel')}
+
+        rutas = {}
+
+        def ruta_de(pk, visitados=()):
+            if pk in rutas:
+                return rutas[pk]
+            if pk in visitados:
+                raise CommandError(f"Ciclo detectado en la categoría {pk}.")
+            padre_id = categorias[pk].categoria_padre_id
+            ruta_padre = ruta_de(padre_id, visitados + (pk,)) if padre_id else '/'
+            rutas[pk] = f'{ruta_padre}{pk}/'
+            return rutas[pk]
+
+        cambiadas = []
+        for pk, categoria in categorias.items():
+            ruta = ruta_de(pk)
+            nivel = ruta.count('/') - 2
+            if (categoria.ruta, categoria.nivel) != (ruta, nivel):
+                categoria.ruta, categoria.nivel = ruta, nivel
+                cambiadas.append(categoria)
+
+        with transaction.atomic():
+            Categoria.all_objects.bulk_update(cambiadas, ['ruta', 'nivel'], batch_size=1000)
+        invalidar_arbol()
+        self.stdout.write(self.style.SUCCESS(f"{len(cambiadas)} categorías actualizadas."))
@@ -0,0 +1,21 @@
+# productos/management/commands/reindexar_busqueda.py
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from productos.busqueda import obtener_backend
+
+
+class Command(BaseCommand):
+    help = "Instala y reconstruye el índice de búsqueda de texto completo de productos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = obtener_backend(using)
+        backend.instalar(connections[using])
+        backend.reindexar(connections[using])
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de búsqueda listo ({type(backend).__name__})."
+        ))
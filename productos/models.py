@@ -1,7 +1,12 @@
 # productos/models.py
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import Exists, F, OuterRef, Prefetch, Value
+from django.db.models.functions import Concat, Substr
 from safedelete.models import SafeDeleteModel
+from safedelete.queryset import SafeDeleteQueryset
 from core.enums import EstadoGeneral, EstadoProducto
+from .busqueda import obtener_backend
 from django.contrib.contenttypes.fields import GenericRelation  # Importar GenericRelation
 
 class Categoria(SafeDeleteModel):
@@ -29,6 +34,13 @@ class Categoria(SafeDeleteModel):
         default=EstadoGeneral.ACTIVO
     )
 
+    # --- Árbol materializado ---
+    # 'ruta' guarda los ids desde la raíz, por ejemplo "/3/7/12/". Con ella los
+    # descendientes de una categoría son un solo filtro ruta__startswith (indexado),
+    # sin recorrer el árbol nivel por nivel. Se mantiene en save().
+    ruta = models.CharField(max_length=255, default='', editable=False, db_index=True)
+    nivel = models.PositiveSmallIntegerField(default=0, editable=False)
+
     class Meta:
         verbose_name = "Categoría"
         verbose_name_plural = "Categorías"
@@ -39,6 +51,108 @@ class Categoria(SafeDeleteModel):
     def __str__(self):
         return self.nombre
 
+    def clean(self):
+        super().clean()
+        if self.pk and self.categoria_padre_id and f'/{self.pk}/' in self._ruta_padre():
+            raise ValidationError(
+                {'categoria_padre': "Una categoría no puede ser hija de sí misma ni de sus subcategorías."}
+            )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            self.actualizar_ruta()
+
+    def _ruta_padre(self):
+        # Leemos la ruta del padre desde la base de datos: el objeto en memoria
+        # puede estar desactualizado si otra categoría se movió entretanto.
+        if not self.categoria_padre_id:
+            return '/'
+        ruta = Categoria.all_objects.filter(pk=self.categoria_padre_id).values_list('ruta', flat=True).get()
+        if not ruta:
+            # Padre creado antes de existir 'ruta' (ver el comando reconstruir_rutas_categorias).
+            padre = Categoria.all_objects.get(pk=self.categoria_padre_id)
+            padre.actualizar_ruta()
+            ruta = padre.ruta
+        return ruta
+
+    def actualizar_ruta(self):
+        """
+        Recalcula la ruta de esta categoría y, si cambió (reparentado), la de
+        todos sus descendientes con un único UPDATE.
+        """
+        ruta_padre = self._ruta_padre()
+        if f'/{self.pk}/' in ruta_padre:
+            raise ValueError("Una categoría no puede ser hija de sí misma ni de sus subcategorías.")
+
+        ruta = f'{ruta_padre}{self.pk}/'
+        if ruta == self.ruta:
+            return
+        nivel = ruta.count('/') - 2
+        ruta_anterior, nivel_anterior = self.ruta, self.nivel
+
+        Categoria.all_objects.filter(pk=self.pk).update(ruta=ruta, nivel=nivel)
+        if ruta_anterior:
+            # Reemplazamos el prefijo viejo por el nuevo en todo el subárbol.
+            (
+                Categoria.all_objects
+                .filter(ruta__startswith=ruta_anterior)
+                .exclude(pk=self.pk)
+                .update(
+                    ruta=Concat(Value(ruta), Substr('ruta', len(ruta_anterior) + 1)),
+                    nivel=F('nivel') + (nivel - nivel_anterior),
+                )
+            )
+        self.ruta, self.nivel = ruta, nivel
+
+class ProductoQuerySet(SafeDeleteQueryset):
+    """
+    QuerySet de productos con las consultas de lectura optimizadas.
+    Hereda de SafeDeleteQueryset para conservar el filtrado de eliminados.
+    """
+
+    def con_categorias(self):
+        """
+        Precarga las categorías asociadas en una sola consulta adicional,
+        sin importar cuántos productos se lean (evita el problema N+1).
+        Se excluyen los enlaces y las categorías eliminados (soft delete).
+        """
+        enlaces = (
+            ProductoCategoria.objects
+            .filter(categoria__deleted__isnull=True)
+            .select_related('categoria')
+        )
+        return self.prefetch_related(Prefetch('productocategoria_set', queryset=enlaces))
+
+    def en_categorias(self, categoria_ids):
+        """
+        Productos asociados a alguna de las categorías indicadas. Se usa Exists
+        en lugar de un JOIN para no duplicar productos con varias categorías.
+        Para un subárbol completo, ver productos.arbol.ArbolCategorias.descendientes().
+        """
+        enlaces = ProductoCategoria.objects.filter(producto=OuterRef('pk'), categoria_id__in=categoria_ids)
+        return self.filter(Exists(enlaces))
+
+    def con_atributos(self, filtros):
+        """
+        Filtra por valores exactos de Producto.atributos, por ejemplo
+        {'color': 'rojo', 'talla': 'M'}. En PostgreSQL usa el operador @>,
+        que aprovecha el índice GIN jsonb_path_ops (ver productos/atributos.py).
+        """
+        if not filtros:
+            return self
+        if connections[self.db].vendor == 'postgresql':
+            return self.filter(atributos__contains=filtros)
+        return self.filter(**{f'atributos__{clave}': valor for clave, valor in filtros.items()})
+
+    def buscar(self, texto):
+        """
+        Búsqueda de texto completo ordenada por relevancia (anotación 'rango').
+        El backend depende del motor de base de datos, ver productos/busqueda.py.
+        """
+        return obtener_backend(self.db).buscar(self, texto)
+
+
 class Producto(SafeDeleteModel):
     """
     Productos del sistema.
@@ -77,6 +191,9 @@ class Producto(SafeDeleteModel):
     # El primer argumento es el modelo Archivo.
     archivos = GenericRelation('archivos.Archivo')
 
+    # as_manager() de safedelete crea un SafeDeleteManager con nuestros métodos.
+    objects = ProductoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
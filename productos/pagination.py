@@ -0,0 +1,10 @@
+# productos/pagination.py
+from core.pagination import CursorKeysetPagination
+
+
+class ProductoCursorPagination(CursorKeysetPagination):
+    """
+    Paginación por cursor sobre (nombre, id): coincide con
+    Producto.Meta.ordering y usa 'id' como desempate.
+    """
+    ordering = ('nombre', 'id')
@@ -59,4 +59,16 @@ class ProductoSerializer(serializers.ModelSerializer):
         if not value.isalnum() and '-' not in value:
             # Si la validación falla, lanzamos un error.
             raise serializers.ValidationError("El código SKU solo puede contener letras, números y guiones.")
-        return value
\ No newline at end of file
+        return value
+
+class ProductoCargaMasivaSerializer(ProductoSerializer):
+    """
+    Valida cada fila de la carga masiva (upsert por SKU).
+    El código es obligatorio y no se valida su unicidad: si ya existe,
+    la fila actualiza ese producto. validate_codigo se hereda. El stock no
+    se carga: lo mueve el libro de inventario.
+    """
+    codigo = serializers.CharField(max_length=50)
+
+    class Meta(ProductoSerializer.Meta):
+        fields = ['codigo', 'nombre', 'descripcion', 'estado']
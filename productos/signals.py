@@ -0,0 +1,57 @@
+# productos/signals.py
+from functools import partial
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from archivos.models import Archivo
+from .arbol import invalidar_arbol
+from .cache import enviar_estadisticas, invalidar_productos
+from .models import Categoria, Producto, ProductoCategoria
+
+# --- Invalidación de la cache de fragmentos ---
+# El soft delete de safedelete guarda el objeto, así que también dispara post_save.
+# Ojo: queryset.update() no dispara señales; quien lo use debe llamar a
+# invalidar_productos() directamente.
+# Se invalida al confirmar la transacción: si se hiciera antes, otro proceso
+# podría releer la fila vieja y guardarla con el sello nuevo.
+
+
+@receiver([post_save, post_delete], sender=Producto)
+def invalidar_producto(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_productos, [instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=ProductoCategoria)
+def invalidar_producto_de_categoria(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_productos, [instance.producto_id]))
+
+
+@receiver(post_save, sender=Categoria)
+def invalidar_productos_de_categoria(sender, instance, **kwargs):
+    # El detalle muestra el nombre de las categorías: si cambia, se invalidan
+    # todos los productos que la usan (una consulta y una escritura en lote).
+    # También cambia el sello del catálogo aunque la categoría no tenga productos.
+    pks = ProductoCategoria.objects.filter(categoria=instance).values_list('producto_id', flat=True)
+    transaction.on_commit(partial(invalidar_productos, list(pks)))
+
+
+@receiver([post_save, post_delete], sender=Archivo)
+def invalidar_producto_de_archivo(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Producto).pk:
+        transaction.on_commit(partial(invalidar_productos, [instance.object_id]))
+
+
+# --- Invalidación del árbol de categorías en memoria ---
+@receiver([post_save, post_delete], sender=Categoria)
+def invalidar_arbol_categorias(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_arbol)
+
+
+# --- Estadísticas de la cache de fragmentos ---
+@receiver(request_finished)
+def enviar_estadisticas_fragmentos(sender, **kwargs):
+    enviar_estadisticas()
@@ -0,0 +1,60 @@
+# productos/templatetags/productos_cache.py
+from django import template
+
+from core.replicas import lectura_primaria
+from productos import cache
+
+register = template.Library()
+
+
+class FragmentoProductoNode(template.Node):
+    def __init__(self, nodelist, producto, nombre):
+        self.nodelist = nodelist
+        self.producto = producto
+        self.nombre = nombre
+
+    def render(self, context):
+        producto = self.producto.resolve(context)
+        nombre = self.nombre.resolve(context)
+        # Las vistas de lista precargan los sellos con get_many (ver ProductoListView).
+        versiones = context.get('versiones_productos') or {}
+        version = versiones.get(producto.pk) or cache.version_producto(producto.pk)
+
+        clave = cache.clave_fragmento(nombre, producto.pk, version)
+        backend = cache.obtener_cache()
+        # Y los fragmentos de sus filas.
+        precargados = context.get('fragmentos_productos') or {}
+        contenido = precargados[clave] if clave in precargados else backend.get(clave)
+        if contenido is not None:
+            cache.registrar(acierto=True)
+            return contenido
+
+        cache.registrar(acierto=False)
+        with lectura_primaria():
+            contenido = self.nodelist.render(context)
+        backend.set(clave, contenido, cache.TIMEOUT_FRAGMENTO)
+        return contenido
+
+
+@register.tag('fragmento_producto')
+def do_fragmento_producto(parser, token):
+    """
+    Cachea un fragmento de plantilla por producto, invalidado por señales.
+
+    Uso::
+
+        {% load productos_cache %}
+        {% fragmento_producto producto "fila" %}
+            ...
+        {% endfragmento_producto %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' requiere dos argumentos: el producto y el nombre del fragmento."
+        )
+    nodelist = parser.parse(('endfragmento_producto',))
+    parser.delete_first_token()
+    return FragmentoProductoNode(
+        nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2])
+    )
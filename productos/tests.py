@@ -1,3 +1,577 @@
+# productos/tests.py
+import io
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from openpyxl import load_workbook
+from rest_framework.test import APITestCase
+from safedelete import HARD_DELETE
+
+from archivos.models import Archivo
+from core.testing import PresupuestoConsultasMixin
+from . import cache
+from .arbol import invalidar_arbol, obtener_arbol
+from .models import Categoria, Producto, ProductoCategoria
+
+
+def crear_catalogo(cantidad, categorias_por_producto=2):
+    """
+    Crea `cantidad` productos, cada uno enlazado a varias categorías.
+    """
+    categorias = [
+        Categoria.objects.create(nombre=f"Categoría {i}") for i in range(categorias_por_producto)
+    ]
+    productos = Producto.objects.bulk_create(
+        Producto(codigo=f"SKU-{i:05d}", nombre=f"Producto {i:05d}") for i in range(cantidad)
+    )
+    ProductoCategoria.objects.bulk_create(
+        ProductoCategoria(producto=producto, categoria=categoria, es_principal=(j == 0))
+        for producto in productos
+        for j, categoria in enumerate(categorias)
+    )
+    return productos
+
+
+class ProductoApiConsultasTests(PresupuestoConsultasMixin, APITestCase):
+    """
+    El número de consultas de la API no debe crecer con el tamaño del catálogo.
+    """
+    # 1 consulta para los productos + 1 para precargar categorías.
+    PRESUPUESTO_LISTA = 2
+    PRESUPUESTO_DETALLE = 2
+
+    def test_lista_con_presupuesto_fijo(self):
+        for cantidad in (1, 10, 50):
+            with self.subTest(cantidad=cantidad):
+                Producto.all_objects.all().delete(force_policy=HARD_DELETE)
+                Categoria.all_objects.all().delete(force_policy=HARD_DELETE)
+                crear_catalogo(cantidad)
+                respuesta = self.assertPresupuestoConsultas(
+                    self.PRESUPUESTO_LISTA, self.client.get, reverse('producto-list')
+                )
+                self.assertEqual(respuesta.status_code, 200)
+
+    def test_detalle_con_presupuesto_fijo(self):
+        producto = crear_catalogo(1, categorias_por_producto=5)[0]
+        respuesta = self.assertPresupuestoConsultas(
+            self.PRESUPUESTO_DETALLE,
+            self.client.get,
+            reverse('producto-detail', kwargs={'pk': producto.pk}),
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['categorias_asociadas']), 5)
+
+    def test_excluye_categorias_eliminadas(self):
+        producto = crear_catalogo(1, categorias_por_producto=2)[0]
+        Categoria.objects.filter(nombre="Categoría 1").first().delete()
+        respuesta = self.client.get(reverse('producto-detail', kwargs={'pk': producto.pk}))
+        nombres = [c['categoria']['nombre'] for c in respuesta.data['categorias_asociadas']]
+        self.assertEqual(nombres, ["Categoría 0"])
+
+
+class ProductoApiPaginacionTests(APITestCase):
+    """
+    Paginación por cursor (nombre, id) y modo streaming NDJSON.
+    """
+
+    def setUp(self):
+        crear_catalogo(7, categorias_por_producto=1)
+
+    def recorrer(self, url):
+        nombres = []
+        while url:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            nombres += [p['nombre'] for p in respuesta.data['results']]
+            url = respuesta.data['next']
+        return nombres
+
+    def test_recorre_todo_el_catalogo_en_orden(self):
+        nombres = self.recorrer(reverse('producto-list') + '?page_size=3')
+        self.assertEqual(nombres, [f"Producto {i:05d}" for i in range(7)])
+
+    def test_cursor_estable_ante_inserciones(self):
+        primera = self.client.get(reverse('producto-list') + '?page_size=3').data
+        # Un producto que queda antes del cursor no debe desplazar la página siguiente.
+        Producto.objects.create(codigo='SKU-A', nombre='Producto 00000-bis')
+        segunda = self.client.get(primera['next']).data
+        self.assertEqual(
+            [p['nombre'] for p in segunda['results']],
+            ["Producto 00003", "Producto 00004", "Producto 00005"],
+        )
+        anterior = self.client.get(segunda['previous']).data
+        self.assertEqual(anterior['results'][-1]['nombre'], "Producto 00002")
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get(reverse('producto-list') + '?cursor=no-es-un-cursor')
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_stream_ndjson(self):
+        respuesta = self.client.get(reverse('producto-list') + '?stream=1')
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson')
+        lineas = b''.join(respuesta.streaming_content).decode().splitlines()
+        productos = [json.loads(linea) for linea in lineas]
+        self.assertEqual(len(productos), 7)
+        self.assertEqual(len(productos[0]['categorias_asociadas']), 1)
+
+
+class ProductoBusquedaTests(TestCase):
+    """
+    Búsqueda de texto completo (FTS5 en SQLite, tsvector en PostgreSQL).
+    """
+
+    def setUp(self):
+        self.lampara = Producto.objects.create(
+            codigo='LAM-001', nombre='Lámpara de mesa', descripcion='Luz cálida para escritorio'
+        )
+        self.mesa = Producto.objects.create(
+            codigo='MES-002', nombre='Mesa de centro', descripcion='Ideal junto a una lámpara'
+        )
+
+    def nombres(self, texto):
+        return [p.nombre for p in Producto.objects.buscar(texto)]
+
+    def test_ignora_tildes_y_ordena_por_relevancia(self):
+        # Coincidir en el nombre pesa más que coincidir en la descripción.
+        self.assertEqual(self.nombres('lampara'), ['Lámpara de mesa', 'Mesa de centro'])
+        self.assertEqual(self.nombres('CÁLIDA'), ['Lámpara de mesa'])
+
+    def test_busca_por_prefijo_y_codigo(self):
+        self.assertEqual(self.nombres('escrit'), ['Lámpara de mesa'])
+        self.assertEqual(self.nombres('MES-002'), ['Mesa de centro'])
+
+    def test_indice_sincronizado_en_actualizaciones_masivas(self):
+        Producto.objects.filter(pk=self.mesa.pk).update(nombre='Silla plegable')
+        Producto.objects.bulk_create([Producto(codigo='SIL-003', nombre='Silla de jardín')])
+        self.assertEqual(self.nombres('silla'), ['Silla de jardín', 'Silla plegable'])
+        self.assertEqual(self.nombres('centro'), [])
+
+    def test_excluye_productos_eliminados(self):
+        self.lampara.delete()
+        self.assertEqual(self.nombres('lampara'), ['Mesa de centro'])
+
+    def test_vista_htmx_devuelve_solo_la_tabla(self):
+        respuesta = self.client.get(reverse('productos:lista'), {'q': 'lampara'}, HTTP_HX_REQUEST='true')
+        self.assertTemplateUsed(respuesta, 'productos/partials/tabla_productos.html')
+        self.assertTemplateNotUsed(respuesta, 'productos/lista_productos.html')
+        self.assertEqual(list(respuesta.context['productos']), [self.lampara, self.mesa])
+
+
+class ProductoHtmxFilasTests(PresupuestoConsultasMixin, TestCase):
+    """
+    Las mutaciones HTMX devuelven solo la fila afectada (swap out of band).
+    """
+    HTMX = {'HTTP_HX_REQUEST': 'true'}
+    # Validación de unicidad del SKU + escritura, sin leer el catálogo.
+    PRESUPUESTO_CREAR = 2
+
+    def datos(self, **cambios):
+        datos = {
+            'codigo': 'NUEVO-1', 'nombre': 'Producto nuevo', 'descripcion': '',
+            'stock_minimo': '0', 'estado': 'Activo',
+        }
+        datos.update(cambios)
+        return datos
+
+    def test_crear_devuelve_solo_la_fila_nueva(self):
+        crear_catalogo(30, categorias_por_producto=1)
+        respuesta = self.assertPresupuestoConsultas(
+            self.PRESUPUESTO_CREAR,
+            self.client.post, reverse('productos:crear'), self.datos(), **self.HTMX,
+        )
+        nuevo = Producto.objects.get(codigo='NUEVO-1')
+        contenido = respuesta.content.decode()
+        self.assertEqual(respuesta['HX-Reswap'], 'none')
+        self.assertIn('hx-swap-oob="afterbegin:#product-table-body"', contenido)
+        self.assertIn(f'id="producto-{nuevo.pk}"', contenido)
+        self.assertEqual(contenido.count('<tr id="producto-'), 2)  # la fila nueva + borrar "vacío"
+
+    def test_editar_reemplaza_solo_su_fila(self):
+        producto = Producto.objects.create(codigo='EDI-1', nombre='Original')
+        respuesta = self.client.post(
+            reverse('productos:editar', kwargs={'pk': producto.pk}),
+            self.datos(codigo='EDI-1', nombre='Editado'),
+            **self.HTMX,
+        )
+        contenido = respuesta.content.decode()
+        self.assertIn(f'<tr id="producto-{producto.pk}" hx-swap-oob="true">', contenido)
+        self.assertIn('Editado', contenido)
+
+    def test_eliminar_quita_solo_su_fila(self):
+        producto = Producto.objects.create(codigo='ELI-1', nombre='Para borrar')
+        respuesta = self.client.post(
+            reverse('productos:eliminar', kwargs={'pk': producto.pk}), **self.HTMX
+        )
+        self.assertIn(
+            f'<tr id="producto-{producto.pk}" hx-swap-oob="delete">', respuesta.content.decode()
+        )
+        self.assertFalse(Producto.objects.filter(pk=producto.pk).exists())
+
+
+class ProductoCacheFragmentosTests(TestCase):
+    """
+    Fragmentos cacheados por producto e invalidados por señales.
+    """
+
+    def setUp(self):
+        cache.obtener_cache().clear()
+        self.producto = crear_catalogo(1, categorias_por_producto=2)[0]
+        self.url = reverse('productos:detalle', kwargs={'pk': self.producto.pk})
+
+    def test_detalle_cacheado_evita_consultas_de_relaciones(self):
+        self.client.get(self.url)
+        # Solo queda la consulta del propio producto.
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url)
+        self.assertContains(respuesta, 'Categoría 1')
+        self.assertEqual(cache.estadisticas()['aciertos'], 1)
+        self.assertEqual(cache.estadisticas()['fallos'], 1)
+
+    def test_invalida_al_guardar_el_producto(self):
+        self.client.get(self.url)
+        self.producto.nombre = 'Nombre actualizado'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+        self.assertContains(self.client.get(self.url), 'Nombre actualizado')
+
+    def test_invalida_al_cambiar_categorias(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductoCategoria.objects.filter(producto=self.producto, categoria__nombre='Categoría 1').delete()
+        self.assertNotContains(self.client.get(self.url), 'Categoría 1')
+
+        categoria = Categoria.objects.get(nombre='Categoría 0')
+        categoria.nombre = 'Renombrada'
+        with self.captureOnCommitCallbacks(execute=True):
+            categoria.save()
+        self.assertContains(self.client.get(self.url), 'Renombrada')
+
+    def test_invalida_al_adjuntar_archivo(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Archivo.objects.create(
+                nombre_original='foto.png', ruta_archivo='archivos/foto.png', extension='png',
+                tipo_archivo='imagen', content_object=self.producto,
+            )
+        self.assertContains(self.client.get(self.url), 'archivos/foto.png')
+
+    def test_lista_reutiliza_filas_cacheadas(self):
+        Producto.objects.bulk_create(Producto(codigo=f'LIS-{i}', nombre=f'Lista {i}') for i in range(5))
+        url = reverse('productos:lista')
+        self.client.get(url)
+        cache.reiniciar_estadisticas()
+        self.client.get(url)
+        self.assertEqual(cache.estadisticas()['tasa_aciertos'], 1.0)
+
+    def test_lista_sin_lecturas_por_fila(self):
+        Producto.objects.bulk_create(Producto(codigo=f'LIS-{i}', nombre=f'Lista {i}') for i in range(5))
+        url = reverse('productos:lista')
+        self.client.get(url)
+        backend = cache.obtener_cache()
+        leer = type(backend).get
+
+        def get_many(claves):
+            # LocMemCache.get_many llama a get(): se cuentan solo las lecturas sueltas.
+            return {clave: valor for clave in claves if (valor := leer(backend, clave)) is not None}
+
+        with mock.patch.object(backend, 'get_many', side_effect=get_many), \
+                mock.patch.object(backend, 'get', wraps=backend.get) as get, \
+                mock.patch.object(backend, 'incr', wraps=backend.incr) as incr:
+            self.client.get(url)
+        # Sellos y fragmentos con get_many; un incr por contador (fragmentos y
+        # GET condicional), al final de la petición.
+        self.assertLess(get.call_count, 5)
+        self.assertEqual(incr.call_count, 2)
+        self.assertEqual(cache.estadisticas()['aciertos'], 6)
+
+
+class CategoriaArbolTests(TestCase):
+    """
+    Ruta materializada de Categoria y árbol en memoria.
+    """
+
+    def setUp(self):
+        self.ropa = Categoria.objects.create(nombre='Ropa')
+        self.hombre = Categoria.objects.create(nombre='Hombre', categoria_padre=self.ropa)
+        self.camisas = Categoria.objects.create(nombre='Camisas', categoria_padre=self.hombre)
+        self.hogar = Categoria.objects.create(nombre='Hogar')
+
+        self.camisa = Producto.objects.create(codigo='CAM-1', nombre='Camisa')
+        self.mesa = Producto.objects.create(codigo='MES-1', nombre='Mesa')
+        ProductoCategoria.objects.create(producto=self.camisa, categoria=self.camisas)
+        ProductoCategoria.objects.create(producto=self.mesa, categoria=self.hogar)
+        # Las señales invalidan al confirmar, y TestCase nunca confirma.
+        invalidar_arbol()
+
+    def test_rutas_y_consultas_del_arbol(self):
+        self.assertEqual(self.camisas.ruta, f'/{self.ropa.pk}/{self.hombre.pk}/{self.camisas.pk}/')
+        self.assertEqual(self.camisas.nivel, 2)
+
+        arbol = obtener_arbol()
+        self.assertEqual(arbol.descendientes(self.ropa.pk), {self.ropa.pk, self.hombre.pk, self.camisas.pk})
+        self.assertEqual(arbol.ancestros(self.camisas.pk), [self.ropa.pk, self.hombre.pk])
+        self.assertEqual(
+            [nombre for _, nombre in arbol.migas(self.camisas.pk)], ['Ropa', 'Hombre', 'Camisas']
+        )
+
+    def test_el_arbol_no_depende_de_ruta_ni_nivel(self):
+        # Como si el padre se hubiera movido y las rutas no se hubieran recalculado.
+        Categoria.objects.filter(pk=self.camisas.pk).update(nivel=0, ruta=f'/{self.camisas.pk}/')
+        Categoria.objects.filter(pk=self.ropa.pk).update(nivel=5)
+        invalidar_arbol()
+        arbol = obtener_arbol()
+        self.assertEqual(arbol.descendientes(self.ropa.pk), {self.ropa.pk, self.hombre.pk, self.camisas.pk})
+        self.assertEqual(arbol.ancestros(self.camisas.pk), [self.ropa.pk, self.hombre.pk])
+
+    def test_arbol_cacheado_sin_consultas(self):
+        obtener_arbol()
+        with self.assertNumQueries(0):
+            obtener_arbol().descendientes(self.ropa.pk)
+
+    def test_reparentar_actualiza_el_subarbol(self):
+        self.hombre.categoria_padre = self.hogar
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hombre.save()
+        self.camisas.refresh_from_db()
+        self.assertEqual(self.camisas.ruta, f'/{self.hogar.pk}/{self.hombre.pk}/{self.camisas.pk}/')
+        self.assertEqual(obtener_arbol().descendientes(self.ropa.pk), {self.ropa.pk})
+        self.assertIn(self.camisas.pk, obtener_arbol().descendientes(self.hogar.pk))
+
+    def test_no_permite_ciclos(self):
+        self.ropa.categoria_padre = self.camisas
+        with self.assertRaises(ValidationError):
+            self.ropa.full_clean()
+        with self.assertRaises(ValueError):
+            self.ropa.save()
+
+    def test_eliminar_oculta_el_subarbol_y_restaurar_lo_recupera(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hombre.delete()
+        self.assertNotIn(self.camisas.pk, obtener_arbol())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hombre.undelete()
+        self.assertIn(self.camisas.pk, obtener_arbol().descendientes(self.ropa.pk))
+
+    def test_filtro_por_subarbol_en_vista_y_api(self):
+        respuesta = self.client.get(reverse('productos:lista'), {'categoria': self.ropa.pk})
+        self.assertEqual(list(respuesta.context['productos']), [self.camisa])
+
+        respuesta = self.client.get(reverse('producto-list'), {'categoria': self.ropa.pk})
+        self.assertEqual([p['codigo'] for p in respuesta.data['results']], ['CAM-1'])
+        respuesta = self.client.get(reverse('producto-list'), {'categoria': 'ropa'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ProductoAtributosTests(TestCase):
+    """
+    Filtros ?attr.<clave>=<valor> y facetas sobre Producto.atributos.
+    """
+
+    def setUp(self):
+        cache.obtener_cache().clear()
+        Producto.objects.bulk_create([
+            Producto(codigo='A-1', nombre='Camiseta roja M', atributos={'color': 'rojo', 'talla': 'M'}),
+            Producto(codigo='A-2', nombre='Camiseta roja L', atributos={'color': 'rojo', 'talla': 'L'}),
+            Producto(codigo='A-3', nombre='Camiseta azul M', atributos={'color': 'azul', 'talla': 'M'}),
+            Producto(codigo='A-4', nombre='Gorra', atributos={'color': 'rojo', 'ajustable': True}),
+            Producto(codigo='A-5', nombre='Sin atributos', atributos={}),
+        ])
+
+    def test_filtra_por_varios_atributos(self):
+        respuesta = self.client.get(reverse('producto-list'), {'attr.color': 'rojo', 'attr.talla': 'M'})
+        self.assertEqual([p['codigo'] for p in respuesta.data['results']], ['A-1'])
+
+    def test_rechaza_claves_invalidas(self):
+        respuesta = self.client.get(reverse('producto-list'), {'attr.color__contains': 'r'})
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_facetas_en_una_consulta(self):
+        url = reverse('producto-facetas')
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.data, {
+            'ajustable': {'true': 1},
+            'color': {'rojo': 3, 'azul': 1},
+            'talla': {'M': 2, 'L': 1},
+        })
+        # Segunda lectura desde la cache, sin consultas.
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_facetas_respetan_filtros_y_version_del_catalogo(self):
+        url = reverse('producto-facetas')
+        self.assertEqual(self.client.get(url, {'attr.talla': 'M'}).data['color'], {'azul': 1, 'rojo': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(
+                codigo='A-6', nombre='Camiseta verde M', atributos={'color': 'verde', 'talla': 'M'},
+            )
+        self.assertEqual(
+            self.client.get(url, {'attr.talla': 'M'}).data['color'], {'azul': 1, 'rojo': 1, 'verde': 1}
+        )
+
+
+class ProductoExportacionTests(TestCase):
+    """
+    Exportación en streaming del catálogo.
+    """
+
+    def setUp(self):
+        crear_catalogo(3, categorias_por_producto=2)
+
+    def test_csv_en_streaming(self):
+        respuesta = self.client.get(reverse('productos:exportar', kwargs={'formato': 'csv'}))
+        self.assertTrue(respuesta.streaming)
+        lineas = b''.join(respuesta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lineas), 4)
+        self.assertTrue(lineas[0].startswith('Código (SKU),Nombre'))
+        self.assertTrue(lineas[1].endswith('Categoría 0,Categoría 0 | Categoría 1'))
+
+    def test_ndjson(self):
+        respuesta = self.client.get(reverse('productos:exportar', kwargs={'formato': 'ndjson'}))
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).splitlines()]
+        self.assertEqual([f['codigo'] for f in filas], ['SKU-00000', 'SKU-00001', 'SKU-00002'])
+        self.assertEqual(filas[0]['stock'], '0.00')
+
+    def test_xlsx(self):
+        respuesta = self.client.get(reverse('productos:exportar', kwargs={'formato': 'xlsx'}))
+        libro = load_workbook(io.BytesIO(b''.join(respuesta.streaming_content)), read_only=True)
+        filas = list(libro['Productos'].values)
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[1][0], 'SKU-00000')
+
+    def test_formato_desconocido(self):
+        respuesta = self.client.get(reverse('productos:exportar', kwargs={'formato': 'pdf'}))
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class ProductoCargaMasivaTests(PresupuestoConsultasMixin, APITestCase):
+    """
+    POST api/productos/bulk/: upsert por SKU con errores por fila.
+    """
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('erp'))
+        self.existente = Producto.objects.create(
+            codigo='SKU-1', nombre='Viejo', descripcion='Se conserva', stock=3,
+        )
+        self.url = reverse('producto-bulk')
+
+    def test_crea_actualiza_y_reporta_errores(self):
+        respuesta = self.client.post(self.url, [
+            {'codigo': 'SKU-1', 'nombre': 'Actualizado', 'stock': '99'},
+            {'codigo': 'SKU-2', 'nombre': 'Nuevo', 'stock': '5'},
+            {'codigo': 'SKU 3', 'nombre': 'SKU inválido'},
+            {'codigo': 'SKU-4'},
+            {'codigo': 'SKU-2', 'nombre': 'Repetido'},
+        ], format='json')
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['creados'], 1)
+        self.assertEqual(respuesta.data['actualizados'], 1)
+        self.assertEqual([e['fila'] for e in respuesta.data['errores']], [2, 3, 4])
+        self.assertIn('codigo', respuesta.data['errores'][0]['errores'])
+
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.nombre, 'Actualizado')
+        # Los campos que la fila no trae no se sobrescriben.
+        self.assertEqual(self.existente.descripcion, 'Se conserva')
+        # El stock lo lleva el libro de movimientos: la carga no lo toca.
+        self.assertEqual(self.existente.stock, 3)
+        self.assertEqual(Producto.objects.get(codigo='SKU-2').stock, 0)
+
+    def test_upsert_sin_unique_fields_como_en_mysql(self):
+        # SQLite no puede hacer el upsert sin llave: solo se revisan los argumentos.
+        with mock.patch.object(type(connection.features), 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(Producto.objects, 'bulk_create') as insertar:
+            self.client.post(self.url, [{'codigo': 'SKU-1', 'nombre': 'Otro'}], format='json')
+        self.assertNotIn('unique_fields', insertar.call_args.kwargs)
+        self.assertEqual(insertar.call_args.kwargs['update_fields'], ['nombre', 'deleted'])
+
+    def test_restaura_productos_eliminados(self):
+        self.existente.delete()
+        self.client.post(self.url, [{'codigo': 'SKU-1', 'nombre': 'De vuelta'}], format='json')
+        self.assertTrue(Producto.objects.filter(codigo='SKU-1').exists())
+
+    def test_consultas_no_dependen_del_numero_de_filas(self):
+        filas = [{'codigo': f'LOTE-{i}', 'nombre': f'Lote {i}'} for i in range(300)]
+        # Unas pocas consultas por lote (SQLite parte los INSERT por límite de parámetros),
+        # nunca una por fila.
+        respuesta = self.assertPresupuestoConsultas(
+            10, self.client.post, self.url, filas, format='json'
+        )
+        self.assertEqual(respuesta.data['creados'], 300)
+
+    def test_requiere_una_lista(self):
+        respuesta = self.client.post(self.url, {'codigo': 'SKU-9'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ProductoGetCondicionalTests(APITestCase):
+    """
+    ETag por sello de versión: 304 sin consultar la base de datos.
+    """
+
+    def setUp(self):
+        cache.obtener_cache().clear()
+        self.producto = crear_catalogo(3)[0]
+
+    def get_condicional(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_lista_api_responde_304_sin_consultas(self):
+        url = reverse('producto-list')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            respuesta = self.get_condicional(url, etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+    def test_detalle_y_pagina_responden_304(self):
+        for url in (
+            reverse('producto-detail', kwargs={'pk': self.producto.pk}),
+            reverse('productos:detalle', kwargs={'pk': self.producto.pk}),
+            reverse('productos:lista'),
+        ):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.get_condicional(url, etag).status_code, 304, url)
+
+    def test_etag_cambia_con_el_producto(self):
+        url = reverse('producto-detail', kwargs={'pk': self.producto.pk})
+        url_lista = reverse('producto-list')
+        etag = self.client.get(url)['ETag']
+        etag_lista = self.client.get(url_lista)['ETag']
+        self.producto.nombre = 'Otro nombre'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.save()
+        self.assertEqual(self.get_condicional(url, etag).status_code, 200)
+        self.assertEqual(self.get_condicional(url_lista, etag_lista).status_code, 200)
+
+    def test_el_stock_cambia_la_lista_sin_invalidar_el_catalogo(self):
+        url = reverse('producto-list')
+        etag = self.client.get(url)['ETag']
+        catalogo = cache.version_catalogo()
+        # Lo que hace cada venta al confirmarse (actualizar_stock_global).
+        cache.invalidar_stock([self.producto.pk])
+        self.assertEqual(self.get_condicional(url, etag).status_code, 200)
+        # Las facetas se cachean con este sello: una venta no las invalida.
+        self.assertEqual(cache.version_catalogo(), catalogo)
+
+    def test_etag_depende_de_los_filtros_y_de_htmx(self):
+        url = reverse('productos:lista')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'q': 'Producto'})['ETag'], etag)
+        self.assertNotEqual(self.client.get(url, HTTP_HX_REQUEST='true')['ETag'], etag)
 
-# Create your tests here.
+    def test_estadisticas_de_304(self):
+        url = reverse('producto-list')
+        cache.reiniciar_estadisticas_condicional()
+        etag = self.client.get(url)['ETag']
+        self.get_condicional(url, etag)
+        self.get_condicional(url, etag)
+        datos = cache.estadisticas_condicional()
+        self.assertEqual((datos['no_modificadas'], datos['completas']), (2, 1))
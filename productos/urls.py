@@ -19,4 +19,6 @@ urlpatterns = [
     path('<int:pk>/editar/', views.ProductoUpdateView.as_view(), name='editar'),
     # Ruta para eliminar un producto existente.
     path('<int:pk>/eliminar/', views.ProductoDeleteView.as_view(), name='eliminar'),
+    # Ruta para exportar el catálogo: csv, ndjson o xlsx.
+    path('exportar/<str:formato>/', views.ProductoExportView.as_view(), name='exportar'),
 ]
\ No newline at end of file
@@ -1,17 +1,55 @@
 # productos/views.py
-from django.db.models import Q
+import tempfile
+
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView
+from django.utils.decorators import method_decorator
+from django.views.generic import ListView, DetailView, View
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
 from django.shortcuts import render
+from core.replicas import lectura_primaria
+from transacciones.inventario import disponibilidad
+from .arbol import obtener_arbol
+from .atributos import extraer_filtros, facetas_cacheadas
+from .cache import fragmentos_productos, versiones_productos
+from .carga_masiva import MAX_FILAS, sincronizar_productos
+from .condicional import etag_catalogo, etag_producto, get_condicional
+from .exportacion import exportar_csv, exportar_ndjson, exportar_xlsx
 from .models import Producto
 from .forms import ProductoForm
 
 # --- Importaciones para DRF ---
 from rest_framework import viewsets # Importamos viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly # Importar
+from rest_framework.renderers import JSONRenderer
+from .pagination import ProductoCursorPagination
 from .serializers import ProductoSerializer
 
+def respuesta_fila_htmx(request, producto, accion):
+    """
+    Respuesta de las mutaciones HTMX (crear, editar, eliminar): contiene solo la
+    fila afectada con hx-swap-oob, así su costo no depende del tamaño del catálogo.
+    """
+    context = {'producto': producto, 'accion': accion}
+    response = render(request, 'productos/partials/fila_producto_oob.html', context)
+    # El contenido principal no se inserta en ningún lado; solo aplican los swaps OOB.
+    response['HX-Reswap'] = 'none'
+    # Disparamos un evento personalizado para cerrar el modal (si hay uno abierto).
+    response['HX-Trigger'] = 'close-modal'
+    return response
+
+def filtrar_por_categoria(queryset, categoria_id):
+    """
+    Productos de una categoría y de todas sus subcategorías, usando el árbol
+    de categorías en memoria (sin consultas recursivas por nivel).
+    """
+    return queryset.en_categorias(obtener_arbol().descendientes(categoria_id))
+
+# Si el catálogo no cambió, respondemos 304 sin consultar la base de datos.
+@method_decorator(get_condicional(etag_catalogo), name='get')
 class ProductoListView(ListView):
     """
     Vista para mostrar una lista de todos los productos.
@@ -23,18 +61,33 @@ class ProductoListView(ListView):
     # Por defecto es 'object_list', pero 'productos' es más intuitivo.
     context_object_name = 'productos'
 
+    # Máximo de resultados (los más relevantes) que devuelve una búsqueda.
+    limite_busqueda = 100
+
     # 3. Sobrescribimos get_queryset para manejar la búsqueda
     def get_queryset(self):
         queryset = super().get_queryset()
         # Obtenemos el parámetro 'q' de la URL (?q=...)
         query = self.request.GET.get('q')
+        # Filtro opcional por categoría (incluye sus subcategorías): ?categoria=<id>
+        categoria = self.request.GET.get('categoria', '')
+        if categoria.isdigit():
+            queryset = filtrar_por_categoria(queryset, int(categoria))
         if query:
-            # Filtramos por nombre O por código que contenga la búsqueda
-            queryset = queryset.filter(
-                Q(nombre__icontains=query) | Q(codigo__icontains=query) | Q(descripcion__icontains=query)
-            )
+            # Búsqueda de texto completo (índices GIN/FTS5) ordenada por relevancia,
+            # en lugar de tres icontains que obligan a recorrer toda la tabla.
+            queryset = queryset.buscar(query)[:self.limite_busqueda]
         return queryset
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Leemos los sellos de versión y los fragmentos de todas las filas de
+        # una vez (get_many) para que la cache no haga lecturas por fila.
+        versiones = versiones_productos(p.pk for p in context['productos'])
+        context['versiones_productos'] = versiones
+        context['fragmentos_productos'] = fragmentos_productos('fila', versiones)
+        return context
+
     # 4. Sobrescribimos get_template_names para elegir la plantilla correcta
     def get_template_names(self):
         # HTMX añade un encabezado 'HX-Request' a sus peticiones
@@ -44,6 +97,7 @@ class ProductoListView(ListView):
         # Si es una carga de página normal, devolvemos la página completa
         return ['productos/lista_productos.html']
 
+@method_decorator(get_condicional(etag_producto), name='get')
 class ProductoDetailView(DetailView):
     """
     Vista para mostrar los detalles de un único producto.
@@ -67,15 +121,9 @@ class ProductoCreateView(CreateView):
         if self.request.headers.get('HX-Request'):
             # Guardamos el objeto
             self.object = form.save()
-            # Obtenemos todos los productos para actualizar la tabla
-            context = {'productos': Producto.objects.all()}
-            # Renderizamos la tabla parcial con la lista de productos actualizada
-            response = render(self.request, 'productos/partials/tabla_productos.html', context)
-            # Añadimos un encabezado especial para que HTMX sepa que debe actualizar la tabla
-            # y también que debe disparar un evento para cerrar el modal.
-            response['HX-Retarget'] = '#product-table-container'
-            response['HX-Trigger'] = 'close-modal' # Disparamos un evento personalizado
-            return response
+            # Devolvemos solo la fila nueva: se inserta al inicio de la tabla con un
+            # swap "out of band", sin volver a consultar ni renderizar todo el catálogo.
+            return respuesta_fila_htmx(self.request, self.object, 'crear')
 
         # Si no es HTMX, comportamiento normal
         return super().form_valid(form)
@@ -86,8 +134,18 @@ class ProductoUpdateView(UpdateView):
     """
     model = Producto
     form_class = ProductoForm
-    # Reutilizamos la misma plantilla del formulario de creación.
-    template_name = 'productos/producto_form.html'
+    # Reutilizamos las mismas plantillas del formulario de creación.
+    def get_template_names(self):
+        if self.request.headers.get('HX-Request'):
+            return ['productos/partials/producto_form_modal.html']
+        return ['productos/producto_form.html']
+
+    def form_valid(self, form):
+        if self.request.headers.get('HX-Request'):
+            self.object = form.save()
+            # Reemplazamos solo la fila editada (hx-swap-oob="true" por su id).
+            return respuesta_fila_htmx(self.request, self.object, 'editar')
+        return super().form_valid(form)
 
     # Después de editar con éxito, redirigimos a la página de detalle de ese mismo producto.
     def get_success_url(self):
@@ -104,11 +162,146 @@ class ProductoDeleteView(DeleteView):
     # Después de eliminar, volvemos a la lista de productos.
     success_url = reverse_lazy('productos:lista')
 
+    def form_valid(self, form):
+        if self.request.headers.get('HX-Request'):
+            self.object.delete()
+            # Quitamos solo la fila eliminada de la tabla.
+            return respuesta_fila_htmx(self.request, self.object, 'eliminar')
+        return super().form_valid(form)
+
+class ProductoExportView(View):
+    """
+    Exporta el catálogo (opcionalmente filtrado con ?categoria=<id>) sin
+    cargarlo en memoria: CSV y NDJSON en streaming, XLSX vía archivo temporal.
+    """
+    formatos_streaming = {
+        'csv': (exportar_csv, 'text/csv; charset=utf-8'),
+        'ndjson': (exportar_ndjson, 'application/x-ndjson; charset=utf-8'),
+    }
+
+    def get(self, request, formato):
+        queryset = Producto.objects.all()
+        categoria = request.GET.get('categoria', '')
+        if categoria.isdigit():
+            queryset = filtrar_por_categoria(queryset, int(categoria))
+
+        if formato in self.formatos_streaming:
+            generador, content_type = self.formatos_streaming[formato]
+            response = StreamingHttpResponse(generador(queryset), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="productos.{formato}"'
+            return response
+
+        if formato == 'xlsx':
+            # El archivo temporal vive en disco y se borra al cerrarse la respuesta.
+            archivo = tempfile.TemporaryFile()
+            exportar_xlsx(queryset, archivo)
+            archivo.seek(0)
+            return FileResponse(
+                archivo,
+                as_attachment=True,
+                filename='productos.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+
+        raise Http404(f"Formato de exportación no soportado: {formato}")
+
 # --- VISTAS DE API ---
+# GET condicional en la lista (incluye ?stream=1) y el detalle.
+@method_decorator(get_condicional(etag_catalogo), name='list')
+@method_decorator(get_condicional(etag_producto), name='retrieve')
 class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
-    
+    # Paginación por cursor sobre (nombre, id): nunca serializamos el catálogo completo.
+    pagination_class = ProductoCursorPagination
+    # Filas que se leen de la base de datos por cada bloque en modo ?stream=1.
+    stream_chunk_size = 2000
+    # SKU que acepta una consulta de disponibilidad.
+    max_codigos_disponibilidad = 500
+
     # --- AÑADIR ESTA LÍNEA ---
     # Sobrescribimos la política de permisos por defecto solo para esta vista.
-    permission_classes = [IsAuthenticatedOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        # El serializer recorre productocategoria_set -> categoria por cada producto.
+        # Precargamos esas relaciones para que la lista y el detalle usen un
+        # número fijo de consultas, sin importar el tamaño del catálogo.
+        queryset = Producto.objects.con_categorias()
+        # Filtro opcional por categoría (incluye sus subcategorías): ?categoria=<id>
+        categoria = self.request.query_params.get('categoria')
+        if categoria is not None:
+            if not categoria.isdigit():
+                raise ValidationError({'categoria': "Debe ser el id numérico de una categoría."})
+            queryset = filtrar_por_categoria(queryset, int(categoria))
+        # Filtros por atributos: ?attr.color=rojo&attr.talla=M
+        try:
+            atributos = extraer_filtros(self.request.query_params)
+        except ValueError as error:
+            raise ValidationError({'atributos': str(error)})
+        return queryset.con_atributos(atributos)
+
+    @action(detail=False)
+    def facetas(self, request):
+        """
+        Conteo de productos por atributo y valor, con los mismos filtros de la lista.
+        """
+        # Sin el prefetch de categorías: aquí solo se necesitan los ids.
+        queryset = self.get_queryset().prefetch_related(None)
+        return Response(facetas_cacheadas(queryset, request.query_params.dict()))
+
+    @action(detail=False)
+    def disponibilidad(self, request):
+        """
+        Stock de varios SKU en una sucursal, con una sola consulta:
+        ?sucursal=<id>&codigos=SKU-1,SKU-2
+        """
+        sucursal = request.query_params.get('sucursal', '')
+        if not sucursal.isdigit():
+            raise ValidationError({'sucursal': "Debe ser el id numérico de una sucursal."})
+        # Sin vacíos ni repetidos, conservando el orden en que llegaron.
+        codigos = request.query_params.get('codigos', '').split(',')
+        codigos = list(dict.fromkeys(codigo.strip() for codigo in codigos if codigo.strip()))
+        if not codigos:
+            raise ValidationError({'codigos': "Indique al menos un SKU."})
+        if len(codigos) > self.max_codigos_disponibilidad:
+            raise ValidationError({'codigos': f"Máximo {self.max_codigos_disponibilidad} SKU por consulta."})
+
+        stock = disponibilidad(int(sucursal), codigos)
+        return Response({
+            'sucursal': int(sucursal),
+            'disponibilidad': stock,
+            'no_encontrados': [codigo for codigo in codigos if codigo not in stock],
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Crea o actualiza productos por SKU en una sola transacción.
+        Recibe una lista de productos y responde con los errores por fila.
+        """
+        filas = request.data
+        if not isinstance(filas, list):
+            raise ValidationError("Se esperaba una lista de productos.")
+        if len(filas) > MAX_FILAS:
+            raise ValidationError(f"Máximo {MAX_FILAS} productos por petición.")
+        return Response(sincronizar_productos(filas))
+
+    def list(self, request, *args, **kwargs):
+        # Modo opcional ?stream=1: devolvemos todo el catálogo como NDJSON
+        # (un producto por línea) sin cargarlo en memoria.
+        if request.query_params.get('stream') == '1':
+            queryset = self.filter_queryset(self.get_queryset()).order_by('nombre', 'id')
+            return StreamingHttpResponse(
+                self._generar_ndjson(queryset), content_type='application/x-ndjson'
+            )
+        return super().list(request, *args, **kwargs)
+
+    def _generar_ndjson(self, queryset):
+        # .iterator(chunk_size=...) lee por bloques con un cursor del lado del
+        # servidor y aplica el prefetch de categorías a cada bloque.
+        # Se consume después de la vista, fuera de get_condicional: lleva su
+        # propio bloque en la primaria.
+        renderer = JSONRenderer()
+        with lectura_primaria():
+            for producto in queryset.iterator(chunk_size=self.stream_chunk_size):
+                yield renderer.render(self.get_serializer(producto).data) + b'\n'
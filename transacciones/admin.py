@@ -1,7 +1,10 @@
 # transacciones/admin.py
 
 from django.contrib import admin
-from .models import Transaccion, DetalleTransaccion, Devolucion
+from .models import (
+    Transaccion, DetalleTransaccion, Devolucion, MovimientoInventario, ConsecutivoFactura, AnalisisInventario,
+    LoteInventario,
+)
 
 class DetalleTransaccionInline(admin.TabularInline):
     """
@@ -18,6 +21,8 @@ class TransaccionAdmin(admin.ModelAdmin):
     """
     list_display = ('__str__', 'fecha', 'sucursal', 'empleado', 'tipo_transaccion', 'total', 'estado')
     list_filter = ('tipo_transaccion', 'estado', 'sucursal', 'fecha')
+    # __str__ y las columnas leen la sucursal (con su empresa) y el empleado.
+    list_select_related = ('sucursal__empresa', 'empleado')
     search_fields = ('numero_factura', 'cliente__nombres', 'proveedor__nombres')
     autocomplete_fields = ['sucursal', 'proveedor', 'cliente', 'empleado']
 
@@ -32,7 +37,8 @@ class DetalleTransaccionAdmin(admin.ModelAdmin):
     Admin para DetalleTransaccion.
     Se registra principalmente para habilitar el autocompletado en otros admins.
     """
-    list_display = ('__str__', 'producto', 'transaccion')
+    list_display = ('__str__', 'producto', 'transaccion', 'cantidad_devuelta', 'monto_devuelto')
+    list_select_related = ('producto', 'transaccion__sucursal__empresa')
     # Esta es la parte crucial que necesita DevolucionAdmin para su autocompletado
     search_fields = ['producto__nombre', 'transaccion__numero_factura', 'lote']
 
@@ -48,6 +54,77 @@ class DevolucionAdmin(admin.ModelAdmin):
 
     list_per_page = 20
 
+@admin.register(ConsecutivoFactura)
+class ConsecutivoFacturaAdmin(admin.ModelAdmin):
+    """
+    Numeración por sucursal y tipo. 'siguiente' es de solo lectura: solo lo
+    avanza transacciones/consecutivos.py.
+    """
+    list_display = ('sucursal', 'tipo', 'prefijo', 'siguiente', 'sin_huecos')
+    list_filter = ('tipo', 'sin_huecos')
+    autocomplete_fields = ['sucursal']
+    readonly_fields = ('siguiente',)
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(admin.ModelAdmin):
+    """
+    Consulta del libro de movimientos. Es de solo lectura: los movimientos
+    los generan las transacciones y devoluciones (ver transacciones/inventario.py).
+    """
+    list_display = ('fecha', 'producto', 'sucursal', 'tipo', 'cantidad', 'costo_unitario', 'saldo_valor')
+    list_filter = ('tipo', 'sucursal', 'fecha')
+    search_fields = ('producto__codigo', 'producto__nombre')
+    list_select_related = ('producto', 'sucursal__empresa')
+
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(LoteInventario)
+class LoteInventarioAdmin(admin.ModelAdmin):
+    """
+    Existencias por lote. Las cantidades las mueven las transacciones (ver
+    transacciones/lotes.py); aquí solo se consultan o se corrige el vencimiento.
+    """
+    list_display = ('producto', 'sucursal', 'lote', 'fecha_vencimiento', 'cantidad')
+    list_filter = ('sucursal', 'fecha_vencimiento')
+    search_fields = ('producto__codigo', 'producto__nombre', 'lote')
+    list_select_related = ('producto', 'sucursal__empresa')
+    readonly_fields = ('producto', 'sucursal', 'lote', 'cantidad')
+
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(AnalisisInventario)
+class AnalisisInventarioAdmin(admin.ModelAdmin):
+    """
+    Clase ABC y stock mínimo sugerido por producto. Solo lectura: lo calcula
+    el comando analizar_inventario (ver transacciones/analitica.py).
+    """
+    list_display = (
+        'producto', 'clase_abc', 'demanda_diaria', 'stock_seguridad', 'stock_minimo_sugerido', 'calculado',
+    )
+    list_filter = ('clase_abc',)
+    search_fields = ('producto__codigo', 'producto__nombre')
+    list_select_related = ('producto',)
+
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 # Nota importante: No registramos 'DetalleTransaccion' por sí solo.
 # ¿Por qué? Porque no tiene sentido de negocio crear, ver o editar un "detalle"
 # sin el contexto de su transacción principal. Su gestión debe ocurrir
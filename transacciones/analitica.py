@@ -0,0 +1,200 @@
+# transacciones/analitica.py
+"""
+Analítica de inventario: clasificación ABC y stock mínimo sugerido por SKU.
+
+La historia de ventas se lee del agregado diario (VentaDiaria) en columnas
+(arreglos de numpy) con values_list, sin crear un objeto por fila, y todas
+las métricas se calculan en una sola pasada vectorizada:
+
+- Clase ABC por ingresos: A hasta el 80 % acumulado, B hasta el 95 %, C el resto.
+- Demanda diaria promedio y su desviación (los días sin ventas cuentan como 0).
+- Stock de seguridad = z * desviación * raíz(días de reposición), con z
+  según el nivel de servicio.
+- Stock mínimo sugerido = demanda diaria * días de reposición + stock de seguridad.
+
+El resultado se guarda en AnalisisInventario con inserciones en lote y, si se
+pide, se copia a Producto.stock_minimo.
+"""
+import datetime
+from decimal import Decimal
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.db.models import FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from core.enums import ClaseABC, TipoTransaccion
+from productos.cache import invalidar_stock
+from productos.models import Producto
+from .models import AnalisisInventario, VentaDiaria
+
+DIAS_HISTORIA = 730
+DIAS_REPOSICION = 7
+NIVEL_SERVICIO = 0.95
+UMBRALES_ABC = (0.80, 0.95)
+TAMANO_LOTE = 5000
+
+VENTAS_DTYPE = np.dtype([('producto', np.int64), ('cantidad', np.float64), ('ingresos', np.float64)])
+CAMPOS_RESULTADO = (
+    'clase_abc', 'ingresos', 'demanda_diaria', 'desviacion_diaria',
+    'stock_seguridad', 'stock_minimo_sugerido', 'calculado',
+)
+
+
+def cargar_ventas(desde, hasta):
+    """
+    Ventas por (producto, día) entre dos fechas (inclusive), sumadas entre
+    sucursales, como un arreglo estructurado de numpy (producto, cantidad,
+    ingresos). Los totales llegan ya como float desde la base de datos.
+    """
+    filas = (
+        VentaDiaria.objects.filter(dia__range=(desde, hasta), tipo_transaccion=TipoTransaccion.VENTA.value)
+        .order_by()
+        .values('producto_id', 'dia')
+        .annotate(
+            total_cantidad=Cast(Sum('cantidad'), FloatField()),
+            total_ingresos=Cast(Sum('ingresos'), FloatField()),
+        )
+        .values_list('producto_id', 'total_cantidad', 'total_ingresos')
+    )
+    return np.fromiter(filas.iterator(chunk_size=TAMANO_LOTE), dtype=VENTAS_DTYPE)
+
+
+def calcular(productos, ventas, dias, dias_reposicion=DIAS_REPOSICION, nivel_servicio=NIVEL_SERVICIO,
+             umbrales=UMBRALES_ABC):
+    """
+    Métricas de todos los productos a la vez. `productos` es un arreglo de ids
+    y `ventas` el arreglo de cargar_ventas(); las ventas de productos que no
+    están en `productos` se ignoran. Devuelve un diccionario de arreglos
+    alineados con `productos`.
+    """
+    productos = np.asarray(productos, dtype=np.int64)
+    n = len(productos)
+    orden = np.argsort(productos)
+    ordenados = productos[orden]
+    # Posición de cada venta en `productos` (búsqueda binaria vectorizada).
+    posiciones = np.searchsorted(ordenados, ventas['producto'])
+    encontradas = posiciones < n
+    encontradas[encontradas] = ordenados[posiciones[encontradas]] == ventas['producto'][encontradas]
+    indices = orden[posiciones[encontradas]]
+    cantidades = ventas['cantidad'][encontradas]
+
+    suma = np.bincount(indices, weights=cantidades, minlength=n)
+    suma_cuadrados = np.bincount(indices, weights=cantidades ** 2, minlength=n)
+    ingresos = np.bincount(indices, weights=ventas['ingresos'][encontradas], minlength=n)
+
+    demanda = suma / dias
+    desviacion = np.sqrt(np.maximum(suma_cuadrados / dias - demanda ** 2, 0.0))
+    z = NormalDist().inv_cdf(nivel_servicio)
+    seguridad = z * desviacion * np.sqrt(dias_reposicion)
+    minimo = np.maximum(demanda * dias_reposicion + seguridad, 0.0)
+
+    # ABC: participación acumulada de los productos con más ingresos antes de
+    # cada uno, así el producto que cruza el umbral todavía queda en la clase.
+    clase = np.full(n, ClaseABC.C.value, dtype='<U1')
+    total = ingresos[ingresos > 0].sum()
+    if total > 0:
+        por_ingresos = np.argsort(-ingresos, kind='stable')
+        ordenados_ingresos = ingresos[por_ingresos]
+        previa = np.empty(n)
+        previa[por_ingresos] = (np.cumsum(ordenados_ingresos) - ordenados_ingresos) / total
+        con_ingresos = ingresos > 0
+        clase[con_ingresos & (previa < umbrales[1])] = ClaseABC.B.value
+        clase[con_ingresos & (previa < umbrales[0])] = ClaseABC.A.value
+
+    return {
+        'producto': productos,
+        'clase_abc': clase,
+        'ingresos': ingresos,
+        'demanda_diaria': demanda,
+        'desviacion_diaria': desviacion,
+        'stock_seguridad': seguridad,
+        'stock_minimo_sugerido': minimo,
+        'con_ventas': suma > 0,
+    }
+
+
+def _decimales(valores, posiciones):
+    return [Decimal(str(valor)) for valor in np.round(valores, posiciones).tolist()]
+
+
+def guardar(resultado, calculado=None):
+    """
+    Reescribe AnalisisInventario con el resultado de calcular(), por lotes
+    (upsert por producto). Devuelve cuántas filas escribió.
+    """
+    calculado = calculado or timezone.now()
+    columnas = {
+        'producto_id': resultado['producto'].tolist(),
+        'clase_abc': resultado['clase_abc'].tolist(),
+        'ingresos': _decimales(resultado['ingresos'], 2),
+        'demanda_diaria': _decimales(resultado['demanda_diaria'], 4),
+        'desviacion_diaria': _decimales(resultado['desviacion_diaria'], 4),
+        'stock_seguridad': _decimales(resultado['stock_seguridad'], 3),
+        'stock_minimo_sugerido': _decimales(resultado['stock_minimo_sugerido'], 2),
+    }
+    total = len(columnas['producto_id'])
+    with transaction.atomic():
+        for inicio in range(0, total, TAMANO_LOTE):
+            AnalisisInventario.objects.bulk_create(
+                [
+                    AnalisisInventario(
+                        calculado=calculado,
+                        **{campo: valores[i] for campo, valores in columnas.items()},
+                    )
+                    for i in range(inicio, min(inicio + TAMANO_LOTE, total))
+                ],
+                update_conflicts=True,
+                unique_fields=['producto'],
+                update_fields=CAMPOS_RESULTADO,
+            )
+    return total
+
+
+def aplicar_stock_minimo(productos):
+    """
+    Copia el stock mínimo sugerido a Producto.stock_minimo con un solo UPDATE
+    por lote de ids. Devuelve cuántos productos actualizó.
+    """
+    productos = list(productos)
+    sugerido = AnalisisInventario.objects.filter(producto=OuterRef('pk')).values('stock_minimo_sugerido')
+    actualizados = 0
+    with transaction.atomic():
+        for inicio in range(0, len(productos), TAMANO_LOTE):
+            actualizados += Producto.all_objects.filter(pk__in=productos[inicio:inicio + TAMANO_LOTE]).update(
+                stock_minimo=Subquery(sugerido[:1])
+            )
+        # queryset.update() no dispara señales: invalidamos la cache a mano.
+        transaction.on_commit(lambda: invalidar_stock(productos))
+    return actualizados
+
+
+def analizar_inventario(hasta=None, dias=DIAS_HISTORIA, dias_reposicion=DIAS_REPOSICION,
+                        nivel_servicio=NIVEL_SERVICIO, aplicar=False):
+    """
+    Calcula y guarda el análisis de todos los productos con los `dias` días
+    de ventas que terminan en `hasta` (por defecto, ayer). Con `aplicar`,
+    copia el mínimo sugerido a Producto.stock_minimo solo en los productos
+    con ventas en el periodo: los demás conservan el mínimo configurado a mano.
+    Devuelve el conteo por clase y cuántos productos se actualizaron.
+    """
+    hasta = hasta or timezone.localdate() - datetime.timedelta(days=1)
+    desde = hasta - datetime.timedelta(days=dias - 1)
+    productos = np.fromiter(
+        Producto.objects.order_by().values_list('pk', flat=True).iterator(chunk_size=TAMANO_LOTE), dtype=np.int64
+    )
+    resultado = calcular(
+        productos, cargar_ventas(desde, hasta), dias,
+        dias_reposicion=dias_reposicion, nivel_servicio=nivel_servicio,
+    )
+    guardar(resultado)
+
+    clases, conteos = np.unique(resultado['clase_abc'], return_counts=True)
+    resumen = {clase.value: 0 for clase in ClaseABC}
+    resumen.update(zip(clases.tolist(), conteos.tolist()))
+    actualizados = 0
+    if aplicar:
+        actualizados = aplicar_stock_minimo(resultado['producto'][resultado['con_ventas']].tolist())
+    return {'clases': resumen, 'productos': len(productos), 'stock_minimo_actualizados': actualizados}
@@ -0,0 +1,9 @@
+# transacciones/api_urls.py
+from rest_framework.routers import DefaultRouter
+from . import views
+
+router = DefaultRouter()
+# Mismo esquema que productos/api_urls.py: el prefijo está en config/urls.py.
+router.register(r'', views.TransaccionViewSet, basename='transaccion')
+
+urlpatterns = router.urls
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TransaccionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'transacciones'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receptores del libro de inventario)
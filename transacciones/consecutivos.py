@@ -0,0 +1,129 @@
+# transacciones/consecutivos.py
+"""
+Asignación de números de factura y devolución por (sucursal, tipo).
+
+Un MAX(numero)+1 obliga a leer y bloquear toda la numeración en cada venta y
+falla con escrituras concurrentes. Aquí cada ConsecutivoFactura guarda el
+próximo número y se avanza con UPDATE siguiente = siguiente + n:
+
+- Por bloques (por defecto): cada proceso reserva TAMANO_BLOQUE números de
+  una vez y los entrega desde memoria; solo toca la base de datos al agotar
+  el bloque. No hay duplicados, pero sí huecos (los bloques que un proceso
+  no termina de usar).
+- Sin huecos (ConsecutivoFactura.sin_huecos, p. ej. facturación electrónica
+  DIAN): el número se toma dentro de la transacción que guarda la factura;
+  si esta se revierte, el número vuelve. Las facturas de esa sucursal y tipo
+  se numeran una a la vez, las demás sucursales no se ven afectadas.
+"""
+import os
+import threading
+from functools import partial
+
+from django.db import transaction
+from django.db.transaction import TransactionManagementError
+from django.db.models import F
+
+from core.enums import TipoConsecutivo
+from .models import ConsecutivoFactura
+
+TAMANO_BLOQUE = 100
+
+_bloqueo = threading.Lock()
+# (sucursal_id, tipo) -> (prefijo, iterador de números reservados)
+_bloques = {}
+_pid = os.getpid()
+
+
+def formatear(prefijo, numero):
+    return f'{prefijo}{numero}'
+
+
+def obtener_consecutivo(sucursal_id, tipo):
+    """
+    Configuración del consecutivo; se crea la primera vez. Las ventas nacen
+    sin huecos porque así lo exige la facturación electrónica.
+    """
+    consecutivo, _ = ConsecutivoFactura.objects.get_or_create(
+        sucursal_id=sucursal_id, tipo=tipo,
+        defaults={'sin_huecos': tipo == TipoConsecutivo.VENTA.value},
+    )
+    return consecutivo
+
+
+def avanzar(consecutivo_id, cantidad):
+    """
+    Reserva `cantidad` números y devuelve el primero. El UPDATE bloquea la
+    fila hasta el final de la transacción, así la lectura siguiente ve
+    nuestro propio incremento y ningún otro proceso puede obtener los mismos.
+    """
+    with transaction.atomic():
+        filas = ConsecutivoFactura.objects.filter(pk=consecutivo_id)
+        filas.update(siguiente=F('siguiente') + cantidad)
+        return filas.values_list('siguiente', flat=True).get() - cantidad
+
+
+def reservar_bloque(sucursal_id, tipo, cantidad=TAMANO_BLOQUE):
+    """
+    Reserva un bloque de números para uso propio (por ejemplo, un punto de
+    venta que factura sin conexión). Devuelve (prefijo, range).
+    """
+    consecutivo = obtener_consecutivo(sucursal_id, tipo)
+    inicio = avanzar(consecutivo.pk, cantidad)
+    return consecutivo.prefijo, range(inicio, inicio + cantidad)
+
+
+def asignar_numero(sucursal_id, tipo):
+    """
+    Próximo número formateado (prefijo + consecutivo) para la sucursal y tipo.
+    Con numeración sin huecos debe llamarse dentro de transaction.atomic(),
+    junto con el guardado de la factura (Transaccion.save ya lo hace).
+    """
+    clave = (sucursal_id, tipo)
+    with _bloqueo:
+        _descartar_bloques_heredados()
+        if clave in _bloques:
+            prefijo, numeros = _bloques[clave]
+            numero = next(numeros, None)
+            if numero is not None:
+                return formatear(prefijo, numero)
+            del _bloques[clave]
+
+    consecutivo = obtener_consecutivo(sucursal_id, tipo)
+    if consecutivo.sin_huecos:
+        if not transaction.get_connection().in_atomic_block:
+            raise TransactionManagementError(
+                "La numeración sin huecos debe asignarse dentro de la transacción que guarda la factura."
+            )
+        return formatear(consecutivo.prefijo, avanzar(consecutivo.pk, 1))
+
+    inicio = avanzar(consecutivo.pk, TAMANO_BLOQUE)
+    # Dentro de una transacción, el bloque solo queda disponible si se
+    # confirma: si se revierte, la base de datos volverá a entregar esos números.
+    transaction.on_commit(partial(
+        _guardar_bloque, clave, consecutivo.prefijo, range(inicio + 1, inicio + TAMANO_BLOQUE)
+    ))
+    return formatear(consecutivo.prefijo, inicio)
+
+
+def _guardar_bloque(clave, prefijo, numeros):
+    with _bloqueo:
+        # Si otro hilo guardó un bloque a la vez, el sobrante de uno se pierde
+        # (un hueco, nunca un duplicado).
+        _bloques[clave] = (prefijo, iter(numeros))
+
+
+def _descartar_bloques_heredados():
+    # Tras un fork (servidores con preload) el hijo no debe usar los bloques
+    # del padre: los dos entregarían los mismos números.
+    global _pid
+    if os.getpid() != _pid:
+        _bloques.clear()
+        _pid = os.getpid()
+
+
+def descartar_bloques():
+    """
+    Olvida los bloques reservados por este proceso (quedan como huecos).
+    """
+    with _bloqueo:
+        _bloques.clear()
@@ -0,0 +1,144 @@
+# transacciones/devoluciones.py
+"""
+Acumulado de devoluciones por línea de factura.
+
+DetalleTransaccion.cantidad_devuelta y monto_devuelto suman las devoluciones
+procesadas (y no eliminadas) de cada línea. Así validar una devolución nueva
+o calcular ventas netas no obliga a sumar todas las devoluciones anteriores.
+
+Devolucion.save() ajusta el acumulado con UPDATE ... SET x = x + delta en la
+misma transacción que el cambio de estado; el UPDATE solo suma si no se
+supera la cantidad de la línea, así dos devoluciones simultáneas no pueden
+devolver más de lo vendido. Los cambios hechos con queryset.update() no pasan
+por save(): el comando conciliar_devoluciones los detecta y corrige.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.enums import EstadoDevolucion
+from .models import DetalleTransaccion, Devolucion
+
+CERO = Decimal('0')
+TAMANO_LOTE = 2000
+
+
+def cuenta_en_acumulado(estado, deleted):
+    return estado == EstadoDevolucion.PROCESADA.value and deleted is None
+
+
+def _aporte_guardado(devolucion):
+    """
+    (detalle, cantidad, monto) con que la devolución figura hoy en el
+    acumulado según la base de datos, o None. Bloquea la fila para que dos
+    guardados simultáneos de la misma devolución no sumen dos veces.
+    """
+    if devolucion.pk is None:
+        return None
+    fila = (
+        Devolucion.all_objects.select_for_update().filter(pk=devolucion.pk)
+        .values_list('estado', 'deleted', 'detalle_transaccion_id', 'cantidad_devuelta', 'monto_devolucion')
+        .first()
+    )
+    if fila is None or not cuenta_en_acumulado(fila[0], fila[1]):
+        return None
+    return fila[2:]
+
+
+def actualizar_acumulado(devolucion):
+    """
+    Lleva al acumulado de la línea el cambio de la devolución (estado,
+    cantidad, monto, línea o soft delete). Debe llamarse dentro de la
+    transacción que la guarda, antes del guardado. Lanza ValidationError si
+    la línea quedaría con más unidades devueltas que vendidas.
+    """
+    anterior = _aporte_guardado(devolucion)
+    nuevo = None
+    if cuenta_en_acumulado(devolucion.estado, devolucion.deleted):
+        nuevo = (devolucion.detalle_transaccion_id, devolucion.cantidad_devuelta, devolucion.monto_devolucion)
+    if anterior == nuevo:
+        return
+
+    lineas = DetalleTransaccion.all_objects.all()
+    if anterior is not None:
+        detalle_id, cantidad, monto = anterior
+        lineas.filter(pk=detalle_id).update(
+            cantidad_devuelta=F('cantidad_devuelta') - cantidad, monto_devuelto=F('monto_devuelto') - monto,
+        )
+    if nuevo is not None:
+        detalle_id, cantidad, monto = nuevo
+        sumadas = lineas.filter(pk=detalle_id, cantidad__gte=F('cantidad_devuelta') + cantidad).update(
+            cantidad_devuelta=F('cantidad_devuelta') + cantidad, monto_devuelto=F('monto_devuelto') + monto,
+        )
+        if not sumadas:
+            raise ValidationError(
+                {'cantidad_devuelta': "La devolución supera la cantidad pendiente por devolver de la línea."}
+            )
+
+
+def disponible_para_devolver(devolucion):
+    """
+    Unidades que la devolución puede llevar: lo vendido en la línea menos lo
+    ya devuelto, sin contar lo que esta misma devolución aporta hoy.
+    """
+    cantidad, devuelta = DetalleTransaccion.all_objects.filter(
+        pk=devolucion.detalle_transaccion_id
+    ).values_list('cantidad', 'cantidad_devuelta').get()
+    if devolucion.pk is not None:
+        fila = Devolucion.all_objects.filter(pk=devolucion.pk).values_list(
+            'estado', 'deleted', 'detalle_transaccion_id', 'cantidad_devuelta'
+        ).first()
+        if fila and cuenta_en_acumulado(fila[0], fila[1]) and fila[2] == devolucion.detalle_transaccion_id:
+            devuelta -= fila[3]
+    return cantidad - devuelta
+
+
+def conciliar_devoluciones(corregir=False, tamano_lote=TAMANO_LOTE):
+    """
+    Compara el acumulado de cada línea con la suma real de sus devoluciones
+    procesadas en una sola consulta (solo devuelve las líneas que no
+    coinciden) y, si se pide, las corrige por lotes. Devuelve la lista de
+    diferencias: (detalle_id, guardado, real) para cantidad y monto.
+    """
+    procesadas = (
+        Devolucion.objects.filter(detalle_transaccion=OuterRef('pk'), estado=EstadoDevolucion.PROCESADA.value)
+        .order_by().values('detalle_transaccion')
+    )
+    decimal = DecimalField()
+    diferencias = (
+        DetalleTransaccion.all_objects.order_by('pk')
+        .annotate(
+            cantidad_real=Coalesce(
+                Subquery(procesadas.annotate(total=Sum('cantidad_devuelta')).values('total')), CERO,
+                output_field=decimal,
+            ),
+            monto_real=Coalesce(
+                Subquery(procesadas.annotate(total=Sum('monto_devolucion')).values('total')), CERO,
+                output_field=decimal,
+            ),
+        )
+        .filter(~Q(cantidad_devuelta=F('cantidad_real')) | ~Q(monto_devuelto=F('monto_real')))
+        .values_list('pk', 'cantidad_devuelta', 'cantidad_real', 'monto_devuelto', 'monto_real')
+    )
+
+    encontradas, lote = [], []
+    for pk, cantidad, cantidad_real, monto, monto_real in diferencias.iterator(chunk_size=tamano_lote):
+        encontradas.append({
+            'detalle': pk, 'cantidad_devuelta': (cantidad, cantidad_real), 'monto_devuelto': (monto, monto_real),
+        })
+        if corregir:
+            lote.append(DetalleTransaccion(pk=pk, cantidad_devuelta=cantidad_real, monto_devuelto=monto_real))
+            if len(lote) >= tamano_lote:
+                _corregir(lote)
+                lote = []
+    if lote:
+        _corregir(lote)
+    return encontradas
+
+
+def _corregir(lineas):
+    with transaction.atomic():
+        DetalleTransaccion.all_objects.bulk_update(lineas, ['cantidad_devuelta', 'monto_devuelto'], batch_size=1000)
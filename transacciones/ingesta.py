@@ -0,0 +1,233 @@
+# transacciones/ingesta.py
+"""
+Carga en lote de ventas desde los puntos de venta (que venden sin conexión
+y suben después). Es idempotente por (sucursal, numero_factura,
+tipo_transaccion): reenviar un lote no duplica ventas.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from core.enums import EstadoTransaccion, TipoTransaccion
+from organizacion.models import Sucursal
+from productos.models import Producto
+from usuarios.models import PerfilUsuario
+from .inventario import aplicar_movimientos, movimiento_de_detalle
+from .lotes import existencias_lotes
+from .models import DetalleTransaccion, Transaccion
+from .serializers import TransaccionLoteSerializer
+
+MAX_VENTAS = 5000
+TAMANO_LOTE = 1000
+
+
+def ingerir_ventas(ventas):
+    """
+    Valida cada venta y guarda las válidas (encabezados y detalles) con
+    bulk_create en una sola transacción, junto con sus movimientos de
+    inventario. Las ventas inválidas se reportan y no detienen al resto;
+    las que ya existen se informan como duplicadas.
+    """
+    validador = TransaccionLoteSerializer()
+    errores = []
+    validas = []
+    for indice, venta in enumerate(ventas):
+        try:
+            validas.append((indice, validador.run_validation(venta)))
+        except serializers.ValidationError as error:
+            numero = venta.get('numero_factura') if isinstance(venta, dict) else None
+            errores.append({'venta': indice, 'numero_factura': numero, 'errores': error.detail})
+
+    validas = _verificar_referencias(validas, errores)
+
+    # Si otra carga con las mismas facturas confirma a la vez, el INSERT choca
+    # con unique_together; al reintentar esas ventas ya cuentan como duplicadas.
+    for intento in range(2):
+        try:
+            with transaction.atomic():
+                creadas, duplicadas = _insertar(validas)
+            break
+        except IntegrityError:
+            if intento:
+                raise
+
+    return {'creadas': creadas, 'duplicadas': duplicadas, 'errores': errores}
+
+
+def _verificar_referencias(validas, errores):
+    """
+    Comprueba sucursales, perfiles, SKU y existencias de los lotes de todo
+    el lote de ventas con una consulta por modelo y reemplaza cada SKU por el
+    id del producto.
+    """
+    sucursales, perfiles, codigos = set(), set(), set()
+    for _, datos in validas:
+        sucursales.add(datos['sucursal'])
+        perfiles.update(datos.get(campo) for campo in ('empleado', 'cliente', 'proveedor'))
+        codigos.update(detalle['codigo'] for detalle in datos['detalles'])
+    perfiles.discard(None)
+
+    sucursales = set(Sucursal.objects.filter(pk__in=sucursales).values_list('pk', flat=True))
+    perfiles = set(PerfilUsuario.objects.filter(pk__in=perfiles).values_list('pk', flat=True))
+    productos = dict(Producto.objects.filter(codigo__in=codigos).values_list('codigo', 'pk'))
+    disponibles, cargadas = _existencias_pedidas(validas, productos)
+
+    correctas = []
+    for indice, datos in validas:
+        problemas = {}
+        if datos['sucursal'] not in sucursales:
+            problemas['sucursal'] = ["La sucursal no existe."]
+        for campo in ('empleado', 'cliente', 'proveedor'):
+            if datos.get(campo) is not None and datos[campo] not in perfiles:
+                problemas[campo] = ["El perfil no existe."]
+        faltantes = sorted({d['codigo'] for d in datos['detalles']} - productos.keys())
+        if faltantes:
+            problemas['detalles'] = [f"SKU inexistente: {', '.join(faltantes)}."]
+        elif not problemas:
+            cortos = _reservar_lotes(datos, productos, disponibles, cargadas)
+            if cortos:
+                problemas['detalles'] = [f"Lote sin existencias suficientes: {', '.join(cortos)}."]
+        if problemas:
+            errores.append({'venta': indice, 'numero_factura': datos['numero_factura'], 'errores': problemas})
+            continue
+        for detalle in datos['detalles']:
+            detalle['producto_id'] = productos[detalle.pop('codigo')]
+        correctas.append(datos)
+    return correctas
+
+
+def _consume_lotes(datos):
+    return (
+        datos['tipo_transaccion'] == TipoTransaccion.VENTA.value
+        and datos['estado'] == EstadoTransaccion.FINALIZADA.value
+        and any(detalle.get('lote') for detalle in datos['detalles'])
+    )
+
+
+def _existencias_pedidas(validas, productos):
+    """
+    Existencias de los lotes que piden las ventas finalizadas del lote, y las
+    claves de las ventas ya cargadas (que no se vuelven a registrar).
+    """
+    pedidas = [datos for _, datos in validas if _consume_lotes(datos)]
+    claves = {
+        (productos[detalle['codigo']], datos['sucursal'], detalle['lote'])
+        for datos in pedidas for detalle in datos['detalles']
+        if detalle.get('lote') and detalle['codigo'] in productos
+    }
+    if not claves:
+        return {}, set()
+    cargadas = set(Transaccion.all_objects.filter(
+        sucursal_id__in={datos['sucursal'] for datos in pedidas},
+        numero_factura__in={datos['numero_factura'] for datos in pedidas},
+    ).values_list('sucursal_id', 'numero_factura', 'tipo_transaccion'))
+    return existencias_lotes(claves), cargadas
+
+
+def _reservar_lotes(datos, productos, disponibles, cargadas):
+    """
+    Descuenta de `disponibles` lo que la venta pide de cada lote y devuelve
+    los lotes que no alcanzan (sin descontar nada). Las ventas ya cargadas
+    no piden: al reenviarlas solo se informan como duplicadas.
+    """
+    clave_venta = (datos['sucursal'], datos['numero_factura'], datos['tipo_transaccion'])
+    if not _consume_lotes(datos) or clave_venta in cargadas:
+        return []
+    pedido = defaultdict(Decimal)
+    for detalle in datos['detalles']:
+        if detalle.get('lote'):
+            pedido[productos[detalle['codigo']], datos['sucursal'], detalle['lote']] += detalle['cantidad']
+    cortos = sorted({clave[2] for clave, cantidad in pedido.items() if cantidad > disponibles.get(clave, 0)})
+    if not cortos:
+        cargadas.add(clave_venta)
+        for clave, cantidad in pedido.items():
+            disponibles[clave] -= cantidad
+    return cortos
+
+
+def _insertar(validas):
+    # Claves que ya están en la base de datos (incluidas las eliminadas con
+    # soft delete, porque unique_together también las cubre).
+    claves = Transaccion.all_objects.filter(
+        sucursal_id__in={datos['sucursal'] for datos in validas},
+        numero_factura__in={datos['numero_factura'] for datos in validas},
+    ).values_list('sucursal_id', 'numero_factura', 'tipo_transaccion')
+    vistas = set(claves)
+
+    nuevas, duplicadas = [], []
+    for datos in validas:
+        clave = (datos['sucursal'], datos['numero_factura'], datos['tipo_transaccion'])
+        if clave in vistas:
+            duplicadas.append(datos['numero_factura'])
+            continue
+        vistas.add(clave)
+        nuevas.append(datos)
+
+    encabezados = Transaccion.objects.bulk_create(
+        [
+            Transaccion(
+                sucursal_id=datos['sucursal'], empleado_id=datos['empleado'],
+                cliente_id=datos.get('cliente'), proveedor_id=datos.get('proveedor'),
+                **{campo: valor for campo, valor in datos.items()
+                   if campo not in ('sucursal', 'empleado', 'cliente', 'proveedor', 'detalles')},
+            )
+            for datos in nuevas
+        ],
+        batch_size=TAMANO_LOTE,
+    )
+    if not connection.features.can_return_rows_from_bulk_insert:
+        _releer_encabezados(encabezados)
+    detalles = DetalleTransaccion.objects.bulk_create(
+        [
+            DetalleTransaccion(transaccion=encabezado, **detalle)
+            for encabezado, datos in zip(encabezados, nuevas)
+            for detalle in datos['detalles']
+        ],
+        batch_size=TAMANO_LOTE,
+    )
+    if not connection.features.can_return_rows_from_bulk_insert:
+        _releer_detalles(encabezados, detalles)
+
+    # bulk_create no dispara señales: los movimientos se registran aquí, en
+    # la misma transacción que las ventas.
+    ahora = timezone.now()
+    aplicar_movimientos([
+        movimiento_de_detalle(detalle.transaccion, detalle, ahora)
+        for detalle in detalles
+        if detalle.transaccion.estado == EstadoTransaccion.FINALIZADA.value
+    ])
+    return len(nuevas), duplicadas
+
+
+# MySQL (y MariaDB antes de 10.5) no devuelve los pks de bulk_create: los
+# objetos quedan sin pk y los detalles y movimientos no podrían referenciarlos.
+def _releer_encabezados(encabezados):
+    """
+    Asigna el pk a cada encabezado por su clave única (sucursal,
+    numero_factura, tipo_transaccion).
+    """
+    pks = {
+        (sucursal_id, numero, tipo): pk
+        for pk, sucursal_id, numero, tipo in Transaccion.all_objects.filter(
+            sucursal_id__in={encabezado.sucursal_id for encabezado in encabezados},
+            numero_factura__in={encabezado.numero_factura for encabezado in encabezados},
+        ).values_list('pk', 'sucursal_id', 'numero_factura', 'tipo_transaccion')
+    }
+    for encabezado in encabezados:
+        encabezado.pk = pks[encabezado.sucursal_id, encabezado.numero_factura, encabezado.tipo_transaccion]
+
+
+def _releer_detalles(encabezados, detalles):
+    """
+    Asigna el pk a cada detalle. Los encabezados son nuevos (nadie más les
+    agrega detalles) y los pks crecen en el orden de inserción, que es el
+    de la lista.
+    """
+    pks = DetalleTransaccion.all_objects.filter(
+        transaccion_id__in=[encabezado.pk for encabezado in encabezados]
+    ).order_by('pk').values_list('pk', flat=True)
+    for detalle, pk in zip(detalles, pks, strict=True):
+        detalle.pk = pk
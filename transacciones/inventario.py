@@ -0,0 +1,302 @@
+# transacciones/inventario.py
+"""
+Libro de movimientos de inventario.
+
+Las transacciones finalizadas y las devoluciones procesadas generan filas en
+MovimientoInventario (nunca se editan: una anulación agrega el movimiento
+contrario). El stock se mantiene con UPDATE ... SET cantidad = cantidad + delta
+(expresiones F()) o con la fila bloqueada, así dos ventas simultáneas del
+mismo SKU no se pisan: cada venta actualiza la fila de su sucursal
+(StockSucursal, que también lleva el kardex de costo) y, al confirmar, el
+total del producto (Producto.stock).
+
+Los cortes (CorteInventario) guardan el saldo a una fecha para que consultar
+el stock histórico solo tenga que sumar los movimientos posteriores al corte.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import DecimalField, F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.enums import EstadoDevolucion, EstadoTransaccion, TipoDevolucion, TipoMovimiento, TipoTransaccion
+from productos.cache import invalidar_stock
+from productos.models import Producto
+from .kardex import costo_de_origen, valorar
+from .lotes import asignar_lotes
+from .models import (
+    CorteInventario, DetalleTransaccion, Devolucion, MovimientoInventario, StockSucursal, Transaccion,
+)
+
+CERO = Decimal('0')
+
+
+def aplicar_movimientos(movimientos):
+    """
+    Valora los movimientos (kardex de costo promedio), ajusta el stock de cada
+    sucursal, los inserta y los reparte entre lotes (FEFO). Debe llamarse dentro de una transacción
+    (transaction.atomic). El total por producto (Producto.stock) se actualiza
+    al confirmar, ver actualizar_stock_global().
+    """
+    if not movimientos:
+        return []
+    por_clave = defaultdict(list)
+    for movimiento in movimientos:
+        por_clave[movimiento.producto_id, movimiento.sucursal_id].append(movimiento)
+
+    # Los bloqueos van ordenados para evitar interbloqueos entre ventas que
+    # comparten varios SKU. Cada fila queda bloqueada hasta el final de la
+    # transacción, así el saldo de la sucursal se valora en serie.
+    totales = defaultdict(Decimal)
+    for producto_id, sucursal_id in sorted(por_clave):
+        stock = bloquear_stock_sucursal(producto_id, sucursal_id)
+        cantidad = stock.cantidad
+        for movimiento in por_clave[producto_id, sucursal_id]:
+            valorar(stock, movimiento, costo_de_origen(movimiento))
+        stock.save(update_fields=['cantidad', 'valor', 'costo_promedio'])
+        totales[producto_id] += stock.cantidad - cantidad
+    # Se insertan después de valorar: cada movimiento lleva su saldo.
+    MovimientoInventario.objects.bulk_create(movimientos)
+    if not connection.features.can_return_rows_from_bulk_insert:
+        _releer_movimientos(movimientos)
+    asignar_lotes(movimientos)
+    transaction.on_commit(partial(actualizar_stock_global, dict(totales)))
+    return movimientos
+
+
+def _releer_movimientos(movimientos):
+    """
+    MySQL no devuelve los pks de bulk_create y los lotes los necesitan: se
+    releen por el origen de cada movimiento (detalle o devolución y tipo),
+    que es único.
+    """
+    filas = MovimientoInventario.objects.filter(
+        Q(detalle_transaccion_id__in={m.detalle_transaccion_id for m in movimientos if m.detalle_transaccion_id})
+        | Q(devolucion_id__in={m.devolucion_id for m in movimientos if m.devolucion_id})
+    ).values_list('pk', 'detalle_transaccion_id', 'devolucion_id', 'tipo')
+    pks = {(detalle_id, devolucion_id, tipo): pk for pk, detalle_id, devolucion_id, tipo in filas}
+    for movimiento in movimientos:
+        movimiento.pk = pks[movimiento.detalle_transaccion_id, movimiento.devolucion_id, movimiento.tipo]
+
+
+def bloquear_stock_sucursal(producto_id, sucursal_id):
+    """
+    Fila (producto, sucursal) con SELECT ... FOR UPDATE, creándola si es el
+    primer movimiento del producto en esa sucursal.
+    """
+    filas = StockSucursal.objects.select_for_update().filter(producto_id=producto_id, sucursal_id=sucursal_id)
+    stock = filas.first()
+    if stock is not None:
+        return stock
+    try:
+        # Savepoint: si otro proceso crea la fila a la vez, solo se deshace el INSERT.
+        with transaction.atomic():
+            return StockSucursal.objects.create(producto_id=producto_id, sucursal_id=sucursal_id)
+    except IntegrityError:
+        return filas.get()
+
+
+def actualizar_stock_global(totales):
+    """
+    Suma los deltas ya confirmados a Producto.stock, el total de todas las
+    sucursales. Corre fuera de la transacción de la venta (en autocommit), así
+    el bloqueo de la fila del producto dura una sola sentencia y las ventas de
+    distintas sucursales no se esperan entre sí. recalcular_stock_global()
+    corrige cualquier diferencia (por ejemplo, si el proceso cae justo aquí).
+    """
+    for pk in sorted(totales):
+        Producto.all_objects.filter(pk=pk).update(stock=F('stock') + totales[pk])
+    # queryset.update() no dispara señales: invalidamos la cache a mano.
+    invalidar_stock(sorted(totales))
+
+
+def recalcular_stock_global():
+    """
+    Recalcula Producto.stock como la suma de StockSucursal, solo para los
+    productos que tienen stock por sucursal. Devuelve cuántos corrigió.
+    """
+    totales = dict(
+        StockSucursal.objects.order_by().values('producto_id')
+        .annotate(total=Sum('cantidad')).values_list('producto_id', 'total')
+    )
+    corregidos = [
+        producto
+        for producto in Producto.all_objects.filter(pk__in=totales.keys()).only('pk', 'stock').iterator(chunk_size=2000)
+        if producto.stock != totales[producto.pk]
+    ]
+    if corregidos:
+        for producto in corregidos:
+            producto.stock = totales[producto.pk]
+        Producto.all_objects.bulk_update(corregidos, ['stock'], batch_size=1000)
+        transaction.on_commit(partial(invalidar_stock, [producto.pk for producto in corregidos]))
+    return len(corregidos)
+
+
+def disponibilidad(sucursal_id, codigos):
+    """
+    Stock de varios SKU en una sucursal con una sola consulta. Devuelve un
+    diccionario {codigo: cantidad}; los SKU sin fila en la sucursal valen 0
+    y los que no existen no aparecen.
+    """
+    stock = StockSucursal.objects.filter(producto=OuterRef('pk'), sucursal_id=sucursal_id).values('cantidad')
+    return dict(
+        Producto.objects.filter(codigo__in=codigos).order_by()
+        .annotate(disponible=Coalesce(Subquery(stock[:1]), CERO, output_field=DecimalField()))
+        .values_list('codigo', 'disponible')
+    )
+
+
+def movimiento_de_detalle(transaccion, detalle, fecha):
+    """
+    Movimiento que genera un detalle de una transacción finalizada: sale
+    mercancía en una venta y entra en una compra.
+    """
+    if transaccion.tipo_transaccion == TipoTransaccion.VENTA.value:
+        tipo, cantidad = TipoMovimiento.VENTA.value, -detalle.cantidad
+    else:
+        tipo, cantidad = TipoMovimiento.COMPRA.value, detalle.cantidad
+    return MovimientoInventario(
+        producto_id=detalle.producto_id, sucursal_id=transaccion.sucursal_id,
+        tipo=tipo, cantidad=cantidad, fecha=fecha, detalle_transaccion=detalle,
+    )
+
+
+@transaction.atomic
+def registrar_transaccion(transaccion_id):
+    """
+    Sincroniza el libro con una transacción. Es idempotente: se puede llamar
+    cada vez que cambian la transacción o sus detalles.
+
+    - Finalizada: registra los detalles que aún no tienen movimiento.
+    - Anulada, cancelada o eliminada (o detalle eliminado): agrega la
+      anulación de lo ya registrado. Una anulación es definitiva.
+    """
+    # Bloquea la transacción (no el producto) para que dos sincronizaciones
+    # simultáneas de la misma factura no registren dos veces.
+    transaccion = Transaccion.all_objects.select_for_update().get(pk=transaccion_id)
+    vigente = transaccion.estado == EstadoTransaccion.FINALIZADA.value and transaccion.deleted is None
+
+    registrados = defaultdict(dict)
+    for detalle_id, tipo_registrado, cantidad, costo in MovimientoInventario.objects.filter(
+        detalle_transaccion__transaccion=transaccion
+    ).values_list('detalle_transaccion_id', 'tipo', 'cantidad', 'costo_unitario'):
+        registrados[detalle_id][tipo_registrado] = (cantidad, costo)
+
+    movimientos = []
+    ahora = timezone.now()
+    for detalle in DetalleTransaccion.all_objects.filter(transaccion=transaccion):
+        previos = registrados[detalle.pk]
+        movimiento = movimiento_de_detalle(transaccion, detalle, ahora)
+        if vigente and detalle.deleted is None:
+            if movimiento.tipo not in previos:
+                movimientos.append(movimiento)
+        elif movimiento.tipo in previos and TipoMovimiento.ANULACION.value not in previos:
+            cantidad, costo = previos[movimiento.tipo]
+            # La anulación revierte el movimiento original a su mismo costo.
+            movimiento.tipo, movimiento.cantidad, movimiento.costo_unitario = (
+                TipoMovimiento.ANULACION.value, -cantidad, costo,
+            )
+            movimientos.append(movimiento)
+    return aplicar_movimientos(movimientos)
+
+
+@transaction.atomic
+def registrar_devolucion(devolucion_id):
+    """
+    Igual que registrar_transaccion, para una devolución: entra mercancía si
+    la devuelve un cliente y sale si se le devuelve al proveedor.
+    """
+    devolucion = (
+        Devolucion.all_objects.select_for_update(of=('self',))
+        .select_related('detalle_transaccion')
+        .get(pk=devolucion_id)
+    )
+    vigente = devolucion.estado == EstadoDevolucion.PROCESADA.value and devolucion.deleted is None
+    if devolucion.tipo_devolucion == TipoDevolucion.VENTA.value:
+        signo, tipo = 1, TipoMovimiento.DEVOLUCION_VENTA.value
+    else:
+        signo, tipo = -1, TipoMovimiento.DEVOLUCION_COMPRA.value
+
+    previos = {
+        tipo_registrado: (cantidad, costo)
+        for tipo_registrado, cantidad, costo in devolucion.movimientos.values_list('tipo', 'cantidad', 'costo_unitario')
+    }
+    movimiento = MovimientoInventario(
+        producto_id=devolucion.detalle_transaccion.producto_id, sucursal_id=devolucion.sucursal_id,
+        devolucion=devolucion, fecha=timezone.now(),
+    )
+    if vigente and tipo not in previos:
+        movimiento.tipo, movimiento.cantidad = tipo, signo * devolucion.cantidad_devuelta
+    elif not vigente and tipo in previos and TipoMovimiento.ANULACION.value not in previos:
+        cantidad, costo = previos[tipo]
+        movimiento.tipo, movimiento.cantidad, movimiento.costo_unitario = (
+            TipoMovimiento.ANULACION.value, -cantidad, costo,
+        )
+    else:
+        return []
+    return aplicar_movimientos([movimiento])
+
+
+# --- Cortes y stock a una fecha ---
+@transaction.atomic
+def crear_cortes(fecha_corte):
+    """
+    Guarda el saldo de cada producto y sucursal con los movimientos anteriores
+    a `fecha_corte`, partiendo del corte previo. Los saldos que ya tienen corte
+    en esa fecha se conservan; devuelve cuántos cortes nuevos guardó.
+    La fecha debe estar en el pasado con margen suficiente para que no lleguen
+    movimientos nuevos anteriores a ella (el comando usa la medianoche).
+    """
+    saldos = defaultdict(Decimal)
+    movimientos = MovimientoInventario.objects.filter(fecha__lt=fecha_corte)
+    anterior = CorteInventario.objects.filter(fecha_corte__lt=fecha_corte).aggregate(
+        fecha=Max('fecha_corte')
+    )['fecha']
+    if anterior is not None:
+        for producto_id, sucursal_id, stock in CorteInventario.objects.filter(
+            fecha_corte=anterior
+        ).values_list('producto_id', 'sucursal_id', 'stock'):
+            saldos[producto_id, sucursal_id] = stock
+        movimientos = movimientos.filter(fecha__gte=anterior)
+
+    for producto_id, sucursal_id, total in (
+        movimientos.order_by().values('producto_id', 'sucursal_id')
+        .annotate(total=Sum('cantidad')).values_list('producto_id', 'sucursal_id', 'total')
+    ):
+        saldos[producto_id, sucursal_id] += total
+
+    # Sin ignore_conflicts: bulk_create devolvería también los que no insertó.
+    existentes = set(
+        CorteInventario.objects.filter(fecha_corte=fecha_corte).values_list('producto_id', 'sucursal_id')
+    )
+    creados = CorteInventario.objects.bulk_create(
+        (
+            CorteInventario(producto_id=producto_id, sucursal_id=sucursal_id, fecha_corte=fecha_corte, stock=stock)
+            for (producto_id, sucursal_id), stock in saldos.items()
+            if (producto_id, sucursal_id) not in existentes
+        ),
+        batch_size=1000,
+    )
+    return len(creados)
+
+
+def stock_en(producto_id, momento, sucursal_id=None):
+    """
+    Stock de un producto (en una sucursal o en todas) justo antes de `momento`:
+    último corte anterior más los movimientos desde ese corte.
+    """
+    cortes = CorteInventario.objects.filter(producto_id=producto_id, fecha_corte__lte=momento)
+    movimientos = MovimientoInventario.objects.filter(producto_id=producto_id, fecha__lt=momento)
+    if sucursal_id is not None:
+        cortes = cortes.filter(sucursal_id=sucursal_id)
+        movimientos = movimientos.filter(sucursal_id=sucursal_id)
+
+    base = CERO
+    ultimo = cortes.aggregate(fecha=Max('fecha_corte'))['fecha']
+    if ultimo is not None:
+        base = cortes.filter(fecha_corte=ultimo).aggregate(total=Sum('stock'))['total']
+        movimientos = movimientos.filter(fecha__gte=ultimo)
+    return base + (movimientos.aggregate(total=Sum('cantidad'))['total'] or CERO)
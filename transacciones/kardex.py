@@ -0,0 +1,189 @@
+# transacciones/kardex.py
+"""
+Kardex de costo promedio ponderado.
+
+Cada StockSucursal lleva, además de la cantidad, el valor del inventario y el
+costo promedio de la sucursal. Al registrar un movimiento (dentro de la misma
+transacción, ver inventario.aplicar_movimientos) se actualiza el saldo y se
+anotan en el movimiento el costo con que se valoró y el saldo resultante:
+
+- Las ventas salen al costo promedio vigente.
+- Compras y devoluciones se valoran al costo de la línea de origen (la
+  compra, o la venta que se devuelve).
+- Una anulación revierte el movimiento original a su mismo costo.
+
+El costo por producto (todas las sucursales) es el valor total sobre la
+cantidad total. La valoración a una fecha toma el último saldo de cada
+sucursal antes de esa fecha, sin recorrer la historia.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.enums import TipoMovimiento
+from .models import MovimientoInventario, StockSucursal
+
+CERO = Decimal('0')
+CENTAVOS = Decimal('0.01')
+DIEZMILESIMAS = Decimal('0.0001')
+TAMANO_LOTE = 2000
+CAMPOS_KARDEX = ('costo_unitario', 'saldo_cantidad', 'saldo_valor')
+
+
+def costo_de_origen(movimiento):
+    """
+    Costo unitario de la línea que originó el movimiento. Usa los objetos ya
+    cargados en el movimiento (detalle o devolución con su detalle).
+    """
+    if movimiento.devolucion_id:
+        return movimiento.devolucion.detalle_transaccion.costo_unitario
+    return movimiento.detalle_transaccion.costo_unitario
+
+
+def valorar(stock, movimiento, costo_origen):
+    """
+    Aplica el movimiento al saldo `stock` (un StockSucursal, no se guarda) y
+    anota en el movimiento su costo y el saldo después de él. Si el
+    movimiento ya trae costo (anulaciones), se respeta.
+    """
+    costo = movimiento.costo_unitario
+    if costo is None:
+        costo = stock.costo_promedio if movimiento.tipo == TipoMovimiento.VENTA.value else costo_origen
+
+    stock.cantidad += movimiento.cantidad
+    stock.valor += movimiento.cantidad * costo
+    if stock.cantidad > 0:
+        stock.costo_promedio = (stock.valor / stock.cantidad).quantize(DIEZMILESIMAS)
+    else:
+        # Sin existencias (o en negativo) el promedio no se puede recalcular:
+        # se conserva el último, o el de la entrada si la hubo.
+        if movimiento.cantidad > 0:
+            stock.costo_promedio = costo
+        stock.valor = stock.cantidad * stock.costo_promedio
+    # Sumar cero normaliza el -0 que deja un saldo negativo a promedio 0.
+    stock.valor = (stock.valor + CERO).quantize(CENTAVOS)
+
+    movimiento.costo_unitario = costo
+    movimiento.saldo_cantidad = stock.cantidad
+    movimiento.saldo_valor = stock.valor
+    return movimiento
+
+
+def _totalizar(filas):
+    resultado = {}
+    for producto_id, cantidad, valor in filas:
+        cantidad, valor = cantidad or CERO, valor or CERO
+        total = resultado.setdefault(producto_id, {'cantidad': CERO, 'valor': CERO})
+        total['cantidad'] += cantidad
+        total['valor'] += valor
+    for total in resultado.values():
+        total['costo_promedio'] = (
+            (total['valor'] / total['cantidad']).quantize(DIEZMILESIMAS) if total['cantidad'] > 0 else None
+        )
+    return resultado
+
+
+def valoracion(sucursal_id=None, productos=None):
+    """
+    Valor actual del inventario: {producto_id: {cantidad, valor, costo_promedio}},
+    de una sucursal o de todas.
+    """
+    saldos = StockSucursal.objects.all()
+    if sucursal_id is not None:
+        saldos = saldos.filter(sucursal_id=sucursal_id)
+    if productos is not None:
+        saldos = saldos.filter(producto_id__in=productos)
+    return _totalizar(
+        saldos.order_by().values('producto_id')
+        .annotate(total_cantidad=Sum('cantidad'), total_valor=Sum('valor'))
+        .values_list('producto_id', 'total_cantidad', 'total_valor')
+    )
+
+
+def valoracion_en(momento, sucursal_id=None, productos=None):
+    """
+    Valor del inventario justo antes de `momento`, con el mismo formato que
+    valoracion(). Una sola consulta: para cada (producto, sucursal) se toma el
+    saldo del último movimiento anterior (índice producto, sucursal, fecha).
+    """
+    ultimo = MovimientoInventario.objects.filter(
+        producto=OuterRef('producto'), sucursal=OuterRef('sucursal'), fecha__lt=momento,
+    ).order_by('-fecha', '-pk')
+    saldos = StockSucursal.objects.all()
+    if sucursal_id is not None:
+        saldos = saldos.filter(sucursal_id=sucursal_id)
+    if productos is not None:
+        saldos = saldos.filter(producto_id__in=productos)
+    decimal = DecimalField()
+    return _totalizar(
+        saldos.order_by()
+        .annotate(
+            cantidad_en=Subquery(ultimo.values('saldo_cantidad')[:1], output_field=decimal),
+            valor_en=Subquery(ultimo.values('saldo_valor')[:1], output_field=decimal),
+        )
+        .filter(cantidad_en__isnull=False)
+        .values_list('producto_id', 'cantidad_en', 'valor_en')
+    )
+
+
+def reconstruir_kardex(tamano_lote=TAMANO_LOTE):
+    """
+    Recalcula el kardex completo desde el libro: recorre los movimientos en
+    orden (producto, sucursal, fecha) por bloques, sin cargarlos todos, y
+    reescribe su costo y saldo y el valor de cada StockSucursal. Debe
+    ejecutarse sin ventas en curso. Devuelve cuántos movimientos procesó.
+    """
+    stock_ids = {
+        (producto_id, sucursal_id): pk
+        for pk, producto_id, sucursal_id in StockSucursal.objects.values_list('pk', 'producto_id', 'sucursal_id')
+    }
+    filas = (
+        MovimientoInventario.objects.order_by('producto_id', 'sucursal_id', 'fecha', 'pk')
+        .annotate(costo_origen=Coalesce(
+            'devolucion__detalle_transaccion__costo_unitario', 'detalle_transaccion__costo_unitario',
+        ))
+        .values_list(
+            'pk', 'producto_id', 'sucursal_id', 'tipo', 'cantidad',
+            'detalle_transaccion_id', 'devolucion_id', 'costo_origen',
+        )
+    )
+
+    clave_actual, stock, costos = None, None, {}
+    movimientos, saldos = [], {}
+    procesados = 0
+    for pk, producto_id, sucursal_id, tipo, cantidad, detalle_id, devolucion_id, costo_origen in filas.iterator(
+        chunk_size=tamano_lote
+    ):
+        if (producto_id, sucursal_id) != clave_actual:
+            clave_actual = (producto_id, sucursal_id)
+            stock = StockSucursal(cantidad=CERO, valor=CERO, costo_promedio=CERO)
+            # Costo de cada movimiento original, para valorar su anulación.
+            costos = {}
+        origen = (detalle_id, devolucion_id)
+        movimiento = MovimientoInventario(pk=pk, tipo=tipo, cantidad=cantidad)
+        if tipo == TipoMovimiento.ANULACION.value:
+            movimiento.costo_unitario = costos.get(origen)
+        valorar(stock, movimiento, costo_origen)
+        if tipo != TipoMovimiento.ANULACION.value:
+            costos[origen] = movimiento.costo_unitario
+        movimientos.append(movimiento)
+        saldos[clave_actual] = (stock.valor, stock.costo_promedio)
+
+        if len(movimientos) >= tamano_lote:
+            procesados += _guardar_kardex(movimientos, saldos, stock_ids)
+            movimientos, saldos = [], {}
+    return procesados + _guardar_kardex(movimientos, saldos, stock_ids)
+
+
+def _guardar_kardex(movimientos, saldos, stock_ids):
+    stocks = [
+        StockSucursal(pk=stock_ids[clave], valor=valor, costo_promedio=promedio)
+        for clave, (valor, promedio) in saldos.items()
+        if clave in stock_ids
+    ]
+    with transaction.atomic():
+        MovimientoInventario.objects.bulk_update(movimientos, CAMPOS_KARDEX, batch_size=1000)
+        StockSucursal.objects.bulk_update(stocks, ['valor', 'costo_promedio'], batch_size=1000)
+    return len(movimientos)
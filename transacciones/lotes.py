@@ -0,0 +1,244 @@
+# transacciones/lotes.py
+"""
+Stock por lote y asignación FEFO (primero en vencer, primero en salir).
+
+Las compras con lote suman a su LoteInventario. Una venta que indica el lote
+lo consume directamente. Si el lote no alcanza, la venta se rechaza antes de
+guardarla (validar_lote, desde DetalleTransaccion, y la carga en lote de
+transacciones/ingesta.py); asignar_lotes lo vuelve a comprobar con el lote
+bloqueado. Si la venta no indica el lote, se reparte entre los lotes
+vigentes del producto en la sucursal, del que vence primero al último,
+leídos con una sola consulta sobre el índice (producto, sucursal,
+fecha_vencimiento). Cada parte queda en AsignacionLote, así las anulaciones
+y devoluciones regresan la mercancía a los mismos lotes; una devolución
+solo regresa lo que las anteriores de la misma línea no regresaron ya.
+
+Las funciones se llaman desde inventario.aplicar_movimientos, con la fila
+StockSucursal de cada (producto, sucursal) ya bloqueada. Los lotes se leen
+además con SELECT ... FOR UPDATE, así tampoco los cambia en paralelo quien
+los actualice sin pasar por ese bloqueo.
+"""
+import datetime
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from core.enums import TipoMovimiento, TipoTransaccion
+from .models import AsignacionLote, DetalleTransaccion, LoteInventario, Transaccion
+
+DEVOLUCIONES = (TipoMovimiento.DEVOLUCION_VENTA.value, TipoMovimiento.DEVOLUCION_COMPRA.value)
+
+
+class _LotesSucursal:
+    """
+    Lotes de un producto en una sucursal, leídos a demanda y una sola vez
+    durante la asignación de un grupo de movimientos.
+    """
+
+    def __init__(self, producto_id, sucursal_id):
+        self.producto_id = producto_id
+        self.sucursal_id = sucursal_id
+        self.por_pk = {}
+        self.tocados = {}
+        self._vigentes = None
+
+    def _registrar(self, lotes):
+        for lote in lotes:
+            self.por_pk.setdefault(lote.pk, lote)
+        return [self.por_pk[lote.pk] for lote in lotes]
+
+    def vigentes(self):
+        """
+        Lotes con existencias y sin vencer, del que vence primero al último
+        (los que no tienen fecha de vencimiento van al final).
+        """
+        if self._vigentes is None:
+            self._vigentes = self._registrar(list(
+                LoteInventario.objects.select_for_update().filter(
+                    Q(fecha_vencimiento__gte=timezone.localdate()) | Q(fecha_vencimiento__isnull=True),
+                    producto_id=self.producto_id, sucursal_id=self.sucursal_id, cantidad__gt=0,
+                ).order_by(F('fecha_vencimiento').asc(nulls_last=True), 'pk')
+            ))
+        return self._vigentes
+
+    def por_codigo(self, codigo, fecha_vencimiento, crear):
+        for lote in self.por_pk.values():
+            if lote.lote == codigo:
+                return lote
+        lote = LoteInventario.objects.select_for_update().filter(
+            producto_id=self.producto_id, sucursal_id=self.sucursal_id, lote=codigo
+        ).first()
+        if lote is None and crear:
+            lote = LoteInventario.objects.create(
+                producto_id=self.producto_id, sucursal_id=self.sucursal_id,
+                lote=codigo, fecha_vencimiento=fecha_vencimiento,
+            )
+        return self._registrar([lote])[0] if lote is not None else None
+
+    def por_pks(self, pks):
+        faltantes = set(pks) - self.por_pk.keys()
+        if faltantes:
+            self._registrar(list(LoteInventario.objects.select_for_update().filter(pk__in=faltantes)))
+        return self.por_pk
+
+    def mover(self, movimiento, lote, cantidad):
+        lote.cantidad += cantidad
+        self.tocados[lote.pk] = lote
+        return AsignacionLote(movimiento=movimiento, lote=lote, cantidad=cantidad)
+
+
+def asignar_lotes(movimientos):
+    """
+    Reparte entre lotes los movimientos ya insertados y guarda las
+    asignaciones y las nuevas existencias de cada lote. Los productos que no
+    manejan lotes no generan asignaciones.
+    """
+    por_clave = defaultdict(list)
+    for movimiento in movimientos:
+        por_clave[movimiento.producto_id, movimiento.sucursal_id].append(movimiento)
+
+    asignaciones, tocados = [], []
+    for producto_id, sucursal_id in sorted(por_clave):
+        lotes = _LotesSucursal(producto_id, sucursal_id)
+        for movimiento in por_clave[producto_id, sucursal_id]:
+            asignaciones += _asignar(movimiento, lotes)
+        tocados += lotes.tocados.values()
+    if asignaciones:
+        AsignacionLote.objects.bulk_create(asignaciones)
+        LoteInventario.objects.bulk_update(tocados, ['cantidad'])
+    return asignaciones
+
+
+def _asignar(movimiento, lotes):
+    detalle = (
+        movimiento.devolucion.detalle_transaccion if movimiento.devolucion_id else movimiento.detalle_transaccion
+    )
+    if movimiento.tipo == TipoMovimiento.ANULACION.value:
+        # Deshace lo que asignó el movimiento original.
+        return _revertir(movimiento, lotes, movimiento.detalle_transaccion_id, movimiento.devolucion_id)
+    if movimiento.tipo in DEVOLUCIONES:
+        # Regresa a los lotes de la línea original, hasta la cantidad devuelta.
+        return _revertir(movimiento, lotes, detalle.pk, None, limite=abs(movimiento.cantidad))
+
+    if detalle.lote:
+        lote = lotes.por_codigo(detalle.lote, detalle.fecha_vencimiento, crear=movimiento.cantidad > 0)
+        if movimiento.cantidad < 0 and (lote is None or lote.cantidad < -movimiento.cantidad):
+            raise _sin_existencias(detalle.lote, lote.cantidad if lote is not None else 0)
+        return [lotes.mover(movimiento, lote, movimiento.cantidad)]
+    if movimiento.tipo != TipoMovimiento.VENTA.value:
+        return []
+
+    asignaciones = []
+    pendiente = -movimiento.cantidad
+    for lote in lotes.vigentes():
+        if pendiente <= 0:
+            break
+        if lote.cantidad <= 0:
+            continue
+        cantidad = min(pendiente, lote.cantidad)
+        asignaciones.append(lotes.mover(movimiento, lote, -cantidad))
+        pendiente -= cantidad
+    # Si los lotes no alcanzan, el resto de la venta queda sin lote asignado.
+    return asignaciones
+
+
+def _revertir(movimiento, lotes, detalle_id, devolucion_id, limite=None):
+    originales = list(
+        AsignacionLote.objects.filter(
+            movimiento__detalle_transaccion_id=detalle_id, movimiento__devolucion_id=devolucion_id,
+        ).exclude(movimiento__tipo=TipoMovimiento.ANULACION.value)
+        .order_by('pk').values_list('lote_id', 'cantidad')
+    )
+    por_pk = lotes.por_pks([lote_id for lote_id, _ in originales])
+    devuelto = defaultdict(int)
+    if limite is not None:
+        # Lo que ya regresaron a cada lote las devoluciones anteriores de la
+        # línea, netas de sus anulaciones.
+        devuelto.update(
+            (fila['lote_id'], abs(fila['total'])) for fila in
+            AsignacionLote.objects.filter(movimiento__devolucion__detalle_transaccion_id=detalle_id)
+            .values('lote_id').annotate(total=Sum('cantidad'))
+        )
+    asignaciones = []
+    for lote_id, cantidad in originales:
+        if limite is not None:
+            if limite <= 0:
+                break
+            ya_devuelto = min(abs(cantidad), devuelto[lote_id])
+            devuelto[lote_id] -= ya_devuelto
+            parte = min(abs(cantidad) - ya_devuelto, limite)
+            if parte <= 0:
+                continue
+            limite -= parte
+            cantidad = parte if cantidad > 0 else -parte
+        asignaciones.append(lotes.mover(movimiento, por_pk[lote_id], -cantidad))
+    return asignaciones
+
+
+def _sin_existencias(codigo, disponible):
+    return ValidationError({'lote': f"El lote {codigo} solo tiene {disponible} unidades disponibles."})
+
+
+def existencias_lotes(claves):
+    """
+    {(producto_id, sucursal_id, lote): cantidad} de los lotes indicados, con
+    una sola consulta. Los lotes que no existen no aparecen.
+    """
+    if not claves:
+        return {}
+    productos, sucursales, codigos = (set(valores) for valores in zip(*claves))
+    filas = LoteInventario.objects.filter(
+        producto_id__in=productos, sucursal_id__in=sucursales, lote__in=codigos,
+    ).values_list('producto_id', 'sucursal_id', 'lote', 'cantidad')
+    return {(producto_id, sucursal_id, lote): cantidad for producto_id, sucursal_id, lote, cantidad in filas
+            if (producto_id, sucursal_id, lote) in claves}
+
+
+def validar_lote(detalle):
+    """
+    Lanza ValidationError si una línea de venta nueva pide de su lote más de
+    lo que tiene, descontando lo que piden las otras líneas de la misma venta
+    que aún no se registran en el libro. Se llama antes de guardar la línea,
+    dentro de la transacción de la venta: si falla, la venta no se guarda.
+    """
+    if not detalle.lote or detalle.producto_id is None or detalle.cantidad is None:
+        return
+    try:
+        transaccion = detalle.transaccion
+    except Transaccion.DoesNotExist:
+        return
+    if transaccion.tipo_transaccion != TipoTransaccion.VENTA.value:
+        return
+    clave = (detalle.producto_id, transaccion.sucursal_id, detalle.lote)
+    disponible = existencias_lotes({clave}).get(clave, 0)
+    if transaccion.pk is not None:
+        pedido = DetalleTransaccion.objects.filter(
+            transaccion_id=transaccion.pk, producto_id=detalle.producto_id, lote=detalle.lote,
+            movimientos__isnull=True,
+        ).exclude(pk=detalle.pk).aggregate(total=Sum('cantidad'))['total']
+        disponible -= pedido or 0
+    if detalle.cantidad > disponible:
+        raise _sin_existencias(detalle.lote, max(disponible, 0))
+
+
+def lotes_por_vencer(dias, sucursal_id=None, incluir_vencidos=False):
+    """
+    Lotes con existencias que vencen en los próximos `dias` días (y, si se
+    pide, los ya vencidos), del más próximo al más lejano. Usa el índice
+    parcial por fecha de vencimiento de LoteInventario.
+    """
+    hoy = timezone.localdate()
+    lotes = LoteInventario.objects.filter(cantidad__gt=0, fecha_vencimiento__lte=hoy + datetime.timedelta(days=dias))
+    if not incluir_vencidos:
+        lotes = lotes.filter(fecha_vencimiento__gte=hoy)
+    if sucursal_id is not None:
+        lotes = lotes.filter(sucursal_id=sucursal_id)
+    return [
+        {**fila, 'dias_restantes': (fila['fecha_vencimiento'] - hoy).days}
+        for fila in lotes.order_by('fecha_vencimiento', 'pk').values(
+            'producto_id', 'producto__codigo', 'producto__nombre', 'sucursal_id',
+            'lote', 'fecha_vencimiento', 'cantidad',
+        )
+    ]
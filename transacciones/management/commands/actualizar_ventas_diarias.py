@@ -0,0 +1,26 @@
+# transacciones/management/commands/actualizar_ventas_diarias.py
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from transacciones.reportes import MARGEN, TAMANO_LOTE, actualizar_ventas_diarias
+
+
+class Command(BaseCommand):
+    help = (
+        "Suma al agregado de ventas diarias los movimientos de inventario nuevos "
+        "(desde la marca de agua). Se puede ejecutar con la frecuencia que se quiera."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--margen', type=int, default=int(MARGEN.total_seconds() // 60),
+            help="Minutos de antigüedad mínima de los movimientos a agregar.",
+        )
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Movimientos por transacción.")
+
+    def handle(self, *args, **options):
+        procesados = actualizar_ventas_diarias(
+            margen=datetime.timedelta(minutes=options['margen']), tamano_lote=options['lote']
+        )
+        self.stdout.write(f"Movimientos agregados: {procesados}")
@@ -0,0 +1,55 @@
+# transacciones/management/commands/analizar_inventario.py
+import argparse
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from transacciones.analitica import DIAS_HISTORIA, DIAS_REPOSICION, NIVEL_SERVICIO, analizar_inventario
+
+
+def nivel_servicio(valor):
+    # inv_cdf solo está definida entre 0 y 1 (sin incluirlos).
+    nivel = float(valor)
+    if not 0 < nivel < 1:
+        raise argparse.ArgumentTypeError("debe estar entre 0 y 1, sin incluirlos.")
+    return nivel
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula la clase ABC, la demanda diaria y el stock mínimo sugerido de "
+        "cada producto con la historia de ventas diarias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasta', type=datetime.date.fromisoformat, default=None,
+            help="Último día de la historia (AAAA-MM-DD). Por defecto, ayer.",
+        )
+        parser.add_argument('--dias', type=int, default=DIAS_HISTORIA, help="Días de historia.")
+        parser.add_argument(
+            '--reposicion', type=int, default=DIAS_REPOSICION, help="Días de reposición (lead time)."
+        )
+        parser.add_argument(
+            '--nivel-servicio', type=nivel_servicio, default=NIVEL_SERVICIO,
+            help="Nivel de servicio, entre 0 y 1 (por ejemplo, 0.95).",
+        )
+        parser.add_argument(
+            '--aplicar', action='store_true',
+            help="Copia el mínimo sugerido a Producto.stock_minimo (solo productos con ventas).",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        resultado = analizar_inventario(
+            hasta=options['hasta'], dias=options['dias'], dias_reposicion=options['reposicion'],
+            nivel_servicio=options['nivel_servicio'], aplicar=options['aplicar'],
+        )
+        clases = ', '.join(f"{clase}: {total}" for clase, total in resultado['clases'].items())
+        self.stdout.write(
+            f"Productos analizados: {resultado['productos']} ({clases}) "
+            f"en {time.perf_counter() - inicio:.2f} s"
+        )
+        if options['aplicar']:
+            self.stdout.write(f"Stock mínimo actualizado en {resultado['stock_minimo_actualizados']} productos.")
@@ -0,0 +1,45 @@
+# transacciones/management/commands/benchmark_analitica.py
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from transacciones.analitica import VENTAS_DTYPE, calcular
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el cálculo vectorizado de la analítica de inventario (ABC y stock "
+        "mínimo) con una historia de ventas sintética en memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skus', type=int, default=100_000, help="Productos.")
+        parser.add_argument('--dias', type=int, default=730, help="Días de historia.")
+        parser.add_argument(
+            '--densidad', type=float, default=0.1, help="Fracción de días con ventas por producto."
+        )
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['semilla'])
+        skus, dias = options['skus'], options['dias']
+        filas = int(skus * dias * options['densidad'])
+
+        inicio = time.perf_counter()
+        ventas = np.empty(filas, dtype=VENTAS_DTYPE)
+        # Popularidad desigual (Pareto) para que la clasificación ABC tenga sentido.
+        popularidad = rng.pareto(1.5, skus) + 1
+        ventas['producto'] = rng.choice(skus, size=filas, p=popularidad / popularidad.sum()) + 1
+        ventas['cantidad'] = rng.poisson(3, filas) + 1
+        ventas['ingresos'] = ventas['cantidad'] * rng.uniform(1_000, 50_000, skus)[ventas['producto'] - 1]
+        self.stdout.write(f"Historia sintética: {filas} filas en {time.perf_counter() - inicio:.2f} s")
+
+        inicio = time.perf_counter()
+        resultado = calcular(np.arange(1, skus + 1), ventas, dias)
+        duracion = time.perf_counter() - inicio
+        clases, conteos = np.unique(resultado['clase_abc'], return_counts=True)
+        self.stdout.write(
+            f"Cálculo de {skus} SKU x {dias} días: {duracion:.2f} s "
+            f"({', '.join(f'{c}: {n}' for c, n in zip(clases.tolist(), conteos.tolist()))})"
+        )
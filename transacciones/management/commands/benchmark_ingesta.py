@@ -0,0 +1,86 @@
+# transacciones/management/commands/benchmark_ingesta.py
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from safedelete import HARD_DELETE
+
+from core.enums import MetodoPago, TipoTransaccion
+from core.demo import crear_perfil, crear_sucursal
+from productos.models import Producto
+from transacciones.ingesta import ingerir_ventas
+from transacciones.models import DetalleTransaccion, MovimientoInventario, StockSucursal, Transaccion
+
+PREFIJO = 'BENCH-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el rendimiento de la carga de ventas desde punto de venta "
+        "(ventas por segundo) para distintos tamaños de lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanos', default='10,100,1000', help="Ventas por lote, separadas por comas."
+        )
+        parser.add_argument('--lineas', type=int, default=3, help="Detalles por venta.")
+        parser.add_argument('--lotes', type=int, default=5, help="Lotes por tamaño.")
+        parser.add_argument('--productos', type=int, default=50, help="SKU distintos en las ventas.")
+        parser.add_argument(
+            '--limpiar', action='store_true', help="Elimina los datos sintéticos al terminar."
+        )
+
+    def handle(self, *args, **options):
+        sucursal = crear_sucursal(f'{PREFIJO}Sucursal')
+        empleado = crear_perfil(f'{PREFIJO}0001')
+        Producto.objects.bulk_create(
+            [
+                Producto(codigo=f'{PREFIJO}POS-{i:04d}', nombre=f'Producto POS {i}')
+                for i in range(options['productos'])
+            ],
+            ignore_conflicts=True,
+        )
+        codigos = [f'{PREFIJO}POS-{i:04d}' for i in range(options['productos'])]
+
+        for tamano in (int(t) for t in options['tamanos'].split(',')):
+            duracion = 0.0
+            total = 0
+            for _ in range(options['lotes']):
+                lote = [self.venta(sucursal, empleado, codigos, i, options['lineas']) for i in range(tamano)]
+                inicio = time.perf_counter()
+                resultado = ingerir_ventas(lote)
+                duracion += time.perf_counter() - inicio
+                total += resultado['creadas']
+            self.stdout.write(
+                f"Lotes de {tamano:>5} ventas: {total / duracion:8.0f} ventas/s  "
+                f"{total * options['lineas'] / duracion:8.0f} líneas/s  "
+                f"({duracion / options['lotes'] * 1000:.1f} ms por lote)"
+            )
+
+        if options['limpiar']:
+            ventas = Transaccion.all_objects.filter(numero_factura__startswith=PREFIJO)
+            productos = Producto.all_objects.filter(codigo__startswith=f'{PREFIJO}POS-')
+            MovimientoInventario.objects.filter(producto__in=productos).delete()
+            StockSucursal.objects.filter(producto__in=productos).delete()
+            DetalleTransaccion.all_objects.filter(transaccion__in=ventas).delete(force_policy=HARD_DELETE)
+            ventas.delete(force_policy=HARD_DELETE)
+            productos.delete(force_policy=HARD_DELETE)
+            self.stdout.write("Datos sintéticos eliminados.")
+
+    def venta(self, sucursal, empleado, codigos, indice, lineas):
+        return {
+            'numero_factura': f'{PREFIJO}{uuid.uuid4().hex[:16]}',
+            'sucursal': sucursal.pk,
+            'empleado': empleado.pk,
+            'metodo_pago': MetodoPago.EFECTIVO.value,
+            'tipo_transaccion': TipoTransaccion.VENTA.value,
+            'total': str(2 * lineas),
+            'detalles': [
+                {
+                    'codigo': codigos[(indice + n) % len(codigos)], 'cantidad': '1',
+                    'costo_unitario': '1', 'precio_venta_calculado': '2', 'total': '2',
+                }
+                for n in range(lineas)
+            ],
+        }
@@ -0,0 +1,117 @@
+# transacciones/management/commands/benchmark_stock.py
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from safedelete import HARD_DELETE
+
+from core.enums import EstadoTransaccion, MetodoPago, TipoTransaccion
+from core.demo import crear_perfil, crear_sucursal
+from productos.models import Producto
+from transacciones.inventario import registrar_transaccion
+from transacciones.models import DetalleTransaccion, MovimientoInventario, StockSucursal, Transaccion
+
+PREFIJO = 'BENCH-'
+STOCK_INICIAL = Decimal('1000000')
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la contención del libro de inventario: varios vendedores concurrentes "
+        "venden el mismo SKU y al final se verifica que no se perdió ninguna actualización."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendedores', type=int, default=8, help="Hilos concurrentes.")
+        parser.add_argument('--ventas', type=int, default=100, help="Ventas por vendedor.")
+        parser.add_argument(
+            '--sucursales', type=int, default=1,
+            help="Sucursales entre las que se reparten los vendedores (1 = todos en la misma fila).",
+        )
+        parser.add_argument(
+            '--limpiar', action='store_true', help="Elimina los datos sintéticos al terminar."
+        )
+
+    def handle(self, *args, **options):
+        sucursales = [crear_sucursal(f'{PREFIJO}Sucursal {n}') for n in range(options['sucursales'])]
+        empleado = crear_perfil(f'{PREFIJO}0001')
+        producto, _ = Producto.objects.get_or_create(
+            codigo=f'{PREFIJO}SKU-CALIENTE', defaults={'nombre': 'SKU caliente (benchmark)'}
+        )
+        Producto.objects.filter(pk=producto.pk).update(stock=STOCK_INICIAL)
+        # Solo cuentan los movimientos de esta ejecución.
+        ultimo_movimiento = MovimientoInventario.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+        tiempos, errores = [], []
+        bloqueo = threading.Lock()
+
+        def vender(hilo):
+            sucursal = sucursales[hilo % len(sucursales)]
+            propios = []
+            try:
+                for i in range(options['ventas']):
+                    inicio = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            venta = Transaccion.objects.create(
+                                numero_factura=f'{PREFIJO}{hilo}-{i}-{uuid.uuid4().hex[:8]}',
+                                sucursal=sucursal, empleado=empleado,
+                                metodo_pago=MetodoPago.EFECTIVO.value,
+                                tipo_transaccion=TipoTransaccion.VENTA.value,
+                                estado=EstadoTransaccion.FINALIZADA.value,
+                            )
+                            DetalleTransaccion.objects.create(
+                                transaccion=venta, producto=producto, cantidad=1,
+                                costo_unitario=0, precio_venta_calculado=0, total=0,
+                            )
+                        # Las señales ya lo programaron al confirmar; la llamada
+                        # explícita mide el caso en que el registro es inmediato.
+                        registrar_transaccion(venta.pk)
+                    except Exception as error:  # noqa: BLE001 (se reportan al final)
+                        with bloqueo:
+                            errores.append(repr(error))
+                        continue
+                    propios.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                connection.close()
+                with bloqueo:
+                    tiempos.extend(propios)
+
+        hilos = [threading.Thread(target=vender, args=(n,)) for n in range(options['vendedores'])]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        producto.refresh_from_db()
+        movido = MovimientoInventario.objects.filter(
+            producto=producto, pk__gt=ultimo_movimiento
+        ).aggregate(total=Sum('cantidad'))['total'] or 0
+        esperado = STOCK_INICIAL + movido
+        tiempos.sort()
+        if tiempos:
+            p95 = tiempos[max(int(len(tiempos) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"{len(tiempos)} ventas en {duracion:.2f} s ({len(tiempos) / duracion:.0f} ventas/s)  "
+                f"p50={statistics.median(tiempos):.1f} ms  p95={p95:.1f} ms"
+            )
+        self.stdout.write(f"Errores: {len(errores)}" + (f" (primero: {errores[0]})" if errores else ""))
+        self.stdout.write(
+            f"Stock final: {producto.stock}  esperado según el libro: {esperado}  "
+            f"actualizaciones perdidas: {esperado - producto.stock}"
+        )
+
+        if options['limpiar']:
+            ventas = Transaccion.all_objects.filter(numero_factura__startswith=PREFIJO)
+            MovimientoInventario.objects.filter(producto=producto).delete()
+            StockSucursal.objects.filter(producto=producto).delete()
+            DetalleTransaccion.all_objects.filter(transaccion__in=ventas).delete(force_policy=HARD_DELETE)
+            ventas.delete(force_policy=HARD_DELETE)
+            self.stdout.write("Ventas sintéticas eliminadas.")
@@ -0,0 +1,31 @@
+# transacciones/management/commands/conciliar_devoluciones.py
+from django.core.management.base import BaseCommand
+
+from transacciones.devoluciones import TAMANO_LOTE, conciliar_devoluciones
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica el acumulado de devoluciones de cada línea de factura contra "
+        "la suma de sus devoluciones procesadas. Con --corregir, lo ajusta."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true', help="Corrige las diferencias encontradas.")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Líneas por bloque.")
+
+    def handle(self, *args, **options):
+        diferencias = conciliar_devoluciones(corregir=options['corregir'], tamano_lote=options['lote'])
+        for diferencia in diferencias:
+            cantidad, cantidad_real = diferencia['cantidad_devuelta']
+            monto, monto_real = diferencia['monto_devuelto']
+            self.stdout.write(
+                f"Detalle {diferencia['detalle']}: cantidad {cantidad} -> {cantidad_real}, "
+                f"monto {monto} -> {monto_real}"
+            )
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("Los acumulados coinciden."))
+        elif options['corregir']:
+            self.stdout.write(self.style.SUCCESS(f"Líneas corregidas: {len(diferencias)}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Líneas con diferencias: {len(diferencias)} (use --corregir)"))
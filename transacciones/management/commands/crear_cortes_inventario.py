@@ -0,0 +1,31 @@
+# transacciones/management/commands/crear_cortes_inventario.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transacciones.inventario import crear_cortes
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda un corte del libro de inventario (saldo por producto y sucursal). "
+        "Pensado para ejecutarse a diario; por defecto corta a la medianoche de hoy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Fecha del corte (AAAA-MM-DD), a la medianoche local.")
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+        if options['fecha']:
+            try:
+                hoy = datetime.date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError("La fecha debe tener el formato AAAA-MM-DD.")
+        fecha_corte = timezone.make_aware(datetime.datetime.combine(hoy, datetime.time.min))
+        if fecha_corte > timezone.now():
+            raise CommandError("No se puede cortar en una fecha futura.")
+
+        saldos = crear_cortes(fecha_corte)
+        self.stdout.write(f"Corte al {fecha_corte:%Y-%m-%d %H:%M}: {saldos} saldos nuevos.")
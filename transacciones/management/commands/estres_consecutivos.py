@@ -0,0 +1,98 @@
+# transacciones/management/commands/estres_consecutivos.py
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Count
+from safedelete import HARD_DELETE
+
+from core.enums import MetodoPago, TipoTransaccion
+from core.demo import crear_perfil, crear_sucursal
+from transacciones.models import ConsecutivoFactura, Transaccion
+
+PREFIJO = 'BENCH-'
+
+
+def escribir(sucursal_id, empleado_id, tipo, cantidad):
+    """
+    Trabajo de cada proceso: crea `cantidad` transacciones sin número para
+    que el consecutivo lo asigne. Devuelve (creadas, reintentos).
+    """
+    # Cada proceso hijo abre sus propias conexiones.
+    connections.close_all()
+    reintentos = 0
+    for _ in range(cantidad):
+        while True:
+            try:
+                with transaction.atomic():
+                    Transaccion.objects.create(
+                        sucursal_id=sucursal_id, empleado_id=empleado_id,
+                        metodo_pago=MetodoPago.EFECTIVO.value, tipo_transaccion=tipo,
+                    )
+                break
+            except OperationalError:
+                # SQLite: "database is locked". PostgreSQL espera el bloqueo y no llega aquí.
+                reintentos += 1
+                time.sleep(0.005)
+    connections.close_all()
+    return cantidad, reintentos
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés del consecutivo de facturas: varios procesos crean "
+        "transacciones a la vez y se verifica que no haya números repetidos "
+        "(ni huecos, si el consecutivo es sin huecos)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=8)
+        parser.add_argument('--por-proceso', type=int, default=200)
+        parser.add_argument(
+            '--tipo', choices=[t.value for t in TipoTransaccion], default=TipoTransaccion.VENTA.value,
+            help="Venta usa numeración sin huecos; Compra, bloques por proceso.",
+        )
+        parser.add_argument(
+            '--limpiar', action='store_true', help="Elimina los datos sintéticos al terminar."
+        )
+
+    def handle(self, *args, **options):
+        sucursal = crear_sucursal(f'{PREFIJO}Consecutivos')
+        empleado = crear_perfil(f'{PREFIJO}0002')
+        tipo = options['tipo']
+        consecutivo = ConsecutivoFactura.objects.filter(sucursal=sucursal, tipo=tipo).first()
+        desde = consecutivo.siguiente if consecutivo else 1
+
+        connections.close_all()
+        argumentos = [(sucursal.pk, empleado.pk, tipo, options['por_proceso'])] * options['procesos']
+        inicio = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(options['procesos']) as pool:
+            resultados = pool.starmap(escribir, argumentos)
+        duracion = time.perf_counter() - inicio
+
+        creadas = sum(r[0] for r in resultados)
+        reintentos = sum(r[1] for r in resultados)
+        facturas = Transaccion.all_objects.filter(sucursal=sucursal, tipo_transaccion=tipo)
+        repetidos = facturas.values('numero_factura').annotate(n=Count('id')).filter(n__gt=1).count()
+        self.stdout.write(
+            f"{creadas} facturas en {duracion:.2f} s ({creadas / duracion:.0f}/s), "
+            f"reintentos por bloqueo: {reintentos}"
+        )
+        self.stdout.write(f"Números repetidos: {repetidos}")
+
+        consecutivo = ConsecutivoFactura.objects.get(sucursal=sucursal, tipo=tipo)
+        if consecutivo.sin_huecos:
+            numeros = {
+                int(n.removeprefix(consecutivo.prefijo))
+                for n in facturas.filter(numero_factura__startswith=consecutivo.prefijo)
+                .values_list('numero_factura', flat=True)
+            }
+            huecos = set(range(desde, consecutivo.siguiente)) - numeros
+            self.stdout.write(f"Huecos: {len(huecos)}")
+
+        if options['limpiar']:
+            facturas.delete(force_policy=HARD_DELETE)
+            self.stdout.write("Facturas sintéticas eliminadas.")
+        if repetidos:
+            raise CommandError("Se encontraron números de factura repetidos.")
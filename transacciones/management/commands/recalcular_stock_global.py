@@ -0,0 +1,15 @@
+# transacciones/management/commands/recalcular_stock_global.py
+from django.core.management.base import BaseCommand
+
+from transacciones.inventario import recalcular_stock_global
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula Producto.stock como la suma del stock por sucursal. "
+        "Corrige diferencias si un proceso cayó antes de actualizar el total."
+    )
+
+    def handle(self, *args, **options):
+        corregidos = recalcular_stock_global()
+        self.stdout.write(f"Productos corregidos: {corregidos}")
@@ -0,0 +1,22 @@
+# transacciones/management/commands/reconstruir_kardex.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from transacciones.kardex import TAMANO_LOTE, reconstruir_kardex
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el kardex de costo promedio (costo y saldo de cada movimiento "
+        "y valor del stock por sucursal) recorriendo el libro por bloques. "
+        "Ejecutar sin ventas en curso."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="Movimientos por bloque.")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        procesados = reconstruir_kardex(tamano_lote=options['lote'])
+        self.stdout.write(f"Movimientos valorados: {procesados} en {time.perf_counter() - inicio:.2f} s")
@@ -0,0 +1,35 @@
+# transacciones/management/commands/valorizar_inventario.py
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transacciones.kardex import valoracion, valoracion_en
+
+
+class Command(BaseCommand):
+    help = (
+        "Valor del inventario a costo promedio ponderado, actual o a la "
+        "medianoche de una fecha, por producto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Valorar a la medianoche local de esta fecha (AAAA-MM-DD).")
+        parser.add_argument('--sucursal', type=int, help="Id de la sucursal (por defecto, todas).")
+
+    def handle(self, *args, **options):
+        if options['fecha']:
+            try:
+                dia = datetime.date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError("La fecha debe tener el formato AAAA-MM-DD.")
+            momento = timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+            resultado = valoracion_en(momento, sucursal_id=options['sucursal'])
+        else:
+            resultado = valoracion(sucursal_id=options['sucursal'])
+
+        for producto_id, total in sorted(resultado.items()):
+            self.stdout.write(
+                f"{producto_id}: {total['cantidad']} a {total['costo_promedio']} = {total['valor']}"
+            )
+        self.stdout.write(f"Valor total: {sum(total['valor'] for total in resultado.values())}")
@@ -1,14 +1,17 @@
 # transacciones/models.py
 
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from safedelete.models import SafeDeleteModel
-from core.enums import MetodoPago, EstadoTransaccion, TipoTransaccion, MotivoDevolucion, TipoDevolucion, EstadoDevolucion
+from django.utils import timezone
+from core.enums import MetodoPago, EstadoTransaccion, TipoTransaccion, MotivoDevolucion, TipoDevolucion, EstadoDevolucion, TipoMovimiento, TipoConsecutivo, ClaseABC
 
 class Transaccion(SafeDeleteModel):
     """
     Transacciones base (compras y ventas) por sucursal.
     """
-    numero_factura = models.CharField(max_length=80)
+    # Si se deja vacío, se asigna el consecutivo de la sucursal al guardar.
+    numero_factura = models.CharField(max_length=80, blank=True)
     sucursal = models.ForeignKey(
         'organizacion.Sucursal',
         on_delete=models.PROTECT,
@@ -47,10 +50,24 @@ class Transaccion(SafeDeleteModel):
         verbose_name = "Transacción"
         verbose_name_plural = "Transacciones"
         unique_together = [['sucursal', 'numero_factura', 'tipo_transaccion']]
+        indexes = [
+            # Lista de la API: filtro por sucursal y rango de fechas, paginada por (fecha, id).
+            models.Index(fields=['sucursal', 'fecha']),
+            models.Index(fields=['fecha']),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_transaccion_display()} #{self.numero_factura} - {self.sucursal.nombre}"
 
+    def save(self, *args, **kwargs):
+        # La asignación y el INSERT van en la misma transacción: con numeración
+        # sin huecos, si el guardado falla el número no se pierde.
+        with transaction.atomic():
+            if not self.numero_factura:
+                from .consecutivos import asignar_numero
+                self.numero_factura = asignar_numero(self.sucursal_id, self.tipo_transaccion)
+            super().save(*args, **kwargs)
+
 class DetalleTransaccion(SafeDeleteModel):
     """
     Detalles de productos dentro de una transacción.
@@ -63,6 +80,10 @@ class DetalleTransaccion(SafeDeleteModel):
     costo_unitario = models.DecimalField(max_digits=15, decimal_places=4)
     precio_venta_calculado = models.DecimalField(max_digits=15, decimal_places=2)
     total = models.DecimalField(max_digits=15, decimal_places=2)
+    # Acumulado de las devoluciones procesadas de esta línea. Lo mantiene
+    # Devolucion.save() (ver transacciones/devoluciones.py).
+    cantidad_devuelta = models.DecimalField(max_digits=10, decimal_places=3, default=0, editable=False)
+    monto_devuelto = models.DecimalField(max_digits=15, decimal_places=2, default=0, editable=False)
 
     class Meta:
         verbose_name = "Detalle de Transacción"
@@ -71,12 +92,28 @@ class DetalleTransaccion(SafeDeleteModel):
     def __str__(self):
         return f"{self.cantidad} x {self.producto.nombre} en {self.transaccion.numero_factura}"
 
+    def clean(self):
+        super().clean()
+        if self._state.adding:
+            from .lotes import validar_lote
+            validar_lote(self)
+
+    def save(self, *args, **kwargs):
+        # Una venta no puede pedir de un lote más de lo que tiene. Se valida
+        # aquí, dentro de la transacción que guarda la venta: el libro de
+        # movimientos se registra al confirmar, cuando ya no se puede deshacer.
+        if self._state.adding:
+            from .lotes import validar_lote
+            validar_lote(self)
+        super().save(*args, **kwargs)
+
 class Devolucion(SafeDeleteModel):
     """
     Devoluciones de productos, ligadas a un detalle de transacción específico.
     """
     sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.PROTECT)
-    numero = models.CharField(max_length=50)
+    # Si se deja vacío, se asigna el consecutivo de la sucursal al guardar.
+    numero = models.CharField(max_length=50, blank=True)
     fecha = models.DateTimeField(auto_now_add=True)
     motivo = models.CharField(max_length=50, choices=MotivoDevolucion.choices())
     # Una devolución está ligada al item específico de la factura original.
@@ -94,4 +131,263 @@ class Devolucion(SafeDeleteModel):
         unique_together = [['sucursal', 'numero']]
 
     def __str__(self):
-        return f"Devolución #{self.numero} - {self.sucursal.nombre}"
\ No newline at end of file
+        return f"Devolución #{self.numero} - {self.sucursal.nombre}"
+
+    def clean(self):
+        super().clean()
+        if self.detalle_transaccion_id and self.cantidad_devuelta is not None:
+            from .devoluciones import disponible_para_devolver
+            disponible = disponible_para_devolver(self)
+            if self.cantidad_devuelta > disponible:
+                raise ValidationError(
+                    {'cantidad_devuelta': f"Solo quedan {disponible} unidades por devolver en esta línea."}
+                )
+
+    def save(self, *args, **kwargs):
+        # El acumulado de la línea se ajusta en la misma transacción que el
+        # cambio de estado: si uno falla, no queda ninguno de los dos.
+        with transaction.atomic():
+            if not self.numero:
+                from .consecutivos import asignar_numero
+                self.numero = asignar_numero(self.sucursal_id, TipoConsecutivo.DEVOLUCION.value)
+            from .devoluciones import actualizar_acumulado
+            actualizar_acumulado(self)
+            super().save(*args, **kwargs)
+
+class ConsecutivoFactura(models.Model):
+    """
+    Numeración de facturas y devoluciones por sucursal y tipo. Ver
+    transacciones/consecutivos.py para la asignación por bloques.
+    """
+    sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.CASCADE, related_name='consecutivos')
+    tipo = models.CharField(max_length=20, choices=TipoConsecutivo.choices())
+    prefijo = models.CharField(max_length=10, blank=True, default='')
+    # Próximo número que se entregará.
+    siguiente = models.PositiveBigIntegerField(default=1)
+    sin_huecos = models.BooleanField(
+        default=False,
+        help_text="Numeración estrictamente consecutiva (p. ej. facturación electrónica DIAN). "
+                  "Es más lenta: las facturas de la sucursal se numeran una a la vez.",
+    )
+
+    class Meta:
+        verbose_name = "Consecutivo de Factura"
+        verbose_name_plural = "Consecutivos de Factura"
+        constraints = [
+            models.UniqueConstraint(fields=['sucursal', 'tipo'], name='consecutivo_unico_por_tipo'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.prefijo}{self.siguiente} - {self.sucursal_id}"
+
+class MovimientoInventario(models.Model):
+    """
+    Libro de movimientos de inventario (solo se agregan filas, nunca se editan).
+    Se alimenta de transacciones finalizadas y devoluciones procesadas, ver
+    transacciones/inventario.py. La cantidad lleva signo: positiva si entra
+    mercancía, negativa si sale.
+
+    Las columnas de valoración (kardex de costo promedio, ver
+    transacciones/kardex.py) se llenan al registrar el movimiento; solo el
+    comando reconstruir_kardex las reescribe.
+    """
+    producto = models.ForeignKey('productos.Producto', on_delete=models.PROTECT, related_name='movimientos')
+    sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.PROTECT, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TipoMovimiento.choices())
+    cantidad = models.DecimalField(max_digits=12, decimal_places=3)
+    fecha = models.DateTimeField(default=timezone.now)
+    # Origen del movimiento: uno de los dos.
+    detalle_transaccion = models.ForeignKey(
+        DetalleTransaccion, on_delete=models.PROTECT, null=True, blank=True, related_name='movimientos'
+    )
+    devolucion = models.ForeignKey(
+        Devolucion, on_delete=models.PROTECT, null=True, blank=True, related_name='movimientos'
+    )
+    # Kardex: costo con que se valoró el movimiento y saldo de la sucursal después de él.
+    costo_unitario = models.DecimalField(max_digits=15, decimal_places=4, null=True, blank=True)
+    saldo_cantidad = models.DecimalField(max_digits=14, decimal_places=3, null=True, blank=True)
+    saldo_valor = models.DecimalField(max_digits=17, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Movimiento de Inventario"
+        verbose_name_plural = "Movimientos de Inventario"
+        indexes = [
+            models.Index(fields=['producto', 'fecha']),
+            # Último saldo de cada sucursal a una fecha (valoración) y reconstrucción del kardex.
+            models.Index(fields=['producto', 'sucursal', 'fecha']),
+        ]
+        constraints = [
+            # Cada origen se registra una sola vez por tipo (el registro es idempotente).
+            models.UniqueConstraint(
+                fields=['detalle_transaccion', 'tipo'],
+                condition=models.Q(detalle_transaccion__isnull=False),
+                name='movimiento_unico_por_detalle',
+            ),
+            models.UniqueConstraint(
+                fields=['devolucion', 'tipo'],
+                condition=models.Q(devolucion__isnull=False),
+                name='movimiento_unico_por_devolucion',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad} x {self.producto_id} ({self.fecha:%Y-%m-%d})"
+
+class StockSucursal(models.Model):
+    """
+    Stock de un producto en una sucursal. Cada venta solo incrementa la fila de
+    su sucursal, así las sucursales no compiten por la misma fila; Producto.stock
+    queda como el total (rollup) de todas ellas, ver transacciones/inventario.py.
+    También lleva el valor del inventario a costo promedio ponderado (kardex).
+    """
+    producto = models.ForeignKey('productos.Producto', on_delete=models.CASCADE, related_name='stock_sucursales')
+    sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.CASCADE, related_name='stock_productos')
+    cantidad = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    valor = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    costo_promedio = models.DecimalField(max_digits=15, decimal_places=4, default=0)
+
+    class Meta:
+        verbose_name = "Stock por Sucursal"
+        verbose_name_plural = "Stock por Sucursal"
+        constraints = [
+            # También es el índice compuesto para buscar (producto, sucursal).
+            models.UniqueConstraint(fields=['producto', 'sucursal'], name='stock_unico_por_sucursal'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.sucursal_id}: {self.cantidad}"
+
+class LoteInventario(models.Model):
+    """
+    Stock de un lote de un producto en una sucursal. Entra con las compras que
+    traen lote y las ventas lo consumen por vencimiento (primero en vencer,
+    primero en salir), ver transacciones/lotes.py.
+    """
+    producto = models.ForeignKey('productos.Producto', on_delete=models.CASCADE, related_name='lotes')
+    sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.CASCADE, related_name='lotes')
+    lote = models.CharField(max_length=50)
+    fecha_vencimiento = models.DateField(null=True, blank=True)
+    cantidad = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+
+    class Meta:
+        verbose_name = "Lote de Inventario"
+        verbose_name_plural = "Lotes de Inventario"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'sucursal', 'lote'], name='lote_unico_por_sucursal'),
+        ]
+        indexes = [
+            # Asignación FEFO: lotes de un producto en una sucursal por vencimiento.
+            models.Index(fields=['producto', 'sucursal', 'fecha_vencimiento'], name='lote_fefo_idx'),
+            # Reporte de vencimientos: solo los lotes con existencias.
+            models.Index(
+                fields=['fecha_vencimiento'], condition=models.Q(cantidad__gt=0), name='lote_por_vencer_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.sucursal_id} lote {self.lote}: {self.cantidad}"
+
+class AsignacionLote(models.Model):
+    """
+    Parte de un movimiento de inventario que se tomó de (o se devolvió a) un
+    lote. Con estas filas las anulaciones y devoluciones regresan la mercancía
+    a los mismos lotes.
+    """
+    movimiento = models.ForeignKey(MovimientoInventario, on_delete=models.CASCADE, related_name='asignaciones_lote')
+    lote = models.ForeignKey(LoteInventario, on_delete=models.PROTECT, related_name='asignaciones')
+    cantidad = models.DecimalField(max_digits=12, decimal_places=3)
+
+    class Meta:
+        verbose_name = "Asignación de Lote"
+        verbose_name_plural = "Asignaciones de Lote"
+
+    def __str__(self):
+        return f"{self.movimiento_id} -> lote {self.lote_id}: {self.cantidad}"
+
+class CorteInventario(models.Model):
+    """
+    Punto de control del libro de movimientos: stock de un producto en una
+    sucursal con todos los movimientos anteriores a `fecha_corte`. Las consultas
+    de stock a una fecha parten del último corte y solo suman lo que sigue.
+    """
+    producto = models.ForeignKey('productos.Producto', on_delete=models.CASCADE, related_name='cortes')
+    sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.CASCADE, related_name='cortes')
+    fecha_corte = models.DateTimeField(db_index=True)
+    stock = models.DecimalField(max_digits=14, decimal_places=3)
+
+    class Meta:
+        verbose_name = "Corte de Inventario"
+        verbose_name_plural = "Cortes de Inventario"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'sucursal', 'fecha_corte'], name='corte_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} @ {self.sucursal_id}: {self.stock} ({self.fecha_corte:%Y-%m-%d})"
+
+class VentaDiaria(models.Model):
+    """
+    Agregado diario por sucursal, producto y tipo de transacción (ventas o
+    compras). Lo mantiene el comando actualizar_ventas_diarias a partir del
+    libro de movimientos, ver transacciones/reportes.py.
+    """
+    dia = models.DateField()
+    sucursal = models.ForeignKey('organizacion.Sucursal', on_delete=models.CASCADE, related_name='ventas_diarias')
+    producto = models.ForeignKey('productos.Producto', on_delete=models.CASCADE, related_name='ventas_diarias')
+    tipo_transaccion = models.CharField(max_length=10, choices=TipoTransaccion.choices())
+    cantidad = models.DecimalField(max_digits=14, decimal_places=3, default=0)
+    ingresos = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    costo = models.DecimalField(max_digits=19, decimal_places=4, default=0)
+
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        indexes = [models.Index(fields=['sucursal', 'dia'])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dia', 'sucursal', 'producto', 'tipo_transaccion'], name='venta_diaria_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.sucursal_id} {self.producto_id} {self.tipo_transaccion}: {self.cantidad}"
+
+class MarcaAgregacion(models.Model):
+    """
+    Marca de agua de un agregado: último movimiento de inventario incluido.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_movimiento = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Marca de Agregación"
+        verbose_name_plural = "Marcas de Agregación"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_movimiento}"
+
+class AnalisisInventario(models.Model):
+    """
+    Resultado de la analítica de inventario por producto (clase ABC, demanda
+    y stock mínimo sugerido). Lo reescribe el comando analizar_inventario,
+    ver transacciones/analitica.py.
+    """
+    producto = models.OneToOneField(
+        'productos.Producto', on_delete=models.CASCADE, primary_key=True, related_name='analisis_inventario'
+    )
+    clase_abc = models.CharField(max_length=1, choices=ClaseABC.choices())
+    ingresos = models.DecimalField(max_digits=17, decimal_places=2)
+    demanda_diaria = models.DecimalField(max_digits=14, decimal_places=4)
+    desviacion_diaria = models.DecimalField(max_digits=14, decimal_places=4)
+    stock_seguridad = models.DecimalField(max_digits=14, decimal_places=3)
+    # Mismo formato que Producto.stock_minimo, para copiarlo con --aplicar.
+    stock_minimo_sugerido = models.DecimalField(max_digits=10, decimal_places=2)
+    calculado = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Análisis de Inventario"
+        verbose_name_plural = "Análisis de Inventario"
+
+    def __str__(self):
+        return f"{self.producto_id}: {self.clase_abc} (mínimo sugerido {self.stock_minimo_sugerido})"
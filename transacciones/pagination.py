@@ -0,0 +1,12 @@
+# transacciones/pagination.py
+from core.pagination import CursorKeysetPagination
+
+
+class TransaccionCursorPagination(CursorKeysetPagination):
+    """
+    Paginación por cursor sobre (fecha, id), de la más reciente a la más
+    antigua. Con el filtro por sucursal usa el índice (sucursal, fecha): cada
+    página lee solo sus filas y las facturas nuevas no desplazan ni duplican
+    filas entre páginas.
+    """
+    ordering = ('-fecha', '-id')
@@ -0,0 +1,153 @@
+# transacciones/reportes.py
+"""
+Agregado diario de ventas y compras (VentaDiaria) y reportes sobre él.
+
+El agregado se alimenta del libro de movimientos (MovimientoInventario), que
+solo crece: el comando actualizar_ventas_diarias procesa los movimientos
+posteriores a la marca de agua (MarcaAgregacion) y suma sus totales a las
+filas de cada (día, sucursal, producto, tipo). Las anulaciones restan.
+
+Los reportes leen el agregado y solo recorren filas sin agregar para los
+movimientos que el comando aún no procesó (normalmente, los del día en curso).
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import Case, DecimalField, F, Max, Min, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.enums import TipoMovimiento
+from .models import MarcaAgregacion, MovimientoInventario, VentaDiaria
+
+MARCA = 'ventas_diarias'
+# Solo se agregan movimientos con al menos este tiempo: uno más reciente
+# podría tener un id menor que otro ya confirmado y quedar detrás de la marca.
+MARGEN = datetime.timedelta(minutes=10)
+TAMANO_LOTE = 20_000
+CLAVES = ('dia', 'sucursal_id', 'producto_id', 'tipo_transaccion')
+MEDIDAS = ('cantidad', 'ingresos', 'costo')
+AGRUPACIONES = {'dia': 'dia', 'producto': 'producto_id', 'sucursal': 'sucursal_id'}
+
+
+def agregar_movimientos(movimientos):
+    """
+    Totales por (día de la factura, sucursal, producto, tipo de transacción)
+    de los movimientos de transacciones del queryset. Las cantidades y montos
+    salen del detalle; una anulación los resta.
+    """
+    signo = Case(When(tipo=TipoMovimiento.ANULACION.value, then=Value(-1)), default=Value(1))
+    decimal = DecimalField()
+    return (
+        movimientos.filter(detalle_transaccion__isnull=False)
+        .order_by()
+        .annotate(
+            dia=TruncDate('detalle_transaccion__transaccion__fecha'),
+            tipo_transaccion=F('detalle_transaccion__transaccion__tipo_transaccion'),
+        )
+        .values(*CLAVES)
+        .annotate(
+            cantidad=Sum(signo * F('detalle_transaccion__cantidad'), output_field=decimal),
+            ingresos=Sum(signo * F('detalle_transaccion__total'), output_field=decimal),
+            costo=Sum(
+                signo * F('detalle_transaccion__cantidad') * F('detalle_transaccion__costo_unitario'),
+                output_field=decimal,
+            ),
+        )
+    )
+
+
+def actualizar_ventas_diarias(margen=MARGEN, tamano_lote=TAMANO_LOTE):
+    """
+    Suma al agregado los movimientos posteriores a la marca de agua, por
+    lotes de ids. Cada lote y su nueva marca se guardan en una transacción,
+    así que el comando se puede interrumpir y relanzar. Devuelve cuántos
+    movimientos procesó.
+    """
+    limite = timezone.now() - margen
+    procesados = 0
+    while True:
+        with transaction.atomic():
+            # El bloqueo de la marca evita que dos ejecuciones sumen lo mismo.
+            MarcaAgregacion.objects.get_or_create(nombre=MARCA)
+            marca = MarcaAgregacion.objects.select_for_update().get(nombre=MARCA)
+
+            pendientes = MovimientoInventario.objects.filter(pk__gt=marca.ultimo_movimiento)
+            reciente = pendientes.filter(fecha__gte=limite).aggregate(pk=Min('pk'))['pk']
+            if reciente is not None:
+                pendientes = pendientes.filter(pk__lt=reciente)
+            hasta = (
+                pendientes.order_by('pk').values_list('pk', flat=True)[tamano_lote - 1:tamano_lote].first()
+                or pendientes.aggregate(pk=Max('pk'))['pk']
+            )
+            if hasta is None:
+                return procesados
+
+            lote = pendientes.filter(pk__lte=hasta)
+            procesados += lote.count()
+            _acumular(list(agregar_movimientos(lote)))
+            marca.ultimo_movimiento = hasta
+            marca.save(update_fields=['ultimo_movimiento', 'actualizado'])
+
+
+def _acumular(filas):
+    if not filas:
+        return
+    totales = {tuple(fila[clave] for clave in CLAVES): fila for fila in filas}
+    dias = [fila['dia'] for fila in filas]
+    # Filtramos por rango de días y sucursales (índice sucursal, dia) en vez
+    # de una lista IN con cada producto, que puede superar el límite de parámetros.
+    existentes = {
+        (venta.dia, venta.sucursal_id, venta.producto_id, venta.tipo_transaccion): venta
+        for venta in VentaDiaria.objects.filter(
+            dia__range=(min(dias), max(dias)),
+            sucursal_id__in={fila['sucursal_id'] for fila in filas},
+        )
+    }
+
+    nuevas, cambiadas = [], []
+    for clave, fila in totales.items():
+        venta = existentes.get(clave)
+        if venta is None:
+            nuevas.append(VentaDiaria(**{campo: fila[campo] for campo in CLAVES + MEDIDAS}))
+            continue
+        for medida in MEDIDAS:
+            setattr(venta, medida, getattr(venta, medida) + fila[medida])
+        cambiadas.append(venta)
+    VentaDiaria.objects.bulk_create(nuevas, batch_size=1000)
+    VentaDiaria.objects.bulk_update(cambiadas, MEDIDAS, batch_size=1000)
+
+
+def reporte_ventas(desde, hasta, tipo_transaccion, sucursal_id=None, agrupar='dia'):
+    """
+    Cantidad, ingresos y costo entre dos fechas (inclusive), agrupados por
+    día, producto o sucursal. Lee el agregado y completa con los movimientos
+    que todavía están por encima de la marca de agua.
+    """
+    campo = AGRUPACIONES[agrupar]
+    # El agregado y su marca de agua se leen de la misma base (ver core/replicas.py).
+    alias = router.db_for_read(VentaDiaria)
+    agregadas = VentaDiaria.objects.using(alias).filter(
+        dia__range=(desde, hasta), tipo_transaccion=tipo_transaccion,
+    )
+    marca = (
+        MarcaAgregacion.objects.using(alias).filter(nombre=MARCA)
+        .values_list('ultimo_movimiento', flat=True).first()
+    ) or 0
+    pendientes = MovimientoInventario.objects.filter(
+        pk__gt=marca,
+        detalle_transaccion__transaccion__fecha__date__range=(desde, hasta),
+        detalle_transaccion__transaccion__tipo_transaccion=tipo_transaccion,
+    )
+    if sucursal_id is not None:
+        agregadas = agregadas.filter(sucursal_id=sucursal_id)
+        pendientes = pendientes.filter(sucursal_id=sucursal_id)
+
+    resultados = defaultdict(lambda: dict.fromkeys(MEDIDAS, Decimal('0')))
+    filas = agregadas.order_by().values(campo).annotate(**{medida: Sum(medida) for medida in MEDIDAS})
+    for fila in list(filas) + list(agregar_movimientos(pendientes)):
+        for medida in MEDIDAS:
+            resultados[fila[campo]][medida] += fila[medida]
+    return [{agrupar: clave, **medidas} for clave, medidas in sorted(resultados.items())]
@@ -0,0 +1,131 @@
+# transacciones/serializers.py
+
+from decimal import Decimal
+
+from rest_framework import serializers
+from core.enums import EstadoTransaccion, TipoTransaccion
+from .models import Transaccion, DetalleTransaccion
+from .reportes import AGRUPACIONES
+
+class DetalleLoteSerializer(serializers.ModelSerializer):
+    """
+    Línea de una venta recibida en lote desde un punto de venta.
+    El producto llega por SKU y se resuelve para todo el lote a la vez.
+    """
+    codigo = serializers.CharField(max_length=50)
+    cantidad = serializers.DecimalField(max_digits=10, decimal_places=3, min_value=Decimal('0.001'))
+
+    class Meta:
+        model = DetalleTransaccion
+        fields = [
+            'codigo', 'lote', 'fecha_vencimiento', 'cantidad',
+            'costo_unitario', 'precio_venta_calculado', 'total',
+        ]
+
+class TransaccionLoteSerializer(serializers.ModelSerializer):
+    """
+    Valida cada venta (con sus detalles) de una carga desde punto de venta.
+    Las relaciones llegan como ids y se verifican en bloque en
+    transacciones/ingesta.py, para no hacer una consulta por venta.
+    """
+    # El modelo acepta el número en blanco (se asigna al guardar), pero la
+    # carga es idempotente por número: aquí es obligatorio y no vacío.
+    numero_factura = serializers.CharField(max_length=80)
+    sucursal = serializers.IntegerField(min_value=1)
+    empleado = serializers.IntegerField(min_value=1)
+    cliente = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    proveedor = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    # Los puntos de venta suben ventas ya cerradas.
+    estado = serializers.ChoiceField(choices=EstadoTransaccion.choices(), default=EstadoTransaccion.FINALIZADA.value)
+    detalles = DetalleLoteSerializer(many=True, allow_empty=False)
+
+    class Meta:
+        model = Transaccion
+        fields = [
+            'numero_factura', 'sucursal', 'empleado', 'cliente', 'proveedor',
+            'valor_base', 'descuento', 'total', 'metodo_pago', 'estado',
+            'tipo_transaccion', 'observaciones', 'detalles',
+        ]
+        # Sin UniqueTogetherValidator: haría una consulta por venta y una venta
+        # repetida no es un error, la carga es idempotente.
+        validators = []
+
+class DetalleLecturaSerializer(serializers.ModelSerializer):
+    """
+    Línea de una transacción para la API de consulta. Plano: el producto va
+    como campos sueltos (precargado con select_related), no anidado.
+    """
+    producto_codigo = serializers.CharField(source='producto.codigo', read_only=True)
+    producto_nombre = serializers.CharField(source='producto.nombre', read_only=True)
+
+    class Meta:
+        model = DetalleTransaccion
+        fields = [
+            'id', 'producto', 'producto_codigo', 'producto_nombre', 'lote', 'fecha_vencimiento',
+            'cantidad', 'costo_unitario', 'precio_venta_calculado', 'total',
+            'cantidad_devuelta', 'monto_devuelto',
+        ]
+        read_only_fields = fields
+
+class TransaccionLecturaSerializer(serializers.ModelSerializer):
+    """
+    Transacción para la API de consulta (lista y detalle). Usa solo campos
+    de las relaciones que la vista carga con select_related y prefetch, nunca
+    __str__, así el número de consultas no depende del tamaño de la página.
+    """
+    sucursal_nombre = serializers.CharField(source='sucursal.nombre', read_only=True)
+    empleado_nombre = serializers.CharField(source='empleado.nombre_completo', read_only=True)
+    cliente_nombre = serializers.CharField(source='cliente.nombre_completo', read_only=True, default=None)
+    proveedor_nombre = serializers.CharField(source='proveedor.nombre_completo', read_only=True, default=None)
+    detalles = DetalleLecturaSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Transaccion
+        fields = [
+            'id', 'numero_factura', 'fecha', 'tipo_transaccion', 'estado', 'metodo_pago',
+            'sucursal', 'sucursal_nombre', 'empleado', 'empleado_nombre',
+            'cliente', 'cliente_nombre', 'proveedor', 'proveedor_nombre',
+            'valor_base', 'descuento', 'total', 'observaciones', 'detalles',
+        ]
+        read_only_fields = fields
+
+class TransaccionFiltroSerializer(serializers.Serializer):
+    """
+    Filtros de la lista de transacciones (?desde=AAAA-MM-DD&hasta=...&sucursal=...).
+    """
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    sucursal = serializers.IntegerField(min_value=1, required=False)
+    tipo_transaccion = serializers.ChoiceField(choices=TipoTransaccion.choices(), required=False)
+    estado = serializers.ChoiceField(choices=EstadoTransaccion.choices(), required=False)
+
+    def validate(self, data):
+        if 'desde' in data and 'hasta' in data and data['desde'] > data['hasta']:
+            raise serializers.ValidationError("'desde' no puede ser posterior a 'hasta'.")
+        return data
+
+class ReporteVentasSerializer(serializers.Serializer):
+    """
+    Parámetros del reporte de ventas (?desde=AAAA-MM-DD&hasta=...).
+    """
+    desde = serializers.DateField()
+    hasta = serializers.DateField()
+    tipo_transaccion = serializers.ChoiceField(
+        choices=TipoTransaccion.choices(), default=TipoTransaccion.VENTA.value
+    )
+    sucursal = serializers.IntegerField(min_value=1, required=False)
+    agrupar = serializers.ChoiceField(choices=list(AGRUPACIONES), default='dia')
+
+    def validate(self, data):
+        if data['desde'] > data['hasta']:
+            raise serializers.ValidationError("'desde' no puede ser posterior a 'hasta'.")
+        return data
+
+
+class LotesPorVencerSerializer(serializers.Serializer):
+    """
+    Parámetros del reporte de lotes por vencer (?dias=30&sucursal=...).
+    """
+    dias = serializers.IntegerField(min_value=0, max_value=3650, default=30)
+    sucursal = serializers.IntegerField(min_value=1, required=False)
+    incluir_vencidos = serializers.BooleanField(default=False)
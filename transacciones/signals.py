@@ -0,0 +1,30 @@
+# transacciones/signals.py
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .inventario import registrar_devolucion, registrar_transaccion
+from .models import DetalleTransaccion, Devolucion, Transaccion
+
+# --- Libro de movimientos de inventario ---
+# Se registra al confirmar la transacción de base de datos: el admin guarda el
+# encabezado antes que sus detalles (inlines), y así el registro los ve todos.
+# El soft delete también dispara post_save. El registro es idempotente, por eso
+# no importa que varias señales lo programen para la misma factura.
+
+
+@receiver(post_save, sender=Transaccion)
+def registrar_movimientos_transaccion(sender, instance, **kwargs):
+    transaction.on_commit(partial(registrar_transaccion, instance.pk))
+
+
+@receiver(post_save, sender=DetalleTransaccion)
+def registrar_movimientos_detalle(sender, instance, **kwargs):
+    transaction.on_commit(partial(registrar_transaccion, instance.transaccion_id))
+
+
+@receiver(post_save, sender=Devolucion)
+def registrar_movimientos_devolucion(sender, instance, **kwargs):
+    transaction.on_commit(partial(registrar_devolucion, instance.pk))
@@ -1,3 +1,769 @@
-from django.test import TestCase
+# transacciones/tests.py
+import datetime
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from core.enums import (
+    ClaseABC, EstadoDevolucion, EstadoTransaccion, MetodoPago, TipoConsecutivo, TipoDevolucion, TipoMovimiento,
+    TipoTransaccion,
+)
+from core.testing import PresupuestoConsultasMixin, crear_perfil, crear_sucursal
+from productos.models import Producto
+from .devoluciones import conciliar_devoluciones
+from .analitica import VENTAS_DTYPE, analizar_inventario, calcular
+from .consecutivos import TAMANO_BLOQUE, asignar_numero, descartar_bloques
+from .reportes import actualizar_ventas_diarias
+from .kardex import reconstruir_kardex, valoracion, valoracion_en
+from .inventario import crear_cortes, recalcular_stock_global, registrar_transaccion, stock_en
+from .models import (
+    AnalisisInventario, AsignacionLote, ConsecutivoFactura, LoteInventario, CorteInventario, DetalleTransaccion, Devolucion, MovimientoInventario, StockSucursal,
+    Transaccion, VentaDiaria,
+)
+
+
+class InventarioMixin:
+    """
+    Datos base para las pruebas del libro de inventario.
+    """
+
+    def setUp(self):
+        self.sucursal = crear_sucursal()
+        self.empleado = crear_perfil()
+        self.producto = Producto.objects.create(codigo='SKU-1', nombre='Producto 1', stock=10)
+
+    def crear_transaccion(self, cantidades, tipo=TipoTransaccion.VENTA, estado=EstadoTransaccion.FINALIZADA,
+                          costo=1, lote=None, fecha_vencimiento=None):
+        """
+        Crea una transacción con un detalle por cantidad, en una sola
+        transacción de base de datos y ejecutando las señales de on_commit,
+        como lo haría una petición real.
+        """
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            transaccion = Transaccion.objects.create(
+                numero_factura=f'F-{Transaccion.all_objects.count() + 1}',
+                sucursal=self.sucursal, empleado=self.empleado,
+                metodo_pago=MetodoPago.EFECTIVO.value, tipo_transaccion=tipo.value, estado=estado.value,
+            )
+            for cantidad in cantidades:
+                DetalleTransaccion.objects.create(
+                    transaccion=transaccion, producto=self.producto, cantidad=cantidad,
+                    lote=lote, fecha_vencimiento=fecha_vencimiento,
+                    costo_unitario=costo, precio_venta_calculado=1, total=cantidad,
+                )
+        return transaccion
+
+    def guardar(self, objeto, **campos):
+        with self.captureOnCommitCallbacks(execute=True):
+            for campo, valor in campos.items():
+                setattr(objeto, campo, valor)
+            objeto.save()
+
+    def stock(self):
+        self.producto.refresh_from_db()
+        return self.producto.stock
+
+
+class LibroInventarioTests(InventarioMixin, TestCase):
+
+    def test_venta_y_compra_finalizadas_mueven_el_stock(self):
+        self.crear_transaccion([2, 3])
+        self.assertEqual(self.stock(), 5)
+        self.crear_transaccion([7], tipo=TipoTransaccion.COMPRA)
+        self.assertEqual(self.stock(), 12)
+        self.assertEqual(MovimientoInventario.objects.count(), 3)
+
+    def test_borrador_no_mueve_el_stock_hasta_finalizar(self):
+        venta = self.crear_transaccion([4], estado=EstadoTransaccion.BORRADOR)
+        self.assertEqual(self.stock(), 10)
+        self.guardar(venta, estado=EstadoTransaccion.FINALIZADA.value)
+        self.assertEqual(self.stock(), 6)
+
+    def test_registro_idempotente(self):
+        venta = self.crear_transaccion([4])
+        registrar_transaccion(venta.pk)
+        registrar_transaccion(venta.pk)
+        self.assertEqual(self.stock(), 6)
+        self.assertEqual(MovimientoInventario.objects.count(), 1)
+
+    def test_anulacion_agrega_movimiento_contrario(self):
+        venta = self.crear_transaccion([4])
+        self.guardar(venta, estado=EstadoTransaccion.ANULADA.value)
+        self.assertEqual(self.stock(), 10)
+        # El libro conserva la venta y su anulación.
+        self.assertEqual(
+            sorted(MovimientoInventario.objects.values_list('cantidad', flat=True)),
+            [Decimal('-4'), Decimal('4')],
+        )
+
+    def test_devolucion_procesada_reingresa_mercancia(self):
+        venta = self.crear_transaccion([4])
+        with self.captureOnCommitCallbacks(execute=True):
+            devolucion = Devolucion.objects.create(
+                sucursal=self.sucursal, numero='D-1', motivo='Otro',
+                detalle_transaccion=venta.detalles.get(), tipo_devolucion=TipoDevolucion.VENTA.value,
+                cantidad_devuelta=1, monto_devolucion=1, observaciones='', empleado=self.empleado,
+            )
+        self.assertEqual(self.stock(), 6)
+        self.guardar(devolucion, estado=EstadoDevolucion.PROCESADA.value)
+        self.assertEqual(self.stock(), 7)
+
+    def test_stock_a_una_fecha_con_cortes(self):
+        ayer = timezone.now() - datetime.timedelta(days=1)
+        self.crear_transaccion([7], tipo=TipoTransaccion.COMPRA)
+        MovimientoInventario.objects.update(fecha=ayer - datetime.timedelta(hours=1))
+        self.crear_transaccion([2])
+
+        self.assertEqual(stock_en(self.producto.pk, ayer), 7)
+        self.assertEqual(crear_cortes(ayer), 1)
+        self.assertEqual(CorteInventario.objects.get().stock, 7)
+        # Repetir el corte no crea ni cuenta saldos.
+        self.assertEqual(crear_cortes(ayer), 0)
+        # Con el corte, solo se suman los movimientos posteriores.
+        with self.assertNumQueries(3):
+            self.assertEqual(stock_en(self.producto.pk, timezone.now()), 5)
+        self.assertEqual(stock_en(self.producto.pk, ayer, sucursal_id=self.sucursal.pk), 7)
+
+        # El siguiente corte parte del anterior.
+        crear_cortes(timezone.now())
+        self.assertEqual(CorteInventario.objects.latest('fecha_corte').stock, 5)
+
+
+class StockSucursalTests(InventarioMixin, APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.otra_sucursal = crear_sucursal('Norte')
+
+    def test_cada_sucursal_lleva_su_stock_y_el_producto_el_total(self):
+        self.crear_transaccion([7], tipo=TipoTransaccion.COMPRA)
+        self.crear_transaccion([2])
+        self.sucursal = self.otra_sucursal
+        self.crear_transaccion([5], tipo=TipoTransaccion.COMPRA)
+
+        por_sucursal = dict(StockSucursal.objects.values_list('sucursal__nombre', 'cantidad'))
+        self.assertEqual(por_sucursal, {'Principal': 5, 'Norte': 5})
+        # Producto.stock partía de 10 y acumula los movimientos de todas las sucursales.
+        self.assertEqual(self.stock(), 20)
+
+    def test_recalcular_corrige_el_total(self):
+        self.crear_transaccion([7], tipo=TipoTransaccion.COMPRA)
+        Producto.objects.filter(pk=self.producto.pk).update(stock=0)
+        self.assertEqual(recalcular_stock_global(), 1)
+        self.assertEqual(self.stock(), 7)
+        self.assertEqual(recalcular_stock_global(), 0)
+
+    def test_api_disponibilidad_en_una_consulta(self):
+        Producto.objects.create(codigo='SKU-2', nombre='Producto 2')
+        self.crear_transaccion([7], tipo=TipoTransaccion.COMPRA)
+        url = reverse('producto-disponibilidad')
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(url, {'sucursal': self.sucursal.pk, 'codigos': 'SKU-1,SKU-2,NO-EXISTE'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['disponibilidad'], {'SKU-1': Decimal('7'), 'SKU-2': Decimal('0')})
+        self.assertEqual(respuesta.data['no_encontrados'], ['NO-EXISTE'])
+
+    def test_api_disponibilidad_valida_parametros(self):
+        url = reverse('producto-disponibilidad')
+        self.assertEqual(self.client.get(url, {'codigos': 'SKU-1'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'sucursal': self.sucursal.pk}).status_code, 400)
+
+
+class IngestaVentasTests(InventarioMixin, PresupuestoConsultasMixin, APITestCase):
+    """
+    Carga en lote de ventas desde punto de venta.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user('pos'))
+        self.url = reverse('transaccion-lote')
+
+    def venta(self, numero, *cantidades, codigo='SKU-1', lote=None):
+        return {
+            'numero_factura': numero, 'sucursal': self.sucursal.pk, 'empleado': self.empleado.pk,
+            'metodo_pago': MetodoPago.EFECTIVO.value, 'tipo_transaccion': TipoTransaccion.VENTA.value,
+            'total': '10.00',
+            'detalles': [
+                {'codigo': codigo, 'lote': lote, 'cantidad': str(cantidad), 'costo_unitario': '1',
+                 'precio_venta_calculado': '2', 'total': '2'}
+                for cantidad in cantidades
+            ],
+        }
+
+    def cargar(self, lote):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, lote, format='json')
+
+    def test_crea_ventas_detalles_y_movimientos(self):
+        respuesta = self.cargar([self.venta('P-1', 1, 2), self.venta('P-2', 3)])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['creadas'], 2)
+        self.assertEqual(DetalleTransaccion.objects.count(), 3)
+        self.assertEqual(Transaccion.objects.get(numero_factura='P-1').estado, EstadoTransaccion.FINALIZADA.value)
+        self.assertEqual(self.stock(), 4)
+        self.assertEqual(StockSucursal.objects.get().cantidad, -6)
+
+    def test_reenviar_el_lote_es_idempotente(self):
+        lote = [self.venta('P-1', 1), self.venta('P-2', 1)]
+        self.cargar(lote)
+        respuesta = self.cargar(lote + [self.venta('P-3', 1)])
+        self.assertEqual(respuesta.data['creadas'], 1)
+        self.assertEqual(respuesta.data['duplicadas'], ['P-1', 'P-2'])
+        self.assertEqual(Transaccion.objects.count(), 3)
+        self.assertEqual(self.stock(), 7)
+
+    def test_errores_por_venta(self):
+        sin_detalles = self.venta('P-2')
+        respuesta = self.client.post(
+            self.url,
+            [self.venta('P-1', 1), sin_detalles, self.venta('P-3', 1, codigo='NO-EXISTE')],
+            format='json',
+        )
+        self.assertEqual(respuesta.data['creadas'], 1)
+        self.assertEqual([e['venta'] for e in respuesta.data['errores']], [1, 2])
+        self.assertIn('detalles', respuesta.data['errores'][1]['errores'])
+
+    def test_venta_sin_existencias_del_lote_no_detiene_al_resto(self):
+        self.crear_transaccion([5], tipo=TipoTransaccion.COMPRA, lote='L-1')
+        lote = [self.venta('P-1', 2, 1, lote='L-1'), self.venta('P-2', 3, lote='L-1'), self.venta('P-3', 1)]
+        respuesta = self.cargar(lote)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['creadas'], 2)
+        self.assertEqual([e['venta'] for e in respuesta.data['errores']], [1])
+        self.assertIn('detalles', respuesta.data['errores'][0]['errores'])
+        # P-1 toma 3 unidades y P-3, sin lote, una más por FEFO.
+        self.assertEqual(LoteInventario.objects.get(lote='L-1').cantidad, 1)
+
+        # Al reenviar, la venta ya cargada es duplicada aunque el lote ya no le alcance.
+        respuesta = self.cargar(lote)
+        self.assertEqual(respuesta.data['duplicadas'], ['P-1', 'P-3'])
+        self.assertEqual([e['venta'] for e in respuesta.data['errores']], [1])
+
+    def test_numero_de_factura_obligatorio(self):
+        en_blanco = self.venta('', 1)
+        sin_numero = self.venta('P-9', 1)
+        del sin_numero['numero_factura']
+        respuesta = self.cargar([self.venta('P-1', 1), en_blanco, self.venta('', 1), sin_numero])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.data['creadas'], respuesta.data['duplicadas']), (1, []))
+        self.assertEqual([e['venta'] for e in respuesta.data['errores']], [1, 2, 3])
+        for error in respuesta.data['errores']:
+            self.assertIn('numero_factura', error['errores'])
+
+    def test_sin_pks_devueltos_por_bulk_create(self):
+        # Como en MySQL: bulk_create deja los objetos sin pk.
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            respuesta = self.cargar([self.venta('P-1', 1, 2), self.venta('P-2', 3)])
+        self.assertEqual(respuesta.data['creadas'], 2)
+        movimientos = MovimientoInventario.objects.filter(detalle_transaccion__transaccion__numero_factura='P-1')
+        self.assertEqual(sorted(movimientos.values_list('cantidad', flat=True)), [-2, -1])
+        self.assertEqual(self.stock(), 4)
+
+    def test_consultas_no_dependen_del_numero_de_ventas(self):
+        lote = [self.venta(f'P-{i}', 1, 1) for i in range(200)]
+        respuesta = self.assertPresupuestoConsultas(
+            26, self.client.post, self.url, lote, format='json'
+        )
+        self.assertEqual(respuesta.data['creadas'], 200)
+
+    def test_requiere_autenticacion(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.post(self.url, [], format='json').status_code, (401, 403))
+
+
+class ConsecutivoFacturaTests(InventarioMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        descartar_bloques()
+
+    def nueva(self, tipo=TipoTransaccion.VENTA):
+        return Transaccion.objects.create(
+            sucursal=self.sucursal, empleado=self.empleado, metodo_pago=MetodoPago.EFECTIVO.value,
+            tipo_transaccion=tipo.value,
+        )
+
+    def test_ventas_sin_huecos_por_sucursal(self):
+        self.assertEqual([self.nueva().numero_factura for _ in range(3)], ['1', '2', '3'])
+        ConsecutivoFactura.objects.filter(tipo=TipoConsecutivo.VENTA.value).update(prefijo='FV-')
+        self.assertEqual(self.nueva().numero_factura, 'FV-4')
+        # Otra sucursal lleva su propia numeración.
+        self.sucursal = crear_sucursal('Norte')
+        self.assertEqual(self.nueva().numero_factura, '1')
+
+    def test_numero_sin_huecos_vuelve_si_la_factura_se_revierte(self):
+        self.nueva()
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            self.nueva()
+            1 / 0
+        self.assertEqual(self.nueva().numero_factura, '2')
+
+    def test_compras_por_bloques(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            primera = self.nueva(TipoTransaccion.COMPRA)
+        segunda = self.nueva(TipoTransaccion.COMPRA)
+        self.assertEqual([primera.numero_factura, segunda.numero_factura], ['1', '2'])
+        # Una sola reserva en la base de datos para todo el bloque.
+        consecutivo = ConsecutivoFactura.objects.get(tipo=TipoConsecutivo.COMPRA.value)
+        self.assertEqual(consecutivo.siguiente, 1 + TAMANO_BLOQUE)
+
+    def test_devoluciones_numeradas(self):
+        venta = self.crear_transaccion([1])
+        devolucion = Devolucion.objects.create(
+            sucursal=self.sucursal, motivo='Otro', detalle_transaccion=venta.detalles.get(),
+            tipo_devolucion=TipoDevolucion.VENTA.value, cantidad_devuelta=1, monto_devolucion=1,
+            observaciones='', empleado=self.empleado,
+        )
+        self.assertEqual(devolucion.numero, '1')
+
+
+class ConsecutivoConcurrenciaTests(TransactionTestCase):
+    """
+    Prueba de estrés: muchos hilos numerando a la vez no repiten números.
+    """
+    hilos = 8
+    por_hilo = 60
+
+    def setUp(self):
+        descartar_bloques()
+        self.sucursal = crear_sucursal()
+
+    def en_paralelo(self, trabajo):
+        numeros, errores = [], []
+        bloqueo = threading.Lock()
+
+        def ejecutar():
+            try:
+                propios = [trabajo() for _ in range(self.por_hilo)]
+                with bloqueo:
+                    numeros.extend(propios)
+            except Exception as error:  # noqa: BLE001 (se reporta en la aserción)
+                errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=ejecutar) for _ in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        return numeros
+
+    def sin_huecos(self):
+        with transaction.atomic():
+            return asignar_numero(self.sucursal.pk, TipoConsecutivo.VENTA.value)
+
+    def por_bloques(self):
+        # La base de pruebas de SQLite (en memoria, cache compartida) responde
+        # "table is locked" en lugar de esperar; reintentamos unas cuantas veces.
+        for _ in range(1000):
+            try:
+                return asignar_numero(self.sucursal.pk, TipoConsecutivo.COMPRA.value)
+            except OperationalError:
+                time.sleep(0.001)
+        raise AssertionError("La base de datos siguió bloqueada.")
+
+    def test_sin_duplicados_por_bloques(self):
+        numeros = self.en_paralelo(self.por_bloques)
+        self.assertEqual(len(numeros), self.hilos * self.por_hilo)
+        self.assertEqual(len(set(numeros)), len(numeros))
+
+    def test_sin_huecos_exige_una_transaccion(self):
+        with self.assertRaises(TransactionManagementError):
+            asignar_numero(self.sucursal.pk, TipoConsecutivo.VENTA.value)
+
+    @skipIf(connection.vendor == 'sqlite', "SQLite no admite transacciones de escritura concurrentes.")
+    def test_sin_duplicados_ni_huecos(self):
+        numeros = self.en_paralelo(self.sin_huecos)
+        total = self.hilos * self.por_hilo
+        self.assertEqual(sorted(map(int, numeros)), list(range(1, total + 1)))
+
+
+class VentasDiariasTests(InventarioMixin, APITestCase):
+    """
+    Agregado diario alimentado desde la marca de agua del libro.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user('reportes'))
+        self.url = reverse('transaccion-reporte-ventas')
+        self.hoy = timezone.localdate()
+        self.ayer = self.hoy - datetime.timedelta(days=1)
+
+    def venta_de_ayer(self, *cantidades):
+        venta = self.crear_transaccion(cantidades)
+        Transaccion.objects.filter(pk=venta.pk).update(fecha=timezone.now() - datetime.timedelta(days=1))
+        venta.refresh_from_db()
+        return venta
+
+    def reporte(self, **parametros):
+        parametros = {'desde': self.ayer, 'hasta': self.hoy, **parametros}
+        respuesta = self.client.get(self.url, parametros)
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return respuesta.data['resultados']
+
+    def test_agrega_incrementalmente_y_resta_anulaciones(self):
+        venta = self.venta_de_ayer(2, 3)
+        self.assertEqual(actualizar_ventas_diarias(margen=datetime.timedelta(0)), 2)
+        fila = VentaDiaria.objects.get()
+        self.assertEqual((fila.dia, fila.cantidad, fila.ingresos, fila.costo), (self.ayer, 5, 5, 5))
+
+        # Sin movimientos nuevos no hay nada que hacer.
+        self.assertEqual(actualizar_ventas_diarias(margen=datetime.timedelta(0)), 0)
+
+        self.guardar(venta, estado=EstadoTransaccion.ANULADA.value)
+        actualizar_ventas_diarias(margen=datetime.timedelta(0))
+        self.assertEqual(VentaDiaria.objects.get().cantidad, 0)
+
+    def test_respeta_el_margen_de_los_movimientos_recientes(self):
+        self.venta_de_ayer(2)
+        self.assertEqual(actualizar_ventas_diarias(), 0)
+
+    def test_reporte_combina_agregado_y_dia_en_curso(self):
+        self.venta_de_ayer(2)
+        actualizar_ventas_diarias(margen=datetime.timedelta(0), tamano_lote=1)
+        self.crear_transaccion([4])
+
+        self.assertEqual(
+            [(fila['dia'], fila['cantidad']) for fila in self.reporte()],
+            [(self.ayer, 2), (self.hoy, 4)],
+        )
+        self.assertEqual(self.reporte(agrupar='producto'), [
+            {'producto': self.producto.pk, 'cantidad': 6, 'ingresos': 6, 'costo': 6},
+        ])
+        self.assertEqual(self.reporte(tipo_transaccion=TipoTransaccion.COMPRA.value), [])
+
+    def test_valida_parametros(self):
+        respuesta = self.client.get(self.url, {'desde': self.hoy, 'hasta': self.ayer})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class AnalisisInventarioTests(InventarioMixin, TestCase):
+    """
+    Clasificación ABC y stock mínimo sugerido a partir del agregado diario.
+    """
+
+    def test_calculo_vectorizado(self):
+        ventas = np.array(
+            [(1, 10, 700), (1, 10, 700), (2, 2, 200), (3, 1, 20), (3, 1, 20), (99, 5, 5000)],
+            dtype=VENTAS_DTYPE,
+        )
+        resultado = calcular([3, 1, 2, 4], ventas, dias=4, dias_reposicion=4, nivel_servicio=0.5)
+
+        # Ingresos 1400, 200 y 40 (el 99 no es un producto analizado).
+        self.assertEqual(resultado['clase_abc'].tolist(), ['C', 'A', 'B', 'C'])
+        self.assertEqual(resultado['ingresos'].tolist(), [40, 1400, 200, 0])
+        self.assertEqual(resultado['demanda_diaria'].tolist(), [0.5, 5, 0.5, 0])
+        self.assertEqual(resultado['desviacion_diaria'].tolist(), [0.5, 5, np.sqrt(0.75), 0])
+        # Con nivel de servicio 0.5 (z = 0) el mínimo es la demanda del plazo de reposición.
+        self.assertEqual(resultado['stock_minimo_sugerido'].tolist(), [2, 20, 2, 0])
+        self.assertEqual(resultado['con_ventas'].tolist(), [True, True, True, False])
+
+    def test_guarda_y_aplica_solo_a_productos_con_ventas(self):
+        sin_ventas = Producto.objects.create(codigo='SKU-2', nombre='Producto 2', stock_minimo=7)
+        ayer = timezone.localdate() - datetime.timedelta(days=1)
+        VentaDiaria.objects.create(
+            dia=ayer, sucursal=self.sucursal, producto=self.producto,
+            tipo_transaccion=TipoTransaccion.VENTA.value, cantidad=30, ingresos=300, costo=100,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = analizar_inventario(dias=10, dias_reposicion=2, aplicar=True)
+
+        self.assertEqual(resultado['clases'], {'A': 1, 'B': 0, 'C': 1})
+        self.assertEqual(resultado['stock_minimo_actualizados'], 1)
+        analisis = AnalisisInventario.objects.get(producto=self.producto)
+        self.assertEqual((analisis.clase_abc, analisis.demanda_diaria), (ClaseABC.A.value, 3))
+        self.producto.refresh_from_db()
+        sin_ventas.refresh_from_db()
+        self.assertEqual(self.producto.stock_minimo, analisis.stock_minimo_sugerido)
+        self.assertGreater(analisis.stock_minimo_sugerido, 6)
+        self.assertEqual(sin_ventas.stock_minimo, 7)
+
+        # Una segunda ejecución reescribe las mismas filas.
+        analizar_inventario(dias=10)
+        self.assertEqual(AnalisisInventario.objects.count(), 2)
+
+    def test_nivel_de_servicio_fuera_de_rango(self):
+        for valor in ('0', '1', '1.5', 'x'):
+            with self.assertRaises(CommandError):
+                call_command('analizar_inventario', '--nivel-servicio', valor, stdout=StringIO())
+
+
+class KardexCostoTests(InventarioMixin, TestCase):
+    """
+    Costo promedio ponderado incremental y valoración a una fecha.
+    """
+
+    def saldo(self):
+        return valoracion()[self.producto.pk]
+
+    def test_costo_promedio_incremental(self):
+        self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=100)
+        segunda = self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=200)
+        self.assertEqual(self.saldo(), {'cantidad': 20, 'valor': 3000, 'costo_promedio': 150})
+
+        # Las ventas salen al promedio, sin importar el costo de su línea.
+        self.crear_transaccion([5], costo=999)
+        self.assertEqual(self.saldo(), {'cantidad': 15, 'valor': 2250, 'costo_promedio': 150})
+        venta = MovimientoInventario.objects.get(tipo=TipoMovimiento.VENTA.value)
+        self.assertEqual((venta.costo_unitario, venta.saldo_cantidad, venta.saldo_valor), (150, 15, 2250))
+
+        # Anular una compra la revierte a su propio costo.
+        self.guardar(segunda, estado=EstadoTransaccion.ANULADA.value)
+        self.assertEqual(self.saldo(), {'cantidad': 5, 'valor': 250, 'costo_promedio': 50})
+
+    def test_devolucion_de_venta_entra_al_costo_de_la_venta(self):
+        self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=100)
+        venta = self.crear_transaccion([4], costo=80)
+        with self.captureOnCommitCallbacks(execute=True):
+            Devolucion.objects.create(
+                sucursal=self.sucursal, motivo='Otro', detalle_transaccion=venta.detalles.get(),
+                tipo_devolucion=TipoDevolucion.VENTA.value, estado=EstadoDevolucion.PROCESADA.value,
+                cantidad_devuelta=2, monto_devolucion=2, observaciones='', empleado=self.empleado,
+            )
+        self.assertEqual(self.saldo(), {'cantidad': 8, 'valor': 760, 'costo_promedio': 95})
+
+    def test_valoracion_a_una_fecha_y_por_sucursal(self):
+        self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=100)
+        MovimientoInventario.objects.update(fecha=timezone.now() - datetime.timedelta(days=2))
+        self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=200)
+        principal = self.sucursal
+        self.sucursal = crear_sucursal('Norte')
+        self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=300)
+
+        ayer = timezone.now() - datetime.timedelta(days=1)
+        self.assertEqual(valoracion_en(ayer), {
+            self.producto.pk: {'cantidad': 10, 'valor': 1000, 'costo_promedio': 100},
+        })
+        self.assertEqual(valoracion(sucursal_id=principal.pk)[self.producto.pk]['costo_promedio'], 150)
+        # El costo del producto pondera todas las sucursales.
+        self.assertEqual(self.saldo(), {'cantidad': 30, 'valor': 6000, 'costo_promedio': 200})
+
+    def test_reconstruir_reproduce_el_kardex(self):
+        self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=100)
+        compra = self.crear_transaccion([10], tipo=TipoTransaccion.COMPRA, costo=200)
+        self.crear_transaccion([5])
+        self.guardar(compra, estado=EstadoTransaccion.ANULADA.value)
+        esperado = list(MovimientoInventario.objects.order_by('pk').values_list(
+            'costo_unitario', 'saldo_cantidad', 'saldo_valor',
+        ))
+
+        MovimientoInventario.objects.update(costo_unitario=None, saldo_cantidad=None, saldo_valor=None)
+        StockSucursal.objects.update(valor=0, costo_promedio=0)
+        self.assertEqual(reconstruir_kardex(tamano_lote=2), 4)
+
+        self.assertEqual(list(MovimientoInventario.objects.order_by('pk').values_list(
+            'costo_unitario', 'saldo_cantidad', 'saldo_valor',
+        )), esperado)
+        self.assertEqual(self.saldo(), {'cantidad': 5, 'valor': 250, 'costo_promedio': 50})
+
+
+class LotesFefoTests(InventarioMixin, APITestCase):
+    """
+    Existencias por lote, asignación FEFO y reporte de vencimientos.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user('lotes'))
+        hoy = timezone.localdate()
+        for lote, dias in (('A', 30), ('B', 10), ('VENCIDO', -1)):
+            self.crear_transaccion(
+                [5], tipo=TipoTransaccion.COMPRA, lote=lote, fecha_vencimiento=hoy + datetime.timedelta(days=dias),
+            )
+
+    def existencias(self):
+        return dict(LoteInventario.objects.values_list('lote', 'cantidad'))
+
+    def test_venta_sin_lote_consume_primero_el_que_vence_antes(self):
+        venta = self.crear_transaccion([7])
+        self.assertEqual(self.existencias(), {'A': 3, 'B': 0, 'VENCIDO': 5})
+        self.assertEqual(AsignacionLote.objects.filter(movimiento__detalle_transaccion__transaccion=venta).count(), 2)
+
+        self.guardar(venta, estado=EstadoTransaccion.ANULADA.value)
+        self.assertEqual(self.existencias(), {'A': 5, 'B': 5, 'VENCIDO': 5})
+
+    def test_venta_con_lote_y_devolucion_a_los_mismos_lotes(self):
+        self.crear_transaccion([2], lote='A')
+        self.assertEqual(self.existencias(), {'A': 3, 'B': 5, 'VENCIDO': 5})
+
+        venta = self.crear_transaccion([7])
+        with self.captureOnCommitCallbacks(execute=True):
+            Devolucion.objects.create(
+                sucursal=self.sucursal, motivo='Otro', detalle_transaccion=venta.detalles.get(),
+                tipo_devolucion=TipoDevolucion.VENTA.value, estado=EstadoDevolucion.PROCESADA.value,
+                cantidad_devuelta=6, monto_devolucion=6, observaciones='', empleado=self.empleado,
+            )
+        # La venta tomó 5 de B y 2 de A; la devolución llena primero B.
+        self.assertEqual(self.existencias(), {'A': 2, 'B': 5, 'VENCIDO': 5})
+
+    def test_venta_con_lote_sin_existencias_suficientes(self):
+        # Cada línea cabe en el lote, las dos juntas no.
+        with self.assertRaises(ValidationError):
+            self.crear_transaccion([3, 3], lote='A')
+        # La venta no se guarda: ni encabezado, ni líneas, ni movimientos.
+        self.assertFalse(Transaccion.all_objects.filter(tipo_transaccion=TipoTransaccion.VENTA.value).exists())
+        self.assertFalse(
+            DetalleTransaccion.all_objects.filter(transaccion__tipo_transaccion=TipoTransaccion.VENTA.value).exists()
+        )
+        self.assertFalse(MovimientoInventario.objects.filter(tipo=TipoMovimiento.VENTA.value).exists())
+        self.assertEqual(self.existencias(), {'A': 5, 'B': 5, 'VENCIDO': 5})
+
+    def test_devoluciones_repetidas_no_regresan_dos_veces_lo_mismo(self):
+        venta = self.crear_transaccion([7])
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                Devolucion.objects.create(
+                    sucursal=self.sucursal, motivo='Otro', detalle_transaccion=venta.detalles.get(),
+                    tipo_devolucion=TipoDevolucion.VENTA.value, estado=EstadoDevolucion.PROCESADA.value,
+                    cantidad_devuelta=3, monto_devolucion=3, observaciones='', empleado=self.empleado,
+                )
+        # La venta tomó 5 de B y 2 de A: a B solo le faltaban 2 tras la primera.
+        self.assertEqual(self.existencias(), {'A': 4, 'B': 5, 'VENCIDO': 5})
+
+    def test_reporte_de_lotes_por_vencer(self):
+        url = reverse('transaccion-lotes-por-vencer')
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(url, {'dias': 15})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([(l['lote'], l['dias_restantes']) for l in respuesta.data['lotes']], [('B', 10)])
+
+        respuesta = self.client.get(url, {'dias': 60, 'incluir_vencidos': 'true'})
+        self.assertEqual([l['lote'] for l in respuesta.data['lotes']], ['VENCIDO', 'B', 'A'])
+        self.assertEqual(self.client.get(url, {'dias': -1}).status_code, 400)
+
+
+class AcumuladoDevolucionesTests(InventarioMixin, TestCase):
+    """
+    Acumulado de devoluciones por línea y su conciliación.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.detalle = self.crear_transaccion([5]).detalles.get()
+
+    def devolucion(self, cantidad, estado=EstadoDevolucion.PROCESADA):
+        return Devolucion(
+            sucursal=self.sucursal, motivo='Otro', detalle_transaccion=self.detalle,
+            tipo_devolucion=TipoDevolucion.VENTA.value, estado=estado.value,
+            cantidad_devuelta=cantidad, monto_devolucion=cantidad * 10, observaciones='Prueba', empleado=self.empleado,
+        )
+
+    def acumulado(self):
+        self.detalle.refresh_from_db()
+        return self.detalle.cantidad_devuelta, self.detalle.monto_devuelto
+
+    def test_sigue_los_cambios_de_estado(self):
+        pendiente = self.devolucion(2, EstadoDevolucion.PENDIENTE)
+        pendiente.save()
+        self.assertEqual(self.acumulado(), (0, 0))
+
+        self.guardar(pendiente, estado=EstadoDevolucion.PROCESADA.value)
+        self.guardar(self.devolucion(1))
+        self.assertEqual(self.acumulado(), (3, 30))
+
+        self.guardar(pendiente, estado=EstadoDevolucion.CANCELADA.value)
+        self.assertEqual(self.acumulado(), (1, 10))
+
+        otra = self.devolucion(4)
+        self.guardar(otra)
+        with self.captureOnCommitCallbacks(execute=True):
+            otra.delete()
+        self.assertEqual(self.acumulado(), (1, 10))
+
+    def test_no_permite_devolver_mas_de_lo_vendido(self):
+        self.devolucion(4).save()
+        with self.assertRaises(ValidationError):
+            self.devolucion(2).save()
+        self.assertEqual(self.acumulado(), (4, 40))
+
+        with self.assertRaises(ValidationError):
+            self.devolucion(2).full_clean(exclude=['numero'])
+        # Una devolución ya procesada no se cuenta contra sí misma al validarla.
+        procesada = Devolucion.objects.get()
+        procesada.cantidad_devuelta = 5
+        procesada.full_clean()
+
+    def test_conciliacion_detecta_y_corrige(self):
+        self.devolucion(2).save()
+        self.assertEqual(conciliar_devoluciones(), [])
+
+        DetalleTransaccion.objects.filter(pk=self.detalle.pk).update(cantidad_devuelta=0, monto_devuelto=0)
+        diferencias = conciliar_devoluciones(corregir=True)
+        self.assertEqual([d['detalle'] for d in diferencias], [self.detalle.pk])
+        self.assertEqual(self.acumulado(), (2, 20))
+        self.assertEqual(conciliar_devoluciones(), [])
+
+
+class TransaccionApiTests(InventarioMixin, APITestCase):
+    """
+    API de consulta de transacciones: filtros, keyset y consultas fijas.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(User.objects.create_user('consulta'))
+        self.url = reverse('transaccion-list')
+        self.otra_sucursal = crear_sucursal('Norte')
+        ahora = timezone.now()
+        self.ventas = []
+        for dias in range(6):
+            venta = self.crear_transaccion([1, 2])
+            Transaccion.objects.filter(pk=venta.pk).update(fecha=ahora - datetime.timedelta(days=dias))
+            self.ventas.append(venta)
+        self.sucursal = self.otra_sucursal
+        self.crear_transaccion([3])
+
+    def ids(self, respuesta):
+        self.assertEqual(respuesta.status_code, 200, respuesta.data)
+        return [fila['id'] for fila in respuesta.data['results']]
+
+    def test_consultas_fijas_sin_importar_el_tamano_de_pagina(self):
+        for tamano in (1, 7):
+            with self.assertNumQueries(2):
+                respuesta = self.client.get(self.url, {'page_size': tamano})
+            self.assertEqual(len(respuesta.data['results']), tamano)
+        fila = respuesta.data['results'][-1]
+        self.assertEqual(fila['sucursal_nombre'], 'Principal')
+        self.assertEqual([d['cantidad'] for d in fila['detalles']], ['1.000', '2.000'])
+        self.assertEqual(fila['detalles'][0]['producto_codigo'], 'SKU-1')
+
+    def test_keyset_de_la_mas_reciente_a_la_mas_antigua(self):
+        parametros = {'sucursal': self.ventas[0].sucursal_id, 'page_size': 4}
+        primera = self.client.get(self.url, parametros)
+        self.assertEqual(self.ids(primera), [venta.pk for venta in self.ventas[:4]])
+
+        segunda = self.client.get(primera.data['next'])
+        self.assertEqual(self.ids(segunda), [venta.pk for venta in self.ventas[4:]])
+        self.assertIsNone(segunda.data['next'])
+        self.assertEqual(self.ids(self.client.get(segunda.data['previous'])), self.ids(primera))
+
+    def test_filtros_y_detalle(self):
+        hoy = timezone.localdate()
+        desde = hoy - datetime.timedelta(days=2)
+        respuesta = self.client.get(self.url, {'desde': desde, 'hasta': hoy, 'sucursal': self.ventas[0].sucursal_id})
+        self.assertEqual(self.ids(respuesta), [venta.pk for venta in self.ventas[:3]])
+        self.assertEqual(self.client.get(self.url, {'desde': hoy, 'hasta': desde}).status_code, 400)
+
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(reverse('transaccion-detail', args=[self.ventas[0].pk]))
+        self.assertEqual(respuesta.data['numero_factura'], self.ventas[0].numero_factura)
+        self.assertEqual(len(respuesta.data['detalles']), 2)
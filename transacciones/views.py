@@ -1,3 +1,96 @@
-from django.shortcuts import render
+# transacciones/views.py
+import datetime
 
-# Create your views here.
+from django.db.models import Prefetch
+from django.utils import timezone
+from rest_framework import mixins, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .ingesta import MAX_VENTAS, ingerir_ventas
+from .lotes import lotes_por_vencer
+from .models import DetalleTransaccion, Transaccion
+from .pagination import TransaccionCursorPagination
+from .reportes import reporte_ventas
+from .serializers import (
+    LotesPorVencerSerializer, ReporteVentasSerializer, TransaccionFiltroSerializer, TransaccionLecturaSerializer,
+)
+
+def inicio_del_dia(dia):
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+# --- VISTAS DE API ---
+class TransaccionViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = TransaccionLecturaSerializer
+    # Keyset sobre (fecha, id): el costo de una página no depende de su posición.
+    pagination_class = TransaccionCursorPagination
+
+    def get_queryset(self):
+        # Encabezado con sus relaciones en un JOIN y los detalles (con su
+        # producto) en una sola consulta adicional: la lista y el detalle usan
+        # un número fijo de consultas sin importar el tamaño de la página.
+        return Transaccion.objects.select_related('sucursal', 'cliente', 'proveedor', 'empleado').prefetch_related(
+            Prefetch('detalles', queryset=DetalleTransaccion.objects.select_related('producto').order_by('pk'))
+        )
+
+    def filter_queryset(self, queryset):
+        if self.action != 'list':
+            return queryset
+        filtros = TransaccionFiltroSerializer(data=self.request.query_params)
+        filtros.is_valid(raise_exception=True)
+        datos = filtros.validated_data
+        # Rangos sobre la columna (no fecha__date) para aprovechar el índice (sucursal, fecha).
+        if 'desde' in datos:
+            queryset = queryset.filter(fecha__gte=inicio_del_dia(datos['desde']))
+        if 'hasta' in datos:
+            queryset = queryset.filter(fecha__lt=inicio_del_dia(datos['hasta'] + datetime.timedelta(days=1)))
+        if 'sucursal' in datos:
+            queryset = queryset.filter(sucursal_id=datos['sucursal'])
+        for campo in ('tipo_transaccion', 'estado'):
+            if campo in datos:
+                queryset = queryset.filter(**{campo: datos[campo]})
+        return queryset
+
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Recibe una lista de ventas (cada una con sus `detalles`) desde un punto
+        de venta y las guarda en una sola transacción. Reenviar el mismo lote
+        es seguro: las facturas ya cargadas se informan como duplicadas.
+        """
+        ventas = request.data
+        if not isinstance(ventas, list):
+            raise ValidationError("Se esperaba una lista de ventas.")
+        if len(ventas) > MAX_VENTAS:
+            raise ValidationError(f"Máximo {MAX_VENTAS} ventas por petición.")
+        return Response(ingerir_ventas(ventas))
+
+    @action(detail=False, url_path='reporte-ventas')
+    def reporte_ventas(self, request):
+        """
+        Totales de ventas (o compras) por día, producto o sucursal, leídos del
+        agregado diario: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&agrupar=dia
+        """
+        parametros = ReporteVentasSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        datos = parametros.validated_data
+        resultados = reporte_ventas(
+            datos['desde'], datos['hasta'], datos['tipo_transaccion'],
+            sucursal_id=datos.get('sucursal'), agrupar=datos['agrupar'],
+        )
+        return Response({'resultados': resultados})
+
+    @action(detail=False, url_path='lotes-por-vencer')
+    def lotes_por_vencer(self, request):
+        """
+        Lotes con existencias que vencen en los próximos días:
+        ?dias=30&sucursal=ID&incluir_vencidos=true
+        """
+        parametros = LotesPorVencerSerializer(data=request.query_params)
+        parametros.is_valid(raise_exception=True)
+        datos = parametros.validated_data
+        lotes = lotes_por_vencer(
+            datos['dias'], sucursal_id=datos.get('sucursal'), incluir_vencidos=datos['incluir_vencidos'],
+        )
+        return Response({'lotes': lotes})
@@ -1,7 +1,9 @@
 # ubicaciones/admin.py
 from django.contrib import admin
+from django.db import transaction
 from .models import Departamento, Municipio
 from core.enums import EstadoGeneral # Importamos nuestro enum
+from .registro import invalidar_registro, obtener_registro
 
 @admin.register(Departamento)
 class DepartamentoAdmin(admin.ModelAdmin):
@@ -24,11 +26,13 @@ class DepartamentoAdmin(admin.ModelAdmin):
     @admin.action(description="Marcar seleccionados como Activo")
     def hacer_activos(self, request, queryset):
         queryset.update(estado=EstadoGeneral.ACTIVO)
+        transaction.on_commit(invalidar_registro)
 
     # Acción personalizada para inactivar registros en lote
     @admin.action(description="Marcar seleccionados como Inactivo")
     def hacer_inactivos(self, request, queryset):
         queryset.update(estado=EstadoGeneral.INACTIVO)
+        transaction.on_commit(invalidar_registro)
 
     # Hacemos que las acciones estén disponibles en el admin
     actions = ['hacer_activos', 'hacer_inactivos']
@@ -46,20 +50,37 @@ class MunicipioAdmin(admin.ModelAdmin):
     # Para ordenar por campos de modelos relacionados, usamos la notación __
     ordering = ('departamento__nombre', 'nombre')
 
-    # Para mostrar campos de relaciones ForeignKey en list_display
+    def get_queryset(self, request):
+        # El departamento viene en la misma consulta, también en el
+        # autocompletado (que no usa list_select_related): sin una consulta
+        # por fila en __str__ ni en get_departamento_nombre.
+        return super().get_queryset(request).select_related('departamento')
+
+    # Para mostrar campos de relaciones ForeignKey en list_display.
     @admin.display(description='Departamento', ordering='departamento__nombre')
     def get_departamento_nombre(self, obj):
         return obj.departamento.nombre
 
+    def get_search_results(self, request, queryset, search_term):
+        # Autocompletado (SucursalAdmin, PerfilUsuarioInline, ...): la búsqueda
+        # por prefijo, sin tildes, se resuelve en el registro en memoria y la
+        # base de datos solo trae los municipios encontrados.
+        if search_term and request.resolver_match and request.resolver_match.url_name == 'autocomplete':
+            encontrados = obtener_registro().buscar_municipios(search_term, limite=None)
+            return queryset.filter(pk__in=[municipio.pk for municipio in encontrados]), False
+        return super().get_search_results(request, queryset, search_term)
+
     # Acción personalizada para activar registros en lote
     @admin.action(description="Marcar seleccionados como Activo")
     def hacer_activos(self, request, queryset):
         queryset.update(estado=EstadoGeneral.ACTIVO)
+        transaction.on_commit(invalidar_registro)
 
     # Acción personalizada para inactivar registros en lote
     @admin.action(description="Marcar seleccionados como Inactivo")
     def hacer_inactivos(self, request, queryset):
         queryset.update(estado=EstadoGeneral.INACTIVO)
+        transaction.on_commit(invalidar_registro)
 
     # Hacemos que las acciones estén disponibles en el admin
     actions = ['hacer_activos', 'hacer_inactivos']
\ No newline at end of file
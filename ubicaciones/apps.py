@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UbicacionesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ubicaciones'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (registra los receptores de invalidación)
@@ -58,4 +58,6 @@ class Municipio(SafeDeleteModel):
         ordering = ['departamento', 'nombre']
 
     def __str__(self):
-        return f"{self.nombre} ({self.departamento.nombre})"
\ No newline at end of file
+        # Para listar municipios sin una consulta por fila, usar
+        # select_related('departamento') (como MunicipioAdmin.get_queryset).
+        return f"{self.nombre} ({self.departamento.nombre})"
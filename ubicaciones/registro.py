@@ -0,0 +1,173 @@
+# ubicaciones/registro.py
+"""
+Registro en memoria de la división política DANE (departamentos y
+municipios), compartido por todo el proceso.
+
+Son unos 1.100 municipios que casi nunca cambian: se cargan con dos
+consultas la primera vez que se piden y se reutilizan mientras no cambie el
+sello de versión guardado en la cache 'default' (lo cambian las señales de
+Departamento y Municipio, ver ubicaciones/signals.py). Como en el árbol de
+categorías (productos/arbol.py), cada uso solo paga una lectura de cache.
+
+El registro es de solo lectura: incluye los registros sin eliminar (activos
+o inactivos) y se reemplaza completo cuando cambia la versión.
+"""
+import bisect
+import threading
+import unicodedata
+
+from core.replicas import lectura_primaria
+from core.versiones import nueva_version, version_actual
+
+from .models import Departamento, Municipio
+
+CLAVE_VERSION = 'ubicaciones:registro:version'
+LIMITE_BUSQUEDA = 20
+
+
+def normalizar(texto):
+    """
+    Minúsculas y sin tildes: 'Bogotá' y 'BOGOTA' se buscan igual.
+    """
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(caracter for caracter in descompuesto if not unicodedata.combining(caracter)).casefold()
+
+
+class DepartamentoDane:
+    __slots__ = ('pk', 'nombre', 'codigo_dane', 'region', 'estado', 'municipios')
+
+    def __init__(self, pk, nombre, codigo_dane, region, estado):
+        self.pk = pk
+        self.nombre = nombre
+        self.codigo_dane = codigo_dane
+        self.region = region
+        self.estado = estado
+        self.municipios = ()
+
+    def __str__(self):
+        return self.nombre
+
+
+class MunicipioDane:
+    __slots__ = ('pk', 'nombre', 'codigo_dane', 'estado', 'departamento')
+
+    def __init__(self, pk, nombre, codigo_dane, estado, departamento):
+        self.pk = pk
+        self.nombre = nombre
+        self.codigo_dane = codigo_dane
+        self.estado = estado
+        self.departamento = departamento
+
+    def __str__(self):
+        # Mismo formato que Municipio.__str__.
+        return f"{self.nombre} ({self.departamento.nombre})"
+
+
+class RegistroGeografico:
+    """
+    Índices inmutables por pk, por código DANE y por región, más un índice
+    ordenado de palabras normalizadas para buscar por prefijo con bisect.
+    """
+    __slots__ = (
+        'departamentos', 'municipios', 'departamentos_por_codigo', 'municipios_por_codigo',
+        'regiones', '_palabras',
+    )
+
+    def __init__(self, departamentos, municipios):
+        self.departamentos = {}
+        regiones = {}
+        for pk, nombre, codigo, region, estado in departamentos:
+            departamento = DepartamentoDane(pk, nombre, codigo, region, estado)
+            self.departamentos[pk] = departamento
+            regiones.setdefault(region, []).append(departamento)
+
+        self.municipios = {}
+        por_departamento = {}
+        palabras = []
+        for pk, nombre, codigo, estado, departamento_id in municipios:
+            departamento = self.departamentos.get(departamento_id)
+            if departamento is None:
+                # Municipio de un departamento eliminado.
+                continue
+            municipio = MunicipioDane(pk, nombre, codigo, estado, departamento)
+            self.municipios[pk] = municipio
+            por_departamento.setdefault(departamento_id, []).append(municipio)
+            # Cada palabra del nombre es un punto de entrada: 'andres' encuentra 'San Andrés'.
+            clave = normalizar(nombre)
+            palabras.extend((clave[inicio:], pk) for inicio in _inicios_de_palabra(clave))
+
+        for departamento_id, lista in por_departamento.items():
+            self.departamentos[departamento_id].municipios = tuple(sorted(lista, key=lambda m: normalizar(m.nombre)))
+        self.departamentos_por_codigo = {d.codigo_dane: d for d in self.departamentos.values()}
+        self.municipios_por_codigo = {m.codigo_dane: m for m in self.municipios.values()}
+        self.regiones = {
+            region: tuple(sorted(lista, key=lambda d: normalizar(d.nombre))) for region, lista in regiones.items()
+        }
+        self._palabras = sorted(palabras)
+
+    @classmethod
+    @lectura_primaria()
+    def desde_base_de_datos(cls):
+        departamentos = Departamento.objects.values_list('pk', 'nombre', 'codigo_dane', 'region', 'estado')
+        municipios = Municipio.objects.values_list('pk', 'nombre', 'codigo_dane', 'estado', 'departamento_id')
+        return cls(list(departamentos), list(municipios))
+
+    def departamento(self, pk):
+        return self.departamentos.get(pk)
+
+    def municipio(self, pk):
+        return self.municipios.get(pk)
+
+    def departamento_por_codigo(self, codigo_dane):
+        return self.departamentos_por_codigo.get(codigo_dane)
+
+    def municipio_por_codigo(self, codigo_dane):
+        return self.municipios_por_codigo.get(codigo_dane)
+
+    def por_region(self, region):
+        return self.regiones.get(region, ())
+
+    def buscar_municipios(self, termino, limite=LIMITE_BUSQUEDA):
+        """
+        Municipios cuyo nombre tiene una palabra que empieza por `termino`
+        (sin distinguir tildes ni mayúsculas), o cuyo código DANE empieza
+        por él si es numérico. Ordenados por nombre.
+        """
+        termino = normalizar(termino.strip())
+        if not termino:
+            return []
+        if termino.isdigit():
+            encontrados = [m for codigo, m in self.municipios_por_codigo.items() if str(codigo).startswith(termino)]
+        else:
+            vistos = {}
+            posicion = bisect.bisect_left(self._palabras, (termino,))
+            while posicion < len(self._palabras) and self._palabras[posicion][0].startswith(termino):
+                pk = self._palabras[posicion][1]
+                vistos.setdefault(pk, self.municipios[pk])
+                posicion += 1
+            encontrados = list(vistos.values())
+        encontrados.sort(key=lambda m: (normalizar(m.nombre), normalizar(m.departamento.nombre)))
+        return encontrados[:limite]
+
+
+def _inicios_de_palabra(texto):
+    return [i for i, caracter in enumerate(texto) if caracter.isalnum() and (i == 0 or not texto[i - 1].isalnum())]
+
+
+_bloqueo = threading.Lock()
+_registro = None
+_version = None
+
+
+def obtener_registro():
+    global _registro, _version
+    version = version_actual(CLAVE_VERSION)
+    if _registro is None or version != _version:
+        with _bloqueo:
+            if _registro is None or version != _version:
+                _registro, _version = RegistroGeografico.desde_base_de_datos(), version
+    return _registro
+
+
+def invalidar_registro():
+    nueva_version(CLAVE_VERSION)
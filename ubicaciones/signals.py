@@ -0,0 +1,20 @@
+# ubicaciones/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Departamento, Municipio
+from .registro import invalidar_registro
+
+# --- Invalidación del registro geográfico en memoria ---
+# El soft delete de safedelete guarda el objeto, así que también dispara post_save.
+# queryset.update() (p. ej. las acciones del admin) no dispara señales: quien
+# lo use debe llamar a invalidar_registro() directamente.
+# Se invalida al confirmar la transacción: si se hiciera antes, otro proceso
+# podría releer la fila vieja y guardarla con el sello nuevo.
+
+
+@receiver([post_save, post_delete], sender=Departamento)
+@receiver([post_save, post_delete], sender=Municipio)
+def invalidar_registro_geografico(sender, instance, **kwargs):
+    transaction.on_commit(invalidar_registro)
@@ -1,3 +1,83 @@
+# ubicaciones/tests.py
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+
+from core.enums import Region
+from core.versiones import version_actual
+from .models import Departamento, Municipio
+from .registro import invalidar_registro, obtener_registro
+
+
+class RegistroGeograficoTests(TestCase):
+    """
+    Registro DANE en memoria: búsquedas, invalidación y uso en el admin.
+    """
+
+    def setUp(self):
+        self.antioquia = Departamento.objects.create(
+            nombre='Antioquia', codigo_dane=5, region=Region.EJE_CAFETERO.value
+        )
+        self.san_andres = Departamento.objects.create(
+            nombre='San Andrés y Providencia', codigo_dane=88, region=Region.CARIBE.value
+        )
+        self.medellin = Municipio.objects.create(departamento=self.antioquia, nombre='Medellín', codigo_dane=5001)
+        Municipio.objects.create(departamento=self.antioquia, nombre='Santa Fe de Antioquia', codigo_dane=5042)
+        Municipio.objects.create(departamento=self.san_andres, nombre='San Andrés', codigo_dane=88001)
+        # Las señales invalidan al confirmar, y TestCase nunca confirma.
+        invalidar_registro()
+
+    def nombres(self, termino):
+        return [municipio.nombre for municipio in obtener_registro().buscar_municipios(termino)]
+
+    def test_busquedas_y_agrupaciones(self):
+        registro = obtener_registro()
+        self.assertEqual(registro.municipio(self.medellin.pk).departamento.nombre, 'Antioquia')
+        self.assertEqual(registro.municipio_por_codigo(5001).nombre, 'Medellín')
+        self.assertEqual(registro.departamento_por_codigo(88).pk, self.san_andres.pk)
+        self.assertEqual([d.nombre for d in registro.por_region(Region.CARIBE.value)], ['San Andrés y Providencia'])
+        self.assertEqual(len(registro.departamento(self.antioquia.pk).municipios), 2)
+
+        # Prefijo de cualquier palabra, sin tildes ni mayúsculas.
+        self.assertEqual(self.nombres('MEDELLIN'), ['Medellín'])
+        self.assertEqual(self.nombres('san'), ['San Andrés', 'Santa Fe de Antioquia'])
+        self.assertEqual(self.nombres('andrés'), ['San Andrés'])
+        self.assertEqual(self.nombres('880'), ['San Andrés'])
+        self.assertEqual(self.nombres('xyz'), [])
+
+    def test_se_invalida_al_guardar(self):
+        obtener_registro()
+        self.medellin.nombre = 'Medellín D.E.'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medellin.save()
+        self.assertEqual(obtener_registro().municipio(self.medellin.pk).nombre, 'Medellín D.E.')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.medellin.delete()
+        self.assertIsNone(obtener_registro().municipio(self.medellin.pk))
+
+    def test_str_con_el_departamento_precargado(self):
+        municipios = list(Municipio.objects.select_related('departamento').order_by('codigo_dane'))
+        with self.assertNumQueries(0):
+            nombres = [str(municipio) for municipio in municipios]
+        self.assertEqual(nombres[0], 'Medellín (Antioquia)')
+
+    def test_autocompletado_del_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        respuesta = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'andres', 'app_label': 'organizacion', 'model_name': 'sucursal', 'field_name': 'municipio',
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([r['text'] for r in respuesta.json()['results']], ['San Andrés (San Andrés y Providencia)'])
 
-# Create your tests here.
+    def test_autocompletado_lee_el_registro_una_vez(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        with mock.patch('ubicaciones.registro.version_actual', wraps=version_actual) as lecturas:
+            respuesta = self.client.get(reverse('admin:autocomplete'), {
+                'term': 'san', 'app_label': 'organizacion', 'model_name': 'sucursal', 'field_name': 'municipio',
+            })
+        self.assertEqual(len(respuesta.json()['results']), 2)
+        # Una lectura del sello para la búsqueda, no una por resultado.
+        self.assertEqual(lecturas.call_count, 1)
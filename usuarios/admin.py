@@ -19,6 +19,8 @@ class PerfilUsuarioInline(admin.StackedInline):
     can_delete = False
     verbose_name_plural = 'Perfiles de Usuario'
     # Para campos ForeignKey con muchos registros, el autocompletado es esencial.
+    # El de municipio busca en el registro geográfico en memoria
+    # (ver MunicipioAdmin.get_search_results).
     autocomplete_fields = ['municipio', 'sucursal']
 
     # 1. Definimos los campos de solo lectura
@@ -0,0 +1,207 @@
+# usuarios/autenticacion.py
+"""
+Autenticación con cache en memoria del proceso.
+
+Sin cache, cada llamada a la API consulta el token (o la sesión), el User y,
+si la vista lo usa, el PerfilUsuario. Aquí se guardan en un LRU acotado y
+con TTL, por proceso:
+
+- ('token', key): el token con su usuario y perfil (TokenCacheadoAuthentication).
+- ('usuario', pk): el usuario con su perfil, para las sesiones
+  (UsuarioCacheadoBackend.get_user; la sesión misma va en cached_db).
+
+Se guardan los valores de las columnas, no las instancias: cada petición
+recibe objetos nuevos (User y PerfilUsuario ya enlazados), así una vista que
+modifica request.user no afecta a las demás.
+
+Cada entrada lleva el sello de versión del usuario, guardado en la cache
+'default' (una lectura por petición, sin consultas a la base de datos). Las
+señales de usuarios/signals.py lo cambian al borrar o crear un token, al
+guardar el usuario (cambio de contraseña, is_active) y al guardar o eliminar
+su perfil, así la invalidación llega a todos los procesos que comparten esa
+cache (ver core/checks.py). El TTL acota lo que puede durar una entrada si
+se cambia algo sin pasar por save().
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.versiones import nueva_version, version_actual
+from .models import PerfilUsuario
+
+TAMANO_CACHE = 10_000
+TTL_CACHE = 300
+
+CAMPOS_USUARIO = [campo.attname for campo in User._meta.concrete_fields]
+CAMPOS_PERFIL = [campo.attname for campo in PerfilUsuario._meta.concrete_fields]
+POSICION_PK = CAMPOS_USUARIO.index(User._meta.pk.attname)
+
+
+class LRUConTTL:
+    """
+    Diccionario acotado a `maximo` entradas (descarta la usada hace más
+    tiempo) cuyas entradas vencen a los `ttl` segundos. Seguro entre hilos.
+    """
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._bloqueo = threading.Lock()
+
+    def get(self, clave):
+        with self._bloqueo:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            vence, valor = entrada
+            if vence <= time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        with self._bloqueo:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def pop(self, clave):
+        with self._bloqueo:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._bloqueo:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+_cache = LRUConTTL(
+    getattr(settings, 'AUTH_CACHE_SIZE', TAMANO_CACHE), getattr(settings, 'AUTH_CACHE_TTL', TTL_CACHE),
+)
+
+
+# --- Sellos de versión por usuario ---
+def clave_version(usuario_id):
+    return f'usuarios:auth:version:{usuario_id}'
+
+
+def version_usuario(usuario_id):
+    return version_actual(clave_version(usuario_id))
+
+
+def invalidar_usuario(usuario_id):
+    nueva_version(clave_version(usuario_id))
+    olvidar_usuario(usuario_id)
+
+
+def olvidar_usuario(usuario_id):
+    """
+    Descarta la entrada de sesión del usuario solo en este proceso.
+    """
+    _cache.pop(('usuario', usuario_id))
+
+
+# --- Entradas ---
+def _guardar(clave, usuario, token_creado=None, version=None):
+    """
+    Guarda el usuario (con su perfil, si tiene uno sin eliminar) ya leído
+    de la base de datos con select_related('perfil'). Si se conoce, la
+    versión debe leerse antes de la consulta: un cambio hecho entre ambas
+    deja la entrada con la versión vieja, no con la nueva.
+    """
+    try:
+        perfil = usuario.perfil
+    except PerfilUsuario.DoesNotExist:
+        perfil = None
+    if perfil is not None and perfil.deleted is not None:
+        perfil = None
+    _cache.set(clave, (
+        version if version is not None else version_usuario(usuario.pk),
+        tuple(getattr(usuario, campo) for campo in CAMPOS_USUARIO),
+        tuple(getattr(perfil, campo) for campo in CAMPOS_PERFIL) if perfil is not None else None,
+        token_creado,
+    ))
+
+
+def _leer(clave):
+    """
+    (usuario, token_creado) de una entrada vigente, o None. El usuario es
+    una instancia nueva con el perfil ya enlazado (o marcado como ausente).
+    """
+    entrada = _cache.get(clave)
+    if entrada is None:
+        return None
+    version, valores_usuario, valores_perfil, token_creado = entrada
+    if version != version_usuario(valores_usuario[POSICION_PK]):
+        _cache.pop(clave)
+        return None
+    usuario = User.from_db(DEFAULT_DB_ALIAS, CAMPOS_USUARIO, valores_usuario)
+    perfil = None
+    if valores_perfil is not None:
+        perfil = PerfilUsuario.from_db(DEFAULT_DB_ALIAS, CAMPOS_PERFIL, valores_perfil)
+        PerfilUsuario.usuario.field.set_cached_value(perfil, usuario)
+    # Con el perfil en la cache de la relación, usuario.perfil no consulta.
+    User.perfil.related.set_cached_value(usuario, perfil)
+    return usuario, token_creado
+
+
+class TokenCacheadoAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication que, con la cache caliente, no hace consultas.
+    """
+
+    def authenticate_credentials(self, key):
+        encontrado = _leer(('token', key))
+        if encontrado is not None:
+            usuario, creado = encontrado
+            token = Token(key=key, user=usuario, created=creado)
+            token._state.adding, token._state.db = False, DEFAULT_DB_ALIAS
+            return usuario, token
+
+        # La versión se lee antes de la consulta del usuario (ver _guardar):
+        # primero se busca solo a quién pertenece el token.
+        tokens = Token.objects.filter(key=key)
+        usuario_id = tokens.values_list('user_id', flat=True).first()
+        token = None
+        if usuario_id is not None:
+            version = version_usuario(usuario_id)
+            token = tokens.select_related('user__perfil').first()
+        if token is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        if token.user_id == usuario_id:
+            _guardar(('token', key), token.user, token.created, version=version)
+        return token.user, token
+
+
+class UsuarioCacheadoBackend(ModelBackend):
+    """
+    ModelBackend que resuelve el usuario de la sesión desde la cache.
+    """
+
+    def get_user(self, user_id):
+        encontrado = _leer(('usuario', user_id))
+        if encontrado is not None:
+            usuario = encontrado[0]
+        else:
+            version = version_usuario(user_id)
+            usuario = User._default_manager.select_related('perfil').filter(pk=user_id).first()
+            if usuario is None:
+                return None
+            _guardar(('usuario', user_id), usuario, version=version)
+        return usuario if self.user_can_authenticate(usuario) else None
@@ -0,0 +1,37 @@
+# usuarios/signals.py
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .autenticacion import invalidar_usuario, olvidar_usuario
+from .models import PerfilUsuario
+
+# --- Invalidación de la cache de autenticación ---
+# Se invalida al confirmar la transacción: si se hiciera antes, otro proceso
+# podría releer la fila vieja y guardarla con el sello nuevo.
+# queryset.update() no dispara señales: el TTL de la cache acota cuánto
+# dura un cambio hecho así, o se puede llamar a invalidar_usuario().
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidar_usuario_guardado(sender, instance, created=False, **kwargs):
+    if created:
+        # Un usuario nuevo no debe heredar la entrada de otro con el mismo pk
+        # (una base que reutiliza ids tras un rollback, como SQLite en pruebas).
+        olvidar_usuario(instance.pk)
+    # Cubre el cambio de contraseña, de is_active y la eliminación.
+    transaction.on_commit(partial(invalidar_usuario, instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidar_token(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_usuario, instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=PerfilUsuario)
+def invalidar_perfil(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidar_usuario, instance.usuario_id))
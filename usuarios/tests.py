@@ -1,3 +1,113 @@
-from django.test import TestCase
+# usuarios/tests.py
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY, get_user
+from django.contrib.sessions.backends.cached_db import SessionStore
+from django.test import RequestFactory, TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.enums import RolNegocio
+from core.testing import crear_perfil, crear_sucursal
+from . import autenticacion
+from .autenticacion import LRUConTTL, TokenCacheadoAuthentication, UsuarioCacheadoBackend, _cache
+
+
+class AutenticacionCacheadaTests(TestCase):
+    """
+    Token y sesión resueltos desde la cache: cero consultas en caliente e
+    invalidación por token, contraseña y perfil.
+    """
+
+    def setUp(self):
+        _cache.clear()
+        self.perfil = crear_perfil(rol=RolNegocio.EMPLEADO.value)
+        self.perfil.sucursal = crear_sucursal()
+        self.perfil.save()
+        self.usuario = self.perfil.usuario
+        self.token = Token.objects.create(user=self.usuario)
+        self.factory = RequestFactory()
+
+    def autenticar(self):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        return TokenCacheadoAuthentication().authenticate(request)
+
+    def test_token_sin_consultas_en_caliente(self):
+        # En frío: a quién pertenece el token y luego el usuario con su perfil.
+        with self.assertNumQueries(2):
+            self.autenticar()
+        with self.assertNumQueries(0):
+            usuario, token = self.autenticar()
+            perfil = usuario.perfil
+        self.assertEqual((usuario.pk, token.key), (self.usuario.pk, self.token.key))
+        self.assertEqual((perfil.rol_negocio, perfil.sucursal_id), ('Empleado', self.perfil.sucursal_id))
+        # Cada petición recibe su propia instancia.
+        self.assertIsNot(self.autenticar()[0], usuario)
+
+    def test_invalidacion(self):
+        self.autenticar()
+        self.perfil.rol_negocio = RolNegocio.ADMINISTRADOR.value
+        with self.captureOnCommitCallbacks(execute=True):
+            self.perfil.save()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.autenticar()[0].perfil.rol_negocio, 'Administrador')
+
+        self.usuario.set_password('otra-clave-segura')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.save()
+        self.assertTrue(self.autenticar()[0].check_password('otra-clave-segura'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar()
+
+    def test_desactivar_durante_la_consulta_no_queda_en_cache(self):
+        guardar = autenticacion._guardar
+
+        def desactivar_y_guardar(*args, **kwargs):
+            # Otra petición desactiva al usuario entre la consulta y el guardado.
+            self.usuario.is_active = False
+            with self.captureOnCommitCallbacks(execute=True):
+                self.usuario.save()
+            guardar(*args, **kwargs)
+
+        with mock.patch.object(autenticacion, '_guardar', desactivar_y_guardar):
+            self.autenticar()
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar()
+
+    def test_sesion_sin_consultas_en_caliente(self):
+        sesion = SessionStore()
+        sesion[SESSION_KEY] = str(self.usuario.pk)
+        sesion['_auth_user_backend'] = 'usuarios.autenticacion.UsuarioCacheadoBackend'
+        sesion['_auth_user_hash'] = self.usuario.get_session_auth_hash()
+        sesion.save()
+
+        request = self.factory.get('/')
+        request.session = SessionStore(sesion.session_key)
+        self.assertEqual(get_user(request).pk, self.usuario.pk)
+
+        request.session = SessionStore(sesion.session_key)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user(request).perfil.pk, self.perfil.pk)
+
+        # Un usuario inactivo no se autentica aunque esté en la cache.
+        self.usuario.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.save()
+        self.assertIsNone(UsuarioCacheadoBackend().get_user(self.usuario.pk))
+
+    def test_lru_acotado_y_con_vencimiento(self):
+        lru = LRUConTTL(maximo=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+        lru.ttl = 0.01
+        lru.set('d', 4)
+        time.sleep(0.02)
+        self.assertIsNone(lru.get('d'))